@@ -0,0 +1,7 @@
+# benchmarks/__init__.py
+"""
+Standalone performance benchmarks for the Sigma AI application.
+Run each module with `python -m benchmarks.<name> --help`. They use
+file-backed SQLite databases in a temporary directory and are not part of
+the pytest suite.
+"""
@@ -0,0 +1,99 @@
+# benchmarks/bench_answer_request.py
+"""
+Latency and commit count of a typical "answer a question" request, with
+per-call commits versus crud.unit_of_work, on file-backed SQLite.
+
+Usage:
+    python -m benchmarks.bench_answer_request --requests 500
+"""
+
+import argparse
+import random
+import time
+
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from flaskr import crud, db
+
+from .common import bench_app, format_summary, summarize
+
+
+def _answer_request(session, user_id: int, skill_id: int, n: int) -> None:
+    # What the practice view does for one submitted answer
+    crud.get_user_by_id(session, user_id)
+    progress = crud.get_or_create_user_progress(session, user_id, skill_id)
+    is_correct = n % 3 != 0
+    crud.create_question_log(
+        session,
+        {
+            "user_id": user_id,
+            "skill_id": skill_id,
+            "difficulty_presented": progress.current_difficulty,
+            "question_text_generated": f"Question {n}",
+            "user_answer": "42",
+            "is_correct": is_correct,
+            "response_time_ms": 4000,
+        },
+    )
+    crud.update_user_progress_state(
+        session,
+        user_id,
+        skill_id,
+        correct_streak=progress.correct_streak + 1 if is_correct else 0,
+        incorrect_streak=0 if is_correct else progress.incorrect_streak + 1,
+        is_correct=is_correct,
+    )
+
+
+def run(n_requests: int, n_users: int, n_skills: int) -> None:
+    """Replays the same request mix in both modes and prints the results."""
+    rng = random.Random(7)
+    workload = [
+        (rng.randint(1, n_users), rng.randint(1, n_skills)) for _ in range(n_requests)
+    ]
+    for mode in ("per-call commits", "unit_of_work"):
+        with bench_app():
+            session = db.session
+            password_hash = generate_password_hash("benchmark")
+            crud.create_users_bulk(
+                session,
+                (
+                    {"user_identifier": f"u{n}", "password_hash": password_hash}
+                    for n in range(n_users)
+                ),
+            )
+            crud.upsert_skills_bulk(
+                session,
+                (
+                    {"skill_id_string": f"s{n}", "name": f"S{n}"}
+                    for n in range(n_skills)
+                ),
+            )
+            commits = []
+            event.listen(db.engine, "commit", lambda _conn: commits.append(1))
+            samples = []
+            for n, (user_id, skill_id) in enumerate(workload):
+                start = time.perf_counter()
+                if mode == "unit_of_work":
+                    with crud.unit_of_work(session):
+                        _answer_request(session, user_id, skill_id, n)
+                else:
+                    _answer_request(session, user_id, skill_id, n)
+                samples.append((time.perf_counter() - start) * 1000)
+                session.remove()  # End of the simulated request
+            print(format_summary(mode, summarize(samples)))
+            print(f"{'':<32} commits/request={len(commits) / n_requests:.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--skills", type=int, default=20)
+    args = parser.parse_args()
+    run(args.requests, args.users, args.skills)
+
+
+if __name__ == "__main__":
+    main()
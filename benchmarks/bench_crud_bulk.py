@@ -0,0 +1,97 @@
+# benchmarks/bench_crud_bulk.py
+"""
+Rows/second of the bulk CRUD functions against their single-row
+counterparts on file-backed SQLite.
+
+Usage:
+    python -m benchmarks.bench_crud_bulk --users 2000 --skills 500
+"""
+
+import argparse
+
+from sqlalchemy import delete
+from werkzeug.security import generate_password_hash
+
+from flaskr import crud, db
+from flaskr.models import User, UserProgress
+
+from .common import bench_app, timer
+
+
+def _single_user(session, identifier: str, password_hash: str) -> None:
+    # create_user's single-row path (existence SELECT, INSERT, COMMIT,
+    # refresh), plus the password hash the users table requires.
+    if crud.get_user_by_identifier(session, identifier):
+        raise ValueError(identifier)
+    user = User(user_identifier=identifier, password_hash=password_hash)
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+
+
+def run(n_users: int, n_skills: int) -> None:
+    """Runs each single-row/bulk pair and prints rows/second."""
+    # Hash once: hashing cost is identical for both paths and would
+    # otherwise dominate the measurement.
+    password_hash = generate_password_hash("benchmark")
+    results = []
+
+    with bench_app():
+        session = db.session
+
+        with timer() as single:
+            for n in range(n_users):
+                _single_user(session, f"single_{n}", password_hash)
+        with timer() as bulk:
+            crud.create_users_bulk(
+                session,
+                (
+                    {"user_identifier": f"bulk_{n}", "password_hash": password_hash}
+                    for n in range(n_users)
+                ),
+            )
+        results.append(("users", n_users, single, bulk))
+
+        with timer() as single:
+            for n in range(n_skills):
+                crud.create_skill(session, f"single-skill-{n}", f"Skill {n}")
+        with timer() as bulk:
+            crud.upsert_skills_bulk(
+                session,
+                (
+                    {"skill_id_string": f"bulk-skill-{n}", "name": f"Skill {n}"}
+                    for n in range(n_skills)
+                ),
+            )
+        results.append(("skills", n_skills, single, bulk))
+
+        user_ids = [u.id for u in session.query(User.id).limit(n_users)]
+        skill_ids = [s.id for s in crud.get_all_skills(session)][:n_skills]
+        pairs = [(u, s) for u in user_ids[:50] for s in skill_ids[:40]]
+        with timer() as single:
+            for user_id, skill_id in pairs:
+                crud.get_or_create_user_progress(session, user_id, skill_id)
+        session.execute(delete(UserProgress))
+        session.commit()
+        with timer() as bulk:
+            crud.ensure_progress_bulk(session, pairs)
+        results.append(("progress", len(pairs), single, bulk))
+
+    print(f"{'entity':<10} {'rows':>7} {'single rows/s':>15} {'bulk rows/s':>15}")
+    for name, rows, single, bulk in results:
+        print(
+            f"{name:<10} {rows:>7} {rows / single['seconds']:>15,.0f} "
+            f"{rows / bulk['seconds']:>15,.0f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--skills", type=int, default=500)
+    args = parser.parse_args()
+    run(args.users, args.skills)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+# benchmarks/bench_crud_suite.py
+"""
+Latency distribution and throughput of every crud function at realistic
+data sizes, with JSON results and regression checks against a baseline.
+
+Each scale point is seeded by flaskr/seeding.py into a file-backed SQLite
+database (with --db-dir it is kept there and later runs measure on a fresh
+copy of it), then every operation runs --iterations times, each call
+followed by a session removal as at the end of a request. Results are
+written as JSON; --compare flags operations whose p50 or p95 grew by more
+than --threshold against a saved run and exits with status 1 if any did.
+
+Usage:
+    python -m benchmarks.bench_crud_suite --scales small medium --output run.json
+    python -m benchmarks.bench_crud_suite --scales small --compare baseline.json
+    python -m benchmarks.bench_crud_suite --results run.json --compare baseline.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import sqlalchemy
+from sqlalchemy import select
+from werkzeug.security import generate_password_hash
+
+from flaskr import crud, db
+from flaskr.models import User
+from flaskr.seeding import Population, SeedSpec, seed_database
+
+from .common import bench_app, format_summary, summarize
+
+RESULTS_FORMAT = 1
+# catalog_versions row marking a completely seeded database
+SEED_MARKER = "bench_crud_suite_seed"
+
+SCALES = {
+    "small": SeedSpec(users=1_000, skills=50, logs=100_000),
+    "medium": SeedSpec(users=10_000, skills=100, logs=2_000_000),
+    "large": SeedSpec(users=100_000, skills=200, logs=50_000_000),
+}
+
+
+# --- Operations ---
+
+
+class Context:
+    """State shared by the operations of one scale point."""
+
+    def __init__(self, scale: SeedSpec, password_hash: str, iterations: int):
+        self.scale = scale
+        # Regenerated from the seed: the seeded users' practised skills
+        self.population = Population(scale)
+        self.password_hash = password_hash
+        self.iterations = iterations
+        self.rng = random.Random(1)
+        # Tags the rows written by this run
+        self.run_id = f"{int(time.time() * 1000):x}"
+        self.scratch_users: List[int] = []
+        self.setups = 0
+
+    def user_id(self) -> int:
+        return self.rng.randint(1, self.scale.users)
+
+    def skill_id(self) -> int:
+        return self.rng.randint(1, self.scale.skills)
+
+    def practised_pair(self) -> Tuple[int, int]:
+        user_id = self.user_id()
+        practised = self.population.practised[user_id - 1]
+        return user_id, int(self.rng.choice(practised))
+
+    def unpractised_pair(self, i: int) -> Tuple[int, int]:
+        # A skill without a seeded progress row, distinct per iteration
+        user_id = 1 + i % self.scale.users
+        practised = set(self.population.practised[user_id - 1].tolist())
+        others = [s for s in range(1, self.scale.skills + 1) if s not in practised]
+        return user_id, others[(i // self.scale.users) % len(others)]
+
+    def log_data(self, i: int) -> dict:
+        return {
+            "difficulty_presented": self.rng.randint(1, 5),
+            "question_text_generated": f"Bench question {self.run_id}-{i}",
+            "response_time_ms": self.rng.randint(800, 30_000),
+        }
+
+
+def _create_scratch_users(session, ctx: Context) -> None:
+    # Fresh users for the operations that rename or delete one per iteration
+    ctx.setups += 1
+    prefix = f"scratch-{ctx.run_id}-{ctx.setups}-"
+    crud.create_users_bulk(
+        session,
+        (
+            {"user_identifier": f"{prefix}{i}", "password_hash": ctx.password_hash}
+            for i in range(ctx.iterations)
+        ),
+    )
+    ctx.scratch_users = list(
+        session.scalars(
+            select(User.id)
+            .where(User.user_identifier.like(f"{prefix}%"))
+            .order_by(User.id)
+        )
+    )
+
+
+class Operation(NamedTuple):
+    """
+    One measured crud call: `call(session, ctx, i)` runs iteration i.
+    `setup(session, ctx)` runs once before; only read-only calls warm up.
+    """
+
+    name: str
+    call: Callable
+    read_only: bool = False
+    setup: Optional[Callable] = None
+
+
+# create_user is absent: it inserts users without the required
+# password_hash; create_users_bulk with one row covers that write path.
+OPERATIONS = [
+    Operation(
+        "get_user_by_id",
+        lambda s, ctx, i: crud.get_user_by_id(s, ctx.user_id()),
+        read_only=True,
+    ),
+    Operation(
+        "get_user_by_identifier",
+        lambda s, ctx, i: crud.get_user_by_identifier(s, f"seed-user-{ctx.user_id()}"),
+        read_only=True,
+    ),
+    Operation(
+        "get_skill_by_id",
+        lambda s, ctx, i: crud.get_skill_by_id(s, ctx.skill_id()),
+        read_only=True,
+    ),
+    Operation(
+        "get_skill_by_id_string",
+        lambda s, ctx, i: crud.get_skill_by_id_string(
+            s, f"seed-skill-{ctx.skill_id()}"
+        ),
+        read_only=True,
+    ),
+    Operation(
+        "get_all_skills", lambda s, ctx, i: crud.get_all_skills(s), read_only=True
+    ),
+    Operation(
+        "get_catalog_version",
+        lambda s, ctx, i: crud.get_catalog_version(s, crud.SKILL_CATALOG),
+        read_only=True,
+    ),
+    Operation(
+        "get_user_progress",
+        lambda s, ctx, i: crud.get_user_progress(s, *ctx.practised_pair()),
+        read_only=True,
+    ),
+    Operation(
+        "get_or_create_user_progress[existing]",
+        lambda s, ctx, i: crud.get_or_create_user_progress(s, *ctx.practised_pair()),
+        read_only=True,
+    ),
+    Operation(
+        "get_or_create_user_progress[new]",
+        lambda s, ctx, i: crud.get_or_create_user_progress(s, *ctx.unpractised_pair(i)),
+    ),
+    Operation(
+        "get_recent_logs_for_user_skill",
+        lambda s, ctx, i: crud.get_recent_logs_for_user_skill(s, *ctx.practised_pair()),
+        read_only=True,
+    ),
+    Operation(
+        "create_question_log",
+        lambda s, ctx, i: crud.create_question_log(
+            s,
+            dict(zip(("user_id", "skill_id"), ctx.practised_pair()), **ctx.log_data(i)),
+        ),
+    ),
+    Operation(
+        "record_answer",
+        lambda s, ctx, i: crud.record_answer(
+            s, *ctx.practised_pair(), ctx.rng.random() < 0.7, ctx.log_data(i)
+        ),
+    ),
+    Operation(
+        "update_user_progress_state",
+        lambda s, ctx, i: crud.update_user_progress_state(
+            s, *ctx.practised_pair(), difficulty=ctx.rng.randint(1, 5)
+        ),
+    ),
+    Operation(
+        "create_users_bulk[1]",
+        lambda s, ctx, i: crud.create_users_bulk(
+            s,
+            [
+                {
+                    "user_identifier": f"bulk1-{ctx.run_id}-{i}",
+                    "password_hash": ctx.password_hash,
+                }
+            ],
+        ),
+    ),
+    Operation(
+        "create_users_bulk[100]",
+        lambda s, ctx, i: crud.create_users_bulk(
+            s,
+            (
+                {
+                    "user_identifier": f"bulk100-{ctx.run_id}-{i}-{n}",
+                    "password_hash": ctx.password_hash,
+                }
+                for n in range(100)
+            ),
+        ),
+    ),
+    Operation(
+        "update_user_identifier",
+        lambda s, ctx, i: crud.update_user_identifier(
+            s, ctx.scratch_users[i], f"renamed-{ctx.run_id}-{i}"
+        ),
+        setup=_create_scratch_users,
+    ),
+    Operation(
+        "delete_user",
+        lambda s, ctx, i: crud.delete_user(s, ctx.scratch_users[i]),
+        setup=_create_scratch_users,
+    ),
+    Operation(
+        "create_skill",
+        lambda s, ctx, i: crud.create_skill(
+            s, f"bench-{ctx.run_id}-{i}", f"Bench {ctx.run_id}-{i}"
+        ),
+    ),
+    Operation(
+        "upsert_skills_bulk[10]",
+        lambda s, ctx, i: crud.upsert_skills_bulk(
+            s,
+            (
+                {"skill_id_string": f"seed-skill-{n}", "name": f"Skill {n}"}
+                for n in range(1 + i % ctx.scale.skills, 11 + i % ctx.scale.skills)
+            ),
+        ),
+    ),
+    Operation(
+        "ensure_progress_bulk[100]",
+        lambda s, ctx, i: crud.ensure_progress_bulk(
+            s, [ctx.practised_pair() for _ in range(100)]
+        ),
+    ),
+]
+
+
+def measure(operation: Operation, ctx: Context, warmup: int) -> Dict[str, float]:
+    """Runs `operation` for ctx.iterations calls; latency summary + ops/s."""
+    session = db.session
+    if operation.setup is not None:
+        operation.setup(session, ctx)
+        session.remove()
+    for i in range(warmup if operation.read_only else 0):
+        operation.call(session, ctx, i)
+        session.remove()
+    samples = []
+    for i in range(ctx.iterations):
+        start = time.perf_counter()
+        operation.call(session, ctx, i)
+        samples.append((time.perf_counter() - start) * 1000)
+        session.remove()  # End of the simulated request
+    summary = summarize(samples)
+    summary["ops_per_sec"] = 1000 * len(samples) / sum(samples)
+    return summary
+
+
+def _seed_if_needed(name: str, scale: SeedSpec, password_hash: str) -> Optional[float]:
+    # Inside bench_app: seeds unless a previous run completed the seed
+    if crud.get_catalog_version(db.session, SEED_MARKER):
+        return None
+    print(f"[{name}] seeding {scale} ...", flush=True)
+    start = time.perf_counter()
+    seed_database(db.engine, scale, [password_hash])
+    crud.bump_catalog_version(db.session, SEED_MARKER)
+    db.session.commit()
+    seconds = time.perf_counter() - start
+    print(f"[{name}] seeded in {seconds:.1f}s", flush=True)
+    db.session.remove()
+    return seconds
+
+
+def run_scale(
+    name: str,
+    scale: SeedSpec,
+    iterations: int,
+    warmup: int,
+    db_dir: Optional[str],
+    only: Optional[List[str]],
+) -> dict:
+    """
+    Seeds (or reuses) the scale's database and measures every operation.
+    With `db_dir`, measurements run on a copy of the kept database so the
+    write operations never change what the next run starts from.
+    """
+    password_hash = generate_password_hash("benchmark")
+    with tempfile.TemporaryDirectory(prefix="sigma-bench-") as tmp_dir:
+        db_path = os.path.join(tmp_dir, "measure.sqlite")
+        seed_seconds = None
+        if db_dir:
+            kept_path = os.path.join(db_dir, f"crud-{name}.sqlite")
+            with bench_app(db_path=kept_path):
+                seed_seconds = _seed_if_needed(name, scale, password_hash)
+            shutil.copyfile(kept_path, db_path)
+
+        with bench_app(db_path=db_path):
+            if not db_dir:
+                seed_seconds = _seed_if_needed(name, scale, password_hash)
+            ctx = Context(scale, password_hash, iterations)
+            results = {}
+            for operation in OPERATIONS:
+                if only and not any(pattern in operation.name for pattern in only):
+                    continue
+                summary = results[operation.name] = measure(operation, ctx, warmup)
+                print(
+                    f"[{name}] {format_summary(operation.name, summary)} "
+                    f"{summary['ops_per_sec']:9.0f} ops/s",
+                    flush=True,
+                )
+    return {
+        "users": scale.users,
+        "skills": scale.skills,
+        "logs": scale.logs,
+        "seed_seconds": seed_seconds,
+        "results": results,
+    }
+
+
+def environment() -> dict:
+    """Interpreter and library versions recorded with every run."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "sqlite": sqlite3.sqlite_version,
+    }
+
+
+# --- Comparison ---
+
+
+def compare(
+    baseline: dict,
+    current: dict,
+    threshold: float = 0.2,
+    min_delta_ms: float = 0.05,
+) -> List[dict]:
+    """
+    Per (scale, operation) present in both runs: p50/p95 ratios and whether
+    either grew by more than `threshold` (a fraction) and by more than
+    `min_delta_ms`, which keeps sub-millisecond jitter from being flagged.
+    """
+    rows = []
+    for scale_name, scale in current["scales"].items():
+        base_scale = baseline.get("scales", {}).get(scale_name)
+        if base_scale is None:
+            continue
+        for op_name, summary in scale["results"].items():
+            base = base_scale["results"].get(op_name)
+            if not base or not base.get("count") or not summary.get("count"):
+                continue
+            row = {"scale": scale_name, "operation": op_name, "regression": False}
+            for stat in ("p50", "p95"):
+                ratio = summary[stat] / base[stat] if base[stat] else float("inf")
+                row[f"{stat}_ratio"] = ratio
+                if ratio > 1 + threshold and summary[stat] - base[stat] > min_delta_ms:
+                    row["regression"] = True
+            rows.append(row)
+    return rows
+
+
+def print_comparison(rows: List[dict], threshold: float) -> None:
+    """Table of the ratios, regressions marked."""
+    print(f"\n{'scale':<8} {'operation':<40} {'p50 x':>7} {'p95 x':>7}")
+    for row in rows:
+        flag = f"  REGRESSION (> +{threshold:.0%})" if row["regression"] else ""
+        print(
+            f"{row['scale']:<8} {row['operation']:<40} "
+            f"{row['p50_ratio']:7.2f} {row['p95_ratio']:7.2f}{flag}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--scales", nargs="+", choices=sorted(SCALES), default=["small"]
+    )
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument(
+        "--db-dir",
+        default=None,
+        help="Keep seeded databases here and reuse them (default: temporary).",
+    )
+    parser.add_argument(
+        "--only", nargs="+", default=None, help="Operations whose name contains any."
+    )
+    parser.add_argument("--output", default=None, help="Write results JSON here.")
+    parser.add_argument(
+        "--results", default=None, help="Load results JSON instead of running."
+    )
+    parser.add_argument("--compare", default=None, help="Baseline results JSON.")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--min-delta-ms", type=float, default=0.05)
+    args = parser.parse_args()
+
+    if args.results:
+        with open(args.results, encoding="utf-8") as f:
+            current = json.load(f)
+    else:
+        if args.db_dir:
+            os.makedirs(args.db_dir, exist_ok=True)
+        current = {
+            "format": RESULTS_FORMAT,
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "environment": environment(),
+            "iterations": args.iterations,
+            "scales": {
+                name: run_scale(
+                    name,
+                    SCALES[name],
+                    args.iterations,
+                    args.warmup,
+                    args.db_dir,
+                    args.only,
+                )
+                for name in args.scales
+            },
+        }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(baseline, current, args.threshold, args.min_delta_ms)
+        print_comparison(rows, args.threshold)
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# benchmarks/bench_question_client.py
+"""
+Question generation against a local fake model server (see
+fake_model_server.py), offline. Compares a blocking call per question over
+a fresh connection with the pooled, retrying GeminiQuestionGenerator, run
+sequentially and fanned out with questions.generate_many, then measures
+how fast callers fail once the provider goes down (circuit breaker on and
+off).
+
+Usage:
+    python -m benchmarks.bench_question_client --questions 200 --latency-ms 50
+    python -m benchmarks.bench_question_client --error-rate 0.1 --concurrency 16
+"""
+
+import argparse
+import http.client
+import json
+import time
+from collections import Counter
+from typing import Callable, List
+
+from flaskr.model_client import (
+    CircuitBreaker,
+    ConnectionPool,
+    ModelClient,
+    ModelError,
+    RetryPolicy,
+)
+from flaskr.questions import GeminiQuestionGenerator, generate_many
+
+from .common import format_summary, summarize
+from .fake_model_server import FakeModelServer
+
+_PATH = "/v1beta/models/fake:generateContent"
+
+
+def _per_call_connection(server: FakeModelServer, timeout: float) -> Callable:
+    # The naive client: a new TCP connection and no retries for every question
+    def generate(skill_name: str, difficulty: int) -> None:
+        conn = http.client.HTTPConnection(
+            "127.0.0.1", server.server_port, timeout=timeout
+        )
+        try:
+            conn.request(
+                "POST",
+                _PATH,
+                body=json.dumps({"skill": skill_name}),
+                headers={"Content-Type": "application/json"},
+            )
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                raise ModelError(f"HTTP {response.status}")
+        finally:
+            conn.close()
+
+    return generate
+
+
+def _generator(server: FakeModelServer, args, breaker: bool = True):
+    client = ModelClient(
+        ConnectionPool(server.url, size=args.concurrency, timeout=args.timeout),
+        retry=RetryPolicy(attempts=args.attempts, backoff=args.backoff),
+        breaker=CircuitBreaker(
+            failure_threshold=5 if breaker else 10**9, reset_timeout=30.0
+        ),
+    )
+    outcomes: Counter = Counter()
+    client.add_timing_listener(lambda outcome, seconds: outcomes.update([outcome]))
+    return GeminiQuestionGenerator(client, api_key="bench", model="fake"), outcomes
+
+
+def _run_sequential(generate: Callable, count: int):
+    latencies: List[float] = []
+    failures = 0
+    for n in range(count):
+        start = time.perf_counter()
+        try:
+            generate("Addition", 1 + n % 5)
+        except (ModelError, OSError):
+            failures += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, failures
+
+
+def _report(name, server, connections_before, seconds, latencies, failures, outcomes):
+    rate = len(latencies) / seconds if seconds else 0.0
+    print(
+        f"{name:<32} {seconds:7.2f}s  {rate:8.1f} q/s  failures={failures:<4} "
+        f"connections={server.connections - connections_before:<4} "
+        f"attempts={dict(outcomes) if outcomes is not None else '-'}"
+    )
+    if latencies and None not in latencies:
+        print("  " + format_summary("latency", summarize(latencies)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--attempts", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with FakeModelServer(
+        latency=args.latency_ms / 1000,
+        error_rate=args.error_rate,
+        hang_rate=args.hang_rate,
+        hang_seconds=args.timeout * 2,
+        seed=args.seed,
+    ) as server:
+        print(
+            f"{args.questions} questions, fake latency ~{args.latency_ms:g}ms, "
+            f"{args.error_rate:.0%} errors, {args.hang_rate:.0%} hangs\n"
+        )
+        before = server.connections
+        start = time.perf_counter()
+        latencies, failures = _run_sequential(
+            _per_call_connection(server, args.timeout), args.questions
+        )
+        _report(
+            "connection per call, no retry",
+            server,
+            before,
+            time.perf_counter() - start,
+            latencies,
+            failures,
+            None,
+        )
+
+        generator, outcomes = _generator(server, args)
+        before = server.connections
+        start = time.perf_counter()
+        latencies, failures = _run_sequential(generator.generate, args.questions)
+        _report(
+            "pooled + retries, sequential",
+            server,
+            before,
+            time.perf_counter() - start,
+            latencies,
+            failures,
+            outcomes,
+        )
+
+        outcomes.clear()
+        before = server.connections
+        start = time.perf_counter()
+        results = generate_many(
+            generator,
+            [("Addition", 1 + n % 5) for n in range(args.questions)],
+            concurrency=args.concurrency,
+        )
+        _report(
+            f"pooled + retries, fan-out x{args.concurrency}",
+            server,
+            before,
+            time.perf_counter() - start,
+            [None] * len(results),  # Per-question latency is not measured
+            sum(isinstance(result, Exception) for result in results),
+            outcomes,
+        )
+        generator.close()
+
+        print("\nProvider down (every request 503):")
+        server.error_rate, server.hang_rate = 1.0, 0.0
+        for breaker in (False, True):
+            generator, outcomes = _generator(server, args, breaker=breaker)
+            before = server.connections
+            start = time.perf_counter()
+            latencies, failures = _run_sequential(generator.generate, 50)
+            _report(
+                f"circuit breaker {'on' if breaker else 'off'}",
+                server,
+                before,
+                time.perf_counter() - start,
+                latencies,
+                failures,
+                outcomes,
+            )
+            generator.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_sessions.py
+"""
+Per-request session cost of the Flask-Session filesystem backend versus
+the built-in SQLite backend (flaskr/session_store.py): requests that only
+read the session, requests that modify it, and creating many distinct
+sessions.
+
+Usage:
+    python -m benchmarks.bench_sessions --requests 2000 --sessions 2000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from flask import session
+
+from flaskr import create_app
+
+from .common import format_summary, summarize
+
+
+def _make_app(backend: str, tmp_dir: str):
+    app = create_app(
+        {
+            "TESTING": True,
+            "SECRET_KEY": "bench",
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "SESSION_TYPE": backend,
+            "SESSION_FILE_DIR": os.path.join(tmp_dir, "flask_session"),
+            "SESSION_SQLITE_PATH": os.path.join(tmp_dir, "sessions.sqlite"),
+        }
+    )
+
+    # A session shaped like a logged-in learner's (Flask-Login keys)
+    @app.route("/_bench/login")
+    def bench_login():
+        session["_user_id"] = "42"
+        session["_fresh"] = True
+        session["_id"] = "f" * 128
+        session["counter"] = 0
+        return "ok"
+
+    @app.route("/_bench/read")
+    def bench_read():
+        return str(session.get("_user_id"))
+
+    @app.route("/_bench/write")
+    def bench_write():
+        session["counter"] = session.get("counter", 0) + 1
+        return "ok"
+
+    return app
+
+
+def run(n_requests: int, n_sessions: int) -> None:
+    """Runs each workload against both backends and prints the results."""
+    for backend in ("filesystem", "sqlite"):
+        with tempfile.TemporaryDirectory(prefix="sigma-bench-") as tmp_dir:
+            os.makedirs(os.path.join(tmp_dir, "flask_session"))
+            app = _make_app(backend, tmp_dir)
+            client = app.test_client()
+            client.get("/_bench/login")
+
+            for workload in ("read", "write"):
+                samples = []
+                for _ in range(n_requests):
+                    start = time.perf_counter()
+                    client.get(f"/_bench/{workload}")
+                    samples.append((time.perf_counter() - start) * 1000)
+                print(format_summary(f"{backend} {workload}", summarize(samples)))
+
+            # Many learners: one new session each
+            samples = []
+            for _ in range(n_sessions):
+                fresh = app.test_client()
+                start = time.perf_counter()
+                fresh.get("/_bench/login")
+                samples.append((time.perf_counter() - start) * 1000)
+            print(format_summary(f"{backend} new session", summarize(samples)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=2000)
+    args = parser.parse_args()
+    run(args.requests, args.sessions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/bench_sqlite_profile.py
+"""
+Concurrent read/write throughput on file-backed SQLite with the default
+engine settings versus SQLITE_PROFILE = "production" (WAL, tuned PRAGMAs).
+Reader threads fetch progress and recent logs while writer threads record
+answers, as during a busy practice session.
+
+Usage:
+    python -m benchmarks.bench_sqlite_profile --seconds 5 --readers 6 --writers 2
+"""
+
+import argparse
+import random
+import threading
+import time
+from typing import List
+
+from sqlalchemy.exc import OperationalError
+from werkzeug.security import generate_password_hash
+
+from flaskr import crud, db
+
+from .common import bench_app, format_summary, summarize
+
+
+def _worker(app, role: str, deadline: float, seed: int, n_users: int, stats: dict):
+    rng = random.Random(seed)
+    samples: List[float] = []
+    errors = 0
+    with app.app_context():
+        session = db.session
+        n = 0
+        while time.perf_counter() < deadline:
+            user_id, skill_id = rng.randint(1, n_users), 1
+            start = time.perf_counter()
+            try:
+                if role == "write":
+                    crud.record_answer(
+                        session,
+                        user_id,
+                        skill_id,
+                        rng.random() < 0.7,
+                        {"difficulty_presented": 2, "question_text_generated": f"Q{n}"},
+                    )
+                else:
+                    crud.get_user_progress(session, user_id, skill_id)
+                    crud.get_recent_logs_for_user_skill(session, user_id, skill_id)
+            except OperationalError:
+                errors += 1  # "database is locked" after the busy timeout
+                session.rollback()
+            samples.append((time.perf_counter() - start) * 1000)
+            session.remove()  # End of the simulated request
+            n += 1
+    with stats["lock"]:
+        stats[role].extend(samples)
+        stats[f"{role}_errors"] += errors
+
+
+def run(seconds: float, n_readers: int, n_writers: int, n_users: int) -> None:
+    """Runs the same thread mix under both profiles and prints the results."""
+    for profile in ("default", "production"):
+        config = {"SQLITE_PROFILE": profile, "SQLITE_CHECKPOINT_INTERVAL": 1}
+        with bench_app(config) as app:
+            password_hash = generate_password_hash("benchmark")
+            crud.create_users_bulk(
+                db.session,
+                (
+                    {"user_identifier": f"u{n}", "password_hash": password_hash}
+                    for n in range(n_users)
+                ),
+            )
+            crud.upsert_skills_bulk(db.session, [{"skill_id_string": "s", "name": "S"}])
+            crud.ensure_progress_bulk(
+                db.session, [(u, 1) for u in range(1, n_users + 1)]
+            )
+            db.session.remove()
+
+            stats = {
+                "lock": threading.Lock(),
+                "read": [],
+                "write": [],
+                "read_errors": 0,
+                "write_errors": 0,
+            }
+            deadline = time.perf_counter() + seconds
+            threads = [
+                threading.Thread(
+                    target=_worker,
+                    args=(app, role, deadline, seed, n_users, stats),
+                )
+                for seed, role in enumerate(
+                    ["read"] * n_readers + ["write"] * n_writers
+                )
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            print(f"--- {profile} ---")
+            for role in ("read", "write"):
+                print(format_summary(role, summarize(stats[role])))
+                print(
+                    f"{'':<32} ops/s={len(stats[role]) / seconds:,.0f} "
+                    f"locked={stats[f'{role}_errors']}"
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=6)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--users", type=int, default=200)
+    args = parser.parse_args()
+    run(args.seconds, args.readers, args.writers, args.users)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/common.py
+"""
+Shared helpers for the benchmark scripts: app construction against a
+throwaway file-backed SQLite database, timing and percentile summaries.
+"""
+
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from flask import Flask
+
+from flaskr import create_app, db
+
+
+@contextmanager
+def bench_app(
+    config: Optional[dict] = None, db_path: Optional[str] = None
+) -> Iterator[Flask]:
+    """
+    Yields an app (inside an app context) backed by a fresh SQLite file.
+    The file lives in a temporary directory unless `db_path` is given.
+    """
+    with tempfile.TemporaryDirectory(prefix="sigma-bench-") as tmp_dir:
+        path = db_path or os.path.join(tmp_dir, "bench.sqlite")
+        app_config = {
+            "TESTING": True,
+            "SECRET_KEY": "bench",
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+        }
+        app_config.update(config or {})
+        app = create_app(app_config)
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.engine.dispose()
+
+
+@contextmanager
+def timer() -> Iterator[Dict[str, float]]:
+    """Measures wall time of a block; read `result["seconds"]` afterwards."""
+    result = {"seconds": 0.0}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["seconds"] = time.perf_counter() - start
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Returns count, mean and p50/p95/p99/max (inputs and outputs in ms)."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": pct(50),
+        "p95": pct(95),
+        "p99": pct(99),
+        "max": ordered[-1],
+    }
+
+
+def format_summary(name: str, summary: Dict[str, float]) -> str:
+    """One aligned report line for a latency summary."""
+    if not summary.get("count"):
+        return f"{name:<32} (no samples)"
+    return (
+        f"{name:<32} n={summary['count']:<7} mean={summary['mean']:8.3f}ms "
+        f"p50={summary['p50']:8.3f}ms p95={summary['p95']:8.3f}ms "
+        f"p99={summary['p99']:8.3f}ms max={summary['max']:8.3f}ms"
+    )
@@ -0,0 +1,105 @@
+# benchmarks/fake_model_server.py
+"""
+A local stand-in for the Gemini generateContent API, for benchmarking and
+testing flaskr/model_client.py offline. Answers every POST with an
+arithmetic question as the model would (JSON text in the first candidate),
+after a simulated latency. A fraction of requests can fail with 503 or
+hang past the client's timeout. HTTP/1.1 keep-alive, one thread per
+connection; `connections` counts accepted TCP connections.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle and
+    # the client's delayed ACK add ~40ms to every keep-alive response
+    disable_nagle_algorithm = True
+    server: "FakeModelServer"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):  # pylint: disable=W0622
+        pass
+
+    def do_POST(self):  # pylint: disable=C0103
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            roll = server.rng.random()
+            a, b = server.rng.randint(1, 99), server.rng.randint(1, 99)
+            latency = (
+                server.rng.expovariate(1 / server.latency) if server.latency else 0
+            )
+        if roll < server.hang_rate:
+            time.sleep(server.hang_seconds)
+        else:
+            time.sleep(latency)
+        if roll < server.hang_rate + server.error_rate:
+            self._send(503, {"error": {"code": 503, "status": "UNAVAILABLE"}})
+            return
+        text = json.dumps({"question": f"What is {a} + {b}?", "answer": str(a + b)})
+        self._send(200, {"candidates": [{"content": {"parts": [{"text": text}]}}]})
+
+    def _send(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeModelServer(ThreadingHTTPServer):
+    """
+    Serves on 127.0.0.1 (a free port unless given) in a background thread;
+    use as a context manager. `latency` is the mean of an exponential
+    delay in seconds; `error_rate` and `hang_rate` are fractions of
+    requests. The rates and latency can be changed while it runs.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        hang_rate: float = 0.0,
+        hang_seconds: float = 5.0,
+        port: int = 0,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass to ConnectionPool / QUESTION_API_URL."""
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self) -> "FakeModelServer":
+        threading.Thread(
+            target=self.serve_forever, name="fake-model-server", daemon=True
+        ).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,286 @@
+# benchmarks/load_learners.py
+"""
+Simulated learners against the real WSGI app under gunicorn.
+
+Seeds a file-backed SQLite database (flaskr/seeding.py), starts gunicorn
+locally with the offline stub question generator, then runs concurrent
+learner threads. Each learner logs in through /auth/login, answers
+--questions practice questions (correctly with probability --accuracy,
+pausing an exponentially distributed think time before each answer) and
+logs out. Reports throughput, latency percentiles per endpoint and the
+server's SQL write time from /metrics, which includes waits for SQLite's
+write lock.
+
+Usage:
+    python -m benchmarks.load_learners --learners 50 --questions 20 --workers 2
+    python -m benchmarks.load_learners --server werkzeug --sqlite-profile production
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from http.cookies import SimpleCookie
+from typing import Dict, List, Optional, Tuple
+
+from werkzeug.serving import make_server
+
+from flaskr import create_app, db
+from flaskr.seeding import SEED_PASSWORD, SeedSpec, password_hashes, seed_database
+
+from .common import format_summary, summarize
+
+_QUESTION = re.compile(r"What is (-?\d+) ([+-]) (-?\d+)\?")
+_SQL_WRITE = re.compile(
+    r'^sigma_sql_statement_duration_seconds_(sum|count)\{kind="write"\} (\S+)$',
+    re.MULTILINE,
+)
+
+
+class Learner:
+    """One simulated learner: a keep-alive connection and a cookie jar."""
+
+    def __init__(self, port: int, identifier: str, skills: List[str], args, seed):
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        self.cookies: Dict[str, str] = {}
+        self.identifier = identifier
+        self.skills = skills
+        self.args = args
+        self.rng = random.Random(seed)
+        # Per endpoint: latencies (ms) and status counts
+        self.samples: Dict[str, List[float]] = {}
+        self.statuses: Counter = Counter()
+
+    def request(
+        self, endpoint: str, method: str, path: str, form: Optional[dict] = None
+    ) -> Tuple[int, bytes]:
+        headers = {}
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()  # Reconnects on the next request
+            self.statuses[(endpoint, "error")] += 1
+            return 0, b""
+        self.samples.setdefault(endpoint, []).append(
+            (time.perf_counter() - start) * 1000
+        )
+        self.statuses[(endpoint, response.status)] += 1
+        for header in response.headers.get_all("Set-Cookie") or ():
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        return response.status, data
+
+    def _answer_for(self, question: str) -> str:
+        match = _QUESTION.search(question)
+        if match is None or self.rng.random() >= self.args.accuracy:
+            return "I don't know"
+        a, op, b = int(match.group(1)), match.group(2), int(match.group(3))
+        return str(a + b if op == "+" else a - b)
+
+    def run(self) -> None:
+        """Logs in, practises, logs out."""
+        status, _ = self.request(
+            "POST /auth/login",
+            "POST",
+            "/auth/login",
+            {"identifier": self.identifier, "password": SEED_PASSWORD},
+        )
+        if status != 302:
+            return
+        for _ in range(self.args.questions):
+            skill = self.rng.choice(self.skills)
+            status, data = self.request(
+                "GET /practice/<skill>/question", "GET", f"/practice/{skill}/question"
+            )
+            if status != 200:
+                continue
+            question = json.loads(data)["question"]
+            time.sleep(self.rng.expovariate(1000 / self.args.think_ms))
+            self.request(
+                "POST /practice/<skill>/answer",
+                "POST",
+                f"/practice/{skill}/answer",
+                {"answer": self._answer_for(question)},
+            )
+        self.request("GET /auth/logout", "GET", "/auth/logout")
+        self.conn.close()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_health(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not become healthy")
+
+
+def _sql_write_totals(port: int) -> Tuple[float, float]:
+    # (seconds, statements) of SQL writes across all workers
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.request("GET", "/metrics")
+    text = conn.getresponse().read().decode()
+    totals = {kind: float(value) for kind, value in _SQL_WRITE.findall(text)}
+    return totals.get("sum", 0.0), totals.get("count", 0.0)
+
+
+def _seed(config: dict, spec: SeedSpec) -> List[str]:
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        seed_database(db.engine, spec, password_hashes(4))
+        db.engine.dispose()
+    return [f"seed-skill-{n}" for n in range(1, spec.skills + 1)]
+
+
+def run(args) -> None:
+    """Seeds, starts the server, runs the learners and prints the report."""
+    with tempfile.TemporaryDirectory(prefix="sigma-bench-") as tmp_dir:
+        config = {
+            "SECRET_KEY": "bench",
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_dir}/bench.sqlite",
+            "SQLITE_PROFILE": args.sqlite_profile,
+            "SESSION_TYPE": "sqlite",
+            "SESSION_SQLITE_PATH": os.path.join(tmp_dir, "sessions.sqlite"),
+            "METRICS_ENABLED": True,
+            "METRICS_MULTIPROCESS_DIR": os.path.join(tmp_dir, "metrics"),
+            "METRICS_FLUSH_INTERVAL": 1,
+            "SLOW_QUERY_LOG_PATH": os.path.join(tmp_dir, "slow_queries.sqlite"),
+            "SQL_INSTRUMENTATION_LOG": False,
+            "QUESTION_GENERATOR": "stub",
+            "QUESTION_STUB_LATENCY_MS": args.generator_latency_ms,
+            # Every learner logs in from 127.0.0.1
+            "LOGIN_THROTTLE_IP_LIMIT": args.learners * 10,
+        }
+        spec = SeedSpec(
+            users=max(args.users, args.learners), skills=args.skills, logs=args.logs
+        )
+        skills = _seed(config, spec)
+
+        port = _free_port()
+        process = server = None
+        if args.server == "gunicorn":
+            process = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "gunicorn",
+                    "--bind",
+                    f"127.0.0.1:{port}",
+                    "--workers",
+                    str(args.workers),
+                    "--threads",
+                    str(args.threads),
+                    "--log-level",
+                    "warning",
+                    # gunicorn evaluates literal arguments of the app factory
+                    f"flaskr:create_app({config!r})",
+                ]
+            )
+        else:
+            server = make_server("127.0.0.1", port, create_app(config), threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            _wait_for_health(port)
+            write_seconds, write_count = _sql_write_totals(port)
+            learners = [
+                Learner(port, f"seed-user-{n + 1}", skills, args, seed=n)
+                for n in range(args.learners)
+            ]
+            threads = [threading.Thread(target=learner.run) for learner in learners]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            time.sleep(1.5)  # Let every worker flush its metrics file
+            end_seconds, end_count = _sql_write_totals(port)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+            if server is not None:
+                server.shutdown()
+
+    samples: Dict[str, List[float]] = {}
+    statuses: Counter = Counter()
+    for learner in learners:
+        for endpoint, values in learner.samples.items():
+            samples.setdefault(endpoint, []).extend(values)
+        statuses.update(learner.statuses)
+    requests = sum(len(values) for values in samples.values())
+    answers = len(samples.get("POST /practice/<skill>/answer", ()))
+    print(
+        f"{args.learners} learners, {args.server}, sqlite profile "
+        f"{args.sqlite_profile}: {elapsed:.1f}s, {requests / elapsed:.1f} req/s, "
+        f"{answers / elapsed:.1f} answers/s"
+    )
+    for endpoint in sorted(samples):
+        print(format_summary(endpoint, summarize(samples[endpoint])))
+    print(
+        "status codes: "
+        + ", ".join(f"{k[0]} {k[1]}: {v}" for k, v in sorted(statuses.items(), key=str))
+    )
+    writes = end_count - write_count
+    if writes:
+        print(
+            f"SQL writes: {writes:.0f} statements, "
+            f"{end_seconds - write_seconds:.2f}s total, "
+            f"{(end_seconds - write_seconds) / writes * 1000:.2f}ms mean "
+            "(includes SQLite write-lock waits)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--learners", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=20, help="Per learner.")
+    parser.add_argument("--accuracy", type=float, default=0.7)
+    parser.add_argument("--think-ms", type=float, default=200, help="Mean think time.")
+    parser.add_argument(
+        "--server", choices=["gunicorn", "werkzeug"], default="gunicorn"
+    )
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument(
+        "--sqlite-profile", choices=["default", "production"], default="production"
+    )
+    parser.add_argument("--generator-latency-ms", type=float, default=0)
+    parser.add_argument("--users", type=int, default=1000, help="Seeded users.")
+    parser.add_argument("--skills", type=int, default=20)
+    parser.add_argument("--logs", type=int, default=100_000, help="Seeded history.")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# benchmarks/load_login_flood.py
+"""
+Legitimate-login latency during a credential-stuffing flood, with login
+throttling on and off.
+
+Starts the app on a local threaded WSGI server, measures a baseline of
+legitimate logins, then repeats the measurement while flood threads post
+wrong passwords from one "attacker" address (sent via X-Forwarded-For) at
+a fixed total rate.
+
+Usage:
+    python -m benchmarks.load_login_flood --logins 40 --flood-rate 100
+"""
+
+import argparse
+import http.client
+import logging
+import os
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from werkzeug.serving import make_server
+
+from flaskr import create_app, db
+from flaskr.models import User
+
+from .common import format_summary, summarize
+
+# Legitimate learners each come from their own address
+LEGIT_IP_PREFIX = "198.51.100."
+ATTACKER_IP = "203.0.113.66"
+
+
+def _post_login(port: int, identifier: str, password: str, ip: str) -> int:
+    body = urllib.parse.urlencode({"identifier": identifier, "password": password})
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        conn.request(
+            "POST",
+            "/auth/login",
+            body=body,
+            headers={
+                "Content-Type": "application/x-www-form-urlencoded",
+                "X-Forwarded-For": ip,
+            },
+        )
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def _legit_logins(port: int, count: int, first_ip: int):
+    samples = []
+    for n in range(count):
+        ip = f"{LEGIT_IP_PREFIX}{(first_ip + n) % 250 + 1}"
+        start = time.perf_counter()
+        status = _post_login(port, "learner", "correct horse", ip)
+        samples.append((time.perf_counter() - start) * 1000)
+        if status != 302:
+            raise RuntimeError(f"Legitimate login failed with HTTP {status}")
+    return samples
+
+
+def _flood(port: int, stop: threading.Event, statuses: list, rate: float) -> None:
+    # Open-loop: one attempt every 1/rate seconds, however slow the replies
+    interval = 1.0 / rate
+    next_at = time.monotonic()
+    n = 0
+    while not stop.is_set():
+        n += 1
+        statuses.append(_post_login(port, f"victim{n % 50}", "guess", ATTACKER_IP))
+        next_at += interval
+        time.sleep(max(0.0, next_at - time.monotonic()))
+
+
+def run(
+    logins: int, flooders: int, flood_rate: float, ip_limit: int, throttle: bool
+) -> None:
+    """Measures legit-login latency before and during a flood."""
+    with tempfile.TemporaryDirectory(prefix="sigma-bench-") as tmp_dir:
+        app = create_app(
+            {
+                "SECRET_KEY": "bench",
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_dir}/bench.sqlite",
+                "SESSION_FILE_DIR": os.path.join(tmp_dir, "sessions"),
+                "TRUSTED_PROXY_COUNT": 1,
+                "LOGIN_THROTTLE_ENABLED": throttle,
+                "LOGIN_THROTTLE_IP_LIMIT": ip_limit,
+            }
+        )
+        with app.app_context():
+            db.create_all()
+            user = User(user_identifier="learner")
+            user.set_password("correct horse")
+            db.session.add(user)
+            db.session.commit()
+
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            label = "throttle on" if throttle else "throttle off"
+            baseline = _legit_logins(server.port, logins, first_ip=0)
+            print(format_summary(f"{label}: idle", summarize(baseline)))
+
+            stop = threading.Event()
+            statuses: list = []
+            threads = [
+                threading.Thread(
+                    target=_flood,
+                    args=(server.port, stop, statuses, flood_rate / flooders),
+                )
+                for _ in range(flooders)
+            ]
+            for thread in threads:
+                thread.start()
+            # Ramp up: with throttling, until the attacker is being rejected
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline and not (throttle and 429 in statuses):
+                time.sleep(0.1)
+            flooded = _legit_logins(server.port, logins, first_ip=logins)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            print(format_summary(f"{label}: during flood", summarize(flooded)))
+            rejected = sum(1 for status in statuses if status == 429)
+            print(f"{'':<32} flood requests={len(statuses)} rejected(429)={rejected}")
+        finally:
+            server.shutdown()
+
+
+def main() -> None:
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # No access log
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--flooders", type=int, default=8)
+    parser.add_argument(
+        "--flood-rate", type=float, default=100, help="Attempts/second in total"
+    )
+    parser.add_argument(
+        "--ip-limit", type=int, default=20, help="LOGIN_THROTTLE_IP_LIMIT"
+    )
+    args = parser.parse_args()
+    for throttle in (True, False):
+        run(args.logins, args.flooders, args.flood_rate, args.ip_limit, throttle)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,17 +5,33 @@ Initializes the Flask app, extensions (like SQLAlchemy, Flask-Migrate),
 and registers blueprints. Implements configuration loading priority:
 Defaults -> instance/config.py -> Environment Variables -> Test Config.
 """
+
 import os
 import click
-from flask import Flask
+from flask import Flask, g
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_session import Session  # Import Flask-Session
 from flask_login import LoginManager  # Import Flask-Login
 from dotenv import load_dotenv  # Keep dotenv import here
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from . import calibration  # IRT ability/difficulty estimates (no model imports)
+from . import db_engine  # Engine event listeners (no model imports)
+from . import db_routing  # Read-replica routing session (no model imports)
+from . import hashing  # Password hashing service (no model imports)
+from . import instrumentation  # Per-request SQL stats (no model imports)
+from . import metrics  # Prometheus histograms (no model imports)
+from . import slow_queries  # Slow query log + CLI (no model imports)
+from . import profiling  # Sampled profiling middleware (no model imports)
+from . import questions  # Question generators (no model imports)
+from . import question_cache  # Generated-question cache (no model imports)
+from . import session_store  # SQLite session backend (no model imports)
+from . import throttle  # Login throttling (no model imports)
 
 # --- Instantiate extensions ---
-db = SQLAlchemy()
+# Sessions route read-only reads to replicas when DB_READ_REPLICAS is set
+db = SQLAlchemy(session_options={"class_": db_routing.RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()  # Instantiate LoginManager
 sess = Session()  # Instantiate Session
@@ -61,18 +77,124 @@ def create_app(test_config=None):
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
         GEMINI_API_KEY=None,
         # Flask-Session configuration
-        # Default: filesystem. Alternatives: redis, sqlalchemy, mongodb
+        # Default: filesystem. Alternatives: sqlite (flaskr/session_store.py),
+        # redis, sqlalchemy, mongodb
         SESSION_TYPE="filesystem",
         # Make sessions non-permanent (expire on browser close)
         SESSION_PERMANENT=False,
         SESSION_USE_SIGNER=True,  # Sign session cookie identifiers
         SESSION_FILE_DIR=default_session_dir,  # Dir for filesystem sessions
+        # Single WAL-mode database for SESSION_TYPE="sqlite"
+        SESSION_SQLITE_PATH=os.path.join(instance_path, "sessions.sqlite"),
+        SESSION_SQLITE_SWEEP_INTERVAL=300,  # Seconds between expiry sweeps
         SESSION_COOKIE_HTTPONLY=True,  # Prevent client-side JS access
         # CSRF protection ('Strict' is more secure but can break links)
         SESSION_COOKIE_SAMESITE="Lax",
         # SET TO TRUE IN PRODUCTION WITH HTTPS!
         SESSION_COOKIE_SECURE=False,
         # Add other config like SESSION_REDIS if using Redis
+        # Enforce FOREIGN KEY constraints on SQLite connections
+        SQLITE_FOREIGN_KEYS=True,
+        # SQLite engine profile (see flaskr/db_engine.py): "default" or
+        # "production" (WAL, tuned PRAGMAs, bounded pool, WAL checkpoints)
+        SQLITE_PROFILE="default",
+        SQLITE_BUSY_TIMEOUT_MS=5000,  # Wait this long for a write lock
+        SQLITE_MMAP_SIZE=256 * 1024 * 1024,  # Bytes of memory-mapped I/O
+        SQLITE_CACHE_SIZE_KIB=64 * 1024,  # Page cache per connection
+        SQLITE_POOL_SIZE=8,  # Connections per worker (>= request threads)
+        SQLITE_POOL_MAX_OVERFLOW=4,
+        SQLITE_POOL_TIMEOUT=10,  # Seconds to wait for a free connection
+        SQLITE_CHECKPOINT_INTERVAL=60,  # Seconds between WAL checkpoints
+        # Read replicas (see flaskr/db_routing.py): database URIs that serve
+        # read-only queries, round-robin
+        DB_READ_REPLICA_URIS=[],
+        DB_REPLICA_RETRY_INTERVAL=30,  # Seconds a failed replica is skipped
+        # Per-request SQL stats (see flaskr/instrumentation.py): X-SQL-*
+        # headers in debug mode, one JSON log line per request otherwise
+        SQL_INSTRUMENTATION_ENABLED=True,
+        SQL_INSTRUMENTATION_LOG=True,
+        SQL_N_PLUS_ONE_THRESHOLD=5,  # Repeats of one SELECT shape to flag
+        # Prometheus /metrics (see flaskr/metrics.py). With several gunicorn
+        # workers set METRICS_MULTIPROCESS_DIR so scrapes cover all of them
+        METRICS_ENABLED=False,
+        METRICS_TOKEN=None,  # Bearer token scrapes must send, when set
+        METRICS_MULTIPROCESS_DIR=None,
+        METRICS_FLUSH_INTERVAL=5,  # Seconds between per-worker file writes
+        # Slow query log (see flaskr/slow_queries.py, `flask slow-queries`)
+        SLOW_QUERY_ENABLED=True,
+        SLOW_QUERY_THRESHOLD_MS=100,  # Record statements slower than this
+        SLOW_QUERY_CAPACITY=10000,  # Ring buffer size (newest rows kept)
+        SLOW_QUERY_EXPLAIN=True,  # Store EXPLAIN QUERY PLAN (SQLite SELECTs)
+        SLOW_QUERY_LOG_PATH=os.path.join(instance_path, "slow_queries.sqlite"),
+        # Sampled request profiling (see flaskr/profiling.py, `flask profile`)
+        PROFILING_ENABLED=False,
+        PROFILING_SAMPLE_RATE=0,  # Profile 1 in N requests; 0 = token only
+        PROFILING_TOKEN_MAX_AGE=3600,  # Seconds an X-Profile-Token is valid
+        PROFILING_RETENTION=50,  # Newest .prof files kept
+        PROFILING_DIR=os.path.join(instance_path, "profiles"),
+        # Wrap each request in crud.unit_of_work (one commit per request)
+        CRUD_REQUEST_UNIT_OF_WORK=False,
+        # Password hashing pool (see flaskr/hashing.py)
+        PASSWORD_HASH_METHOD="scrypt",  # werkzeug method, e.g. "pbkdf2:sha256"
+        PASSWORD_HASH_WORKERS=2,  # Hashing processes per worker; 0 = inline
+        PASSWORD_HASH_MAX_PENDING=8,  # In-flight hashes before callers wait
+        PASSWORD_HASH_QUEUE_TIMEOUT=2.0,  # Seconds to wait before a 503
+        # Login throttling (see flaskr/throttle.py)
+        LOGIN_THROTTLE_ENABLED=True,
+        LOGIN_THROTTLE_WINDOW=60,  # Sliding window, seconds
+        LOGIN_THROTTLE_IDENTIFIER_LIMIT=10,  # Attempts per identifier/window
+        LOGIN_THROTTLE_IP_LIMIT=100,  # Attempts per client IP/window
+        LOGIN_THROTTLE_BACKEND="memory",  # "memory" (per worker) or "sqlite"
+        LOGIN_THROTTLE_SQLITE_PATH=os.path.join(instance_path, "login_throttle.sqlite"),
+        # Number of reverse proxies in front of the app whose X-Forwarded-*
+        # headers are trusted (needed for real client IPs behind Render)
+        TRUSTED_PROXY_COUNT=0,
+        # Flask-Login user snapshot cache (see flaskr/user_cache.py)
+        USER_CACHE_ENABLED=True,
+        USER_CACHE_SIZE=10000,  # Max cached users per worker
+        USER_CACHE_TTL=30,  # Seconds; bounds staleness across workers
+        # Write-behind QuestionLog buffering (see flaskr/log_writer.py)
+        QUESTION_LOG_WRITER_ENABLED=False,
+        QUESTION_LOG_BATCH_SIZE=200,  # Rows per multi-row INSERT
+        QUESTION_LOG_FLUSH_INTERVAL=1.0,  # Seconds between background flushes
+        QUESTION_LOG_QUEUE_SIZE=10000,  # Bounded queue; overflow spills to disk
+        QUESTION_LOG_SPILL_PATH=os.path.join(instance_path, "question_log_spill.jsonl"),
+        # Rows the database rejects even one at a time (bad FK, NOT NULL)
+        QUESTION_LOG_DEAD_LETTER_PATH=os.path.join(
+            instance_path, "question_log_dead_letter.jsonl"
+        ),
+        # Practice questions (see flaskr/questions.py)
+        QUESTION_GENERATOR="stub",  # Offline arithmetic generator
+        QUESTION_STUB_LATENCY_MS=0,  # Simulated model latency per question
+        # "gemini" generator (see flaskr/model_client.py)
+        QUESTION_API_URL="https://generativelanguage.googleapis.com",
+        QUESTION_MODEL="gemini-1.5-flash",
+        QUESTION_POOL_SIZE=8,  # Keep-alive connections per worker
+        QUESTION_TIMEOUT=10.0,  # Seconds per attempt
+        QUESTION_RETRY_ATTEMPTS=3,  # Tries per question, jittered backoff between
+        QUESTION_RETRY_BACKOFF=0.2,  # Base backoff in seconds, doubled per retry
+        QUESTION_BREAKER_FAILURES=5,  # Consecutive failures that open the circuit
+        QUESTION_BREAKER_RESET=30.0,  # Seconds open before a trial call
+        # Generated-question cache (see flaskr/question_cache.py)
+        QUESTION_CACHE_ENABLED=False,  # Worth enabling with a remote generator
+        QUESTION_CACHE_PATH=os.path.join(instance_path, "question_cache.sqlite"),
+        QUESTION_CACHE_MAX_BYTES=64 * 1024 * 1024,  # Shared tier, LRU-trimmed
+        QUESTION_CACHE_KEYS=1000,  # Prompts kept in memory per worker
+        QUESTION_CACHE_MEMORY_TTL=60,  # Seconds; picks up other workers' additions
+        QUESTION_CACHE_VARIANTS=20,  # Questions kept per prompt
+        QUESTION_CACHE_MAX_AGE=7 * 24 * 3600,  # Seconds a question is served
+        QUESTION_CACHE_FRESH_RATE=0.1,  # Hits that generate while a pool fills
+        QUESTION_CACHE_REPEAT_WINDOW=50,  # Learner's recent questions not repeated
+        # Adaptive difficulty (see flaskr/adaptive.py)
+        ADAPTIVE_POLICY="streak",  # Streak thresholds move the difficulty
+        # IRT calibration written by `flask calibrate` (see flaskr/calibration.py)
+        CALIBRATION_PATH=os.path.join(instance_path, "calibration.npz"),
+        CALIBRATION_CHECK_INTERVAL=5.0,  # Seconds between reload checks
+        # Accuracy the practice picker aims for with a fit; None = streak only
+        CALIBRATION_TARGET_ACCURACY=0.75,
+        # Spaced-repetition due queue (see flaskr/scheduler.py)
+        DUE_QUEUE_USERS=10000,  # Learners whose schedules each worker keeps
+        DUE_QUEUE_TTL=60,  # Seconds; bounds staleness across workers
     )
 
     # --- 2. Load Config from instance/config.py (if it exists) ---
@@ -90,6 +212,11 @@ def create_app(test_config=None):
         "FLASK_ENV",
         "FLASK_DEBUG",
         "SESSION_TYPE",  # Add session vars
+        "SQLITE_PROFILE",
+        "METRICS_MULTIPROCESS_DIR",
+        "METRICS_TOKEN",
+        "SESSION_FILE_DIR",
+        "SLOW_QUERY_LOG_PATH",
         # Add other expected env vars here (e.g., SESSION_FILE_DIR)
     ]
     for var in env_vars_to_check:
@@ -130,23 +257,65 @@ def create_app(test_config=None):
             pass  # Already exists
 
     # --- Initialize Extensions (MUST be after app creation and config) ---
+    db_engine.apply_engine_options(app.config)  # Pool settings, before engines
     db.init_app(app)
+    db_engine.init_app(app)  # Per-connection engine setup (SQLite PRAGMAs)
+    db_routing.init_app(app)  # Read-replica routing (if configured)
     migrate.init_app(app, db)
-    sess.init_app(app)  # Initialize Flask-Session
+    if app.config["SESSION_TYPE"] == "sqlite":
+        session_store.init_app(app)  # Built-in SQLite session backend
+    else:
+        sess.init_app(app)  # Initialize Flask-Session
     login_manager.init_app(app)  # Initialize Flask-Login
+    hashing.init_app(app)  # Password hashing pool + 503 on saturation
+    throttle.init_app(app)  # Login attempt limits
+    instrumentation.init_app(app)  # SQL statement counts/timing per request
+    metrics.init_app(app)  # /metrics; after the session interface and hasher
+    slow_queries.init_app(app)  # Slow statement ring buffer
+    questions.init_app(app)  # Question generator for the practice views
+    question_cache.init_app(app)  # Cached questions (if enabled)
+    calibration.init_app(app)  # Fitted difficulty, reloaded when refitted
+
+    if app.config["TRUSTED_PROXY_COUNT"]:
+        proxies = app.config["TRUSTED_PROXY_COUNT"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
+    profiling.init_app(app)  # Outermost WSGI layer when enabled
 
     # --- Import Models (Necessary for discovery, AFTER extensions init) ---
     # pylint: disable=C0415,W0611 # Allow import here, suppress unused warning
     # noqa: F401 # Ruff/Flake8 ignore F401 (unused import) for models discovery
     from . import models  # noqa: F401
 
+    # --- Optional Write-Behind QuestionLog Writer (needs models + engine) ---
+    from . import log_writer
+
+    log_writer.init_app(app)
+
+    # --- Cached User Loader (needs models) ---
+    from . import user_cache
+
+    if app.config["USER_CACHE_ENABLED"]:
+        user_cache.init_app(app)
+
+    # --- Adaptive Difficulty Engine (needs models) ---
+    from . import adaptive
+
+    adaptive.init_app(app)
+
+    # --- Spaced-Repetition Due Queue (needs models) ---
+    from . import scheduler
+
+    scheduler.init_app(app)
+
     # --- Import and Register Blueprints (AFTER extensions initialized) ---
     # pylint: disable=C0415 # Allow import here
     from . import routes
     from . import auth  # Import auth blueprint
+    from . import practice
 
     app.register_blueprint(routes.bp)
     app.register_blueprint(auth.auth_bp)  # Register auth blueprint
+    app.register_blueprint(practice.bp)
 
     # --- Register User Loader Callback ---
     # MUST be done after login_manager is initialized
@@ -156,7 +325,19 @@ def create_app(test_config=None):
     def user_loader_callback(user_id):
         return load_user(user_id)
 
+    # --- Per-Request Unit of Work (Optional) ---
+    if app.config["CRUD_REQUEST_UNIT_OF_WORK"]:
+        _register_request_unit_of_work(app)
+
     # --- Add CLI Commands (Optional) ---
+    from . import seeding  # Needs models
+
+    app.cli.add_command(seeding.seed_command)
+    app.cli.add_command(adaptive.recompute_command)
+    app.cli.add_command(calibration.calibrate_command)
+    app.cli.add_command(scheduler.due_users_command)
+    app.cli.add_command(question_cache.warm_command)
+
     @app.cli.command("init-db-legacy")
     def init_db_command():
         """Clear existing data & create new tables (LEGACY - use migrations)."""
@@ -172,3 +353,37 @@ def create_app(test_config=None):
         return "OK"
 
     return app
+
+
+def _register_request_unit_of_work(app):
+    """
+    Runs every request inside crud.unit_of_work(db.session): crud functions
+    flush instead of committing and the request commits once at the end
+    (or rolls back on a server error).
+    """
+    from . import crud  # pylint: disable=C0415
+
+    @app.before_request
+    def begin_unit_of_work():
+        g.crud_unit_of_work = crud.unit_of_work(db.session)
+        g.crud_unit_of_work.__enter__()
+
+    @app.after_request
+    def commit_unit_of_work(response):
+        uow = g.pop("crud_unit_of_work", None)
+        if uow is not None:
+            if response.status_code >= 500:
+                error = RuntimeError(f"Request failed with {response.status_code}")
+                uow.__exit__(RuntimeError, error, None)  # Rolls back
+            else:
+                # A failing commit surfaces as this request's error
+                uow.__exit__(None, None, None)
+        return response
+
+    @app.teardown_request
+    def rollback_unit_of_work(exc):
+        # Only reached with the block open when after_request did not run
+        uow = g.pop("crud_unit_of_work", None)
+        if uow is not None:
+            error = exc or RuntimeError("Request ended without a response")
+            uow.__exit__(type(error), error, None)  # Rolls back
@@ -0,0 +1,393 @@
+# flaskr/adaptive.py
+"""
+Adaptive difficulty engine.
+A policy maps (difficulty, correct_streak, incorrect_streak) and a graded
+answer to the next state. Its `step` is written with NumPy element-wise
+operations, so the same rule serves both modes of AdaptiveEngine:
+
+* per request, `next_state` applies it to one learner's state in memory,
+  and crud.record_answer applies the policy's equivalent SQL `assignments`
+  atomically in the UPDATE;
+* in batch, `recompute` replays every question_logs row through it with
+  NumPy arrays, all learners at once, and bulk-updates the user_progress
+  rows whose state changed (e.g. after the policy itself changed).
+
+ADAPTIVE_POLICY selects the policy from POLICIES.
+"""
+
+import time
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import click
+import numpy as np
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, bindparam, case, exists, update
+from sqlalchemy.engine import Engine
+
+from .models import QuestionLog, UserProgress
+
+# Key under app.extensions where the app's engine is stored
+EXTENSION_KEY = "adaptive_engine"
+
+# Streak rules of the default policy. A streak that reaches its threshold
+# moves the difficulty one level (within bounds) and resets.
+MIN_DIFFICULTY = 1
+MAX_DIFFICULTY = 5
+CORRECT_STREAK_TO_LEVEL_UP = 3
+INCORRECT_STREAK_TO_LEVEL_DOWN = 2
+# Difficulty of a skill the learner has not answered yet
+DEFAULT_DIFFICULTY = 2
+
+# Rows fetched per round trip and updated per transaction in batch mode
+_BLOCK = 100_000
+
+# Bind parameters of the write-back UPDATE, in Replay field order
+_UPDATE_PARAMS = (
+    "pair_user_id",
+    "pair_skill_id",
+    "new_difficulty",
+    "new_correct_streak",
+    "new_incorrect_streak",
+)
+
+State = Tuple[int, int, int]  # (difficulty, correct_streak, incorrect_streak)
+
+
+class StreakPolicy:
+    """
+    Moves up a level after `correct_to_level_up` correct answers in a row and
+    down after `incorrect_to_level_down` incorrect ones; any other answer
+    extends its own streak and clears the opposite one.
+    """
+
+    def __init__(
+        self,
+        min_difficulty: int = MIN_DIFFICULTY,
+        max_difficulty: int = MAX_DIFFICULTY,
+        correct_to_level_up: int = CORRECT_STREAK_TO_LEVEL_UP,
+        incorrect_to_level_down: int = INCORRECT_STREAK_TO_LEVEL_DOWN,
+    ):
+        self.min_difficulty = min_difficulty
+        self.max_difficulty = max_difficulty
+        self.correct_to_level_up = correct_to_level_up
+        self.incorrect_to_level_down = incorrect_to_level_down
+
+    def step(self, difficulty, correct_streak, incorrect_streak, is_correct):
+        """
+        Next state after one answer. Arguments are scalars or equal-length
+        arrays (one element per learner); so are the results.
+        """
+        is_incorrect = np.logical_not(is_correct)
+        level_up = np.logical_and(
+            is_correct,
+            np.logical_and(
+                correct_streak + 1 >= self.correct_to_level_up,
+                difficulty < self.max_difficulty,
+            ),
+        )
+        level_down = np.logical_and(
+            is_incorrect,
+            np.logical_and(
+                incorrect_streak + 1 >= self.incorrect_to_level_down,
+                difficulty > self.min_difficulty,
+            ),
+        )
+        return (
+            difficulty + np.where(level_up, 1, np.where(level_down, -1, 0)),
+            np.where(np.logical_and(is_correct, ~level_up), correct_streak + 1, 0),
+            np.where(
+                np.logical_and(is_incorrect, ~level_down), incorrect_streak + 1, 0
+            ),
+        )
+
+    def assignments(self, is_correct: bool) -> dict:
+        """
+        Server-side SET expressions for one graded answer, equivalent to
+        `step`. Every right-hand side reads the row's pre-update values, so
+        concurrent answers serialise on the row instead of overwriting each
+        other's read-modify-write.
+        """
+        difficulty = UserProgress.current_difficulty
+        if is_correct:
+            level_change = and_(
+                UserProgress.correct_streak + 1 >= self.correct_to_level_up,
+                difficulty < self.max_difficulty,
+            )
+            return {
+                "current_difficulty": case(
+                    (level_change, difficulty + 1), else_=difficulty
+                ),
+                "correct_streak": case(
+                    (level_change, 0), else_=UserProgress.correct_streak + 1
+                ),
+                "incorrect_streak": 0,
+            }
+        level_change = and_(
+            UserProgress.incorrect_streak + 1 >= self.incorrect_to_level_down,
+            difficulty > self.min_difficulty,
+        )
+        return {
+            "current_difficulty": case(
+                (level_change, difficulty - 1), else_=difficulty
+            ),
+            "correct_streak": 0,
+            "incorrect_streak": case(
+                (level_change, 0), else_=UserProgress.incorrect_streak + 1
+            ),
+        }
+
+
+# Policies selectable with ADAPTIVE_POLICY
+POLICIES: Dict[str, Callable[[], StreakPolicy]] = {"streak": StreakPolicy}
+DEFAULT_POLICY = StreakPolicy()
+
+
+class Replay(NamedTuple):
+    """Final adaptive state per (user_id, skill_id) pair, as parallel arrays."""
+
+    user_ids: np.ndarray
+    skill_ids: np.ndarray
+    difficulty: np.ndarray
+    correct_streak: np.ndarray
+    incorrect_streak: np.ndarray
+
+
+class RecomputeResult(NamedTuple):
+    """What a batch recompute read and wrote."""
+
+    logs: int
+    pairs: int
+    changed: int
+    # Pairs answered again while the recompute ran; left as they are
+    skipped: int
+
+
+def _changed_pairs(result: Replay, current: np.ndarray) -> np.ndarray:
+    """
+    Indexes into `result` of the pairs whose user_progress row (a row of
+    `current`: user_id, skill_id, difficulty, streaks) holds another state.
+    Pairs without a row are left out.
+    """
+    if not len(current):
+        return np.empty(0, dtype=np.int64)
+    current_keys = (current[:, 0] << 32) | current[:, 1]
+    sort = np.argsort(current_keys)
+    replayed_keys = (result.user_ids << 32) | result.skill_ids
+    rows = sort[
+        np.minimum(np.searchsorted(current_keys[sort], replayed_keys), len(sort) - 1)
+    ]
+    new_state = np.column_stack(
+        (result.difficulty, result.correct_streak, result.incorrect_streak)
+    )
+    return np.flatnonzero(
+        (current_keys[rows] == replayed_keys)
+        & (current[rows, 2:] != new_state).any(axis=1)
+    )
+
+
+def _read_history(engine: Engine, progress) -> tuple:
+    """
+    Graded answers in id order as (user_id << 32 | skill_id keys, is_correct,
+    last log id), plus every user_progress row as an (n, 5) array of
+    user_id, skill_id, difficulty, correct_streak, incorrect_streak. Reads
+    through the raw DB-API cursor in compact per-column blocks; building
+    ORM or Row objects would dominate the run.
+    """
+    key_blocks, answer_blocks = [], []
+    last_log_id = 0
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(
+            "SELECT id, user_id, skill_id, is_correct FROM question_logs "
+            "WHERE is_correct IS NOT NULL ORDER BY id"
+        )
+        read = 0
+        while True:
+            rows = cursor.fetchmany(_BLOCK)
+            if not rows:
+                break
+            block = np.array(rows, dtype=np.int64)
+            key_blocks.append((block[:, 1] << 32) | block[:, 2])
+            answer_blocks.append(block[:, 3].astype(bool))
+            last_log_id = int(block[-1, 0])
+            read += len(rows)
+            if progress is not None:
+                progress("read", read)
+        cursor.execute(
+            "SELECT user_id, skill_id, current_difficulty, correct_streak, "
+            "incorrect_streak FROM user_progress"
+        )
+        current = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 5)
+        cursor.close()
+    finally:
+        raw.close()
+    if not key_blocks:
+        return np.empty(0, np.int64), np.empty(0, bool), last_log_id, current
+    return (
+        np.concatenate(key_blocks),
+        np.concatenate(answer_blocks),
+        last_log_id,
+        current,
+    )
+
+
+class AdaptiveEngine:
+    """Runs a policy per request (in memory) or over whole histories (NumPy)."""
+
+    def __init__(self, policy=None, default_difficulty: int = DEFAULT_DIFFICULTY):
+        self.policy = policy or DEFAULT_POLICY
+        self.default_difficulty = default_difficulty
+
+    # --- Per-request mode ---
+
+    def initial_state(self) -> State:
+        """State of a skill the learner has not answered yet."""
+        return (self.default_difficulty, 0, 0)
+
+    def next_state(self, state: State, is_correct: bool) -> State:
+        """The state after one graded answer."""
+        return tuple(int(value) for value in self.policy.step(*state, is_correct))
+
+    # --- Batch mode ---
+
+    def replay(
+        self, user_ids: np.ndarray, skill_ids: np.ndarray, is_correct: np.ndarray
+    ) -> Replay:
+        """
+        Final state of every (user, skill) pair after its answers, given in
+        chronological order. The pairs advance together: step k applies the
+        k-th answer of every pair that has one, so the Python loop runs once
+        per answer of the longest history, not once per answer.
+        """
+        keys = (user_ids.astype(np.int64) << 32) | skill_ids.astype(np.int64)
+        return self._replay_keys(keys, np.asarray(is_correct, dtype=bool))
+
+    def _replay_keys(self, keys: np.ndarray, answers: np.ndarray) -> Replay:
+        # keys: user_id << 32 | skill_id per answer, in chronological order
+        order = np.argsort(keys, kind="stable")  # Keeps each pair's answers in order
+        keys = keys[order]
+        answers = answers[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        lengths = np.diff(np.r_[starts, len(keys)])
+
+        # Longest histories first, so the pairs still active at step k are
+        # a prefix of the state arrays
+        by_length = np.argsort(-lengths, kind="stable")
+        starts, lengths = starts[by_length], lengths[by_length]
+        longest = int(lengths[0]) if len(lengths) else 0
+        active = np.searchsorted(-lengths, -np.arange(longest), side="left")
+
+        difficulty = np.full(len(starts), self.default_difficulty, dtype=np.int32)
+        correct = np.zeros(len(starts), dtype=np.int32)
+        incorrect = np.zeros(len(starts), dtype=np.int32)
+        for k, n in enumerate(active):
+            difficulty[:n], correct[:n], incorrect[:n] = self.policy.step(
+                difficulty[:n], correct[:n], incorrect[:n], answers[starts[:n] + k]
+            )
+
+        pair_keys = keys[starts]
+        return Replay(
+            (pair_keys >> 32).astype(np.int64),
+            (pair_keys & 0xFFFFFFFF).astype(np.int64),
+            difficulty,
+            correct,
+            incorrect,
+        )
+
+    def recompute(
+        self,
+        engine: Engine,
+        dry_run: bool = False,
+        progress: Optional[Callable[[str, int], None]] = None,
+    ) -> RecomputeResult:
+        """
+        Replays every graded question_logs row (in id order, the order
+        record_answer applied them) and writes the resulting state to the
+        user_progress rows that differ, `_BLOCK` rows per transaction.
+        Pairs answered again after the logs were read keep their live state.
+        Calls `progress(stage, rows_so_far)` as it goes.
+        """
+        keys, answers, last_log_id, current = _read_history(engine, progress)
+        if not len(keys):
+            return RecomputeResult(0, 0, 0, 0)
+        result = self._replay_keys(keys, answers)
+        read = len(keys)
+        del keys, answers
+
+        changed = _changed_pairs(result, current)
+        if dry_run:
+            return RecomputeResult(read, len(result.user_ids), len(changed), 0)
+
+        updated = 0
+        stmt = (
+            update(UserProgress)
+            .where(
+                UserProgress.user_id == bindparam("pair_user_id"),
+                UserProgress.skill_id == bindparam("pair_skill_id"),
+                ~exists().where(
+                    QuestionLog.user_id == UserProgress.user_id,
+                    QuestionLog.skill_id == UserProgress.skill_id,
+                    QuestionLog.id > last_log_id,
+                ),
+            )
+            .values(
+                current_difficulty=bindparam("new_difficulty"),
+                correct_streak=bindparam("new_correct_streak"),
+                incorrect_streak=bindparam("new_incorrect_streak"),
+            )
+        )
+        for start in range(0, len(changed), _BLOCK):
+            chunk = changed[start : start + _BLOCK]
+            params = [
+                dict(zip(_UPDATE_PARAMS, row))
+                for row in zip(*(column[chunk].tolist() for column in result))
+            ]
+            with engine.begin() as conn:
+                updated += conn.execute(stmt, params).rowcount
+            if progress is not None:
+                progress("write", start + len(chunk))
+        return RecomputeResult(
+            read, len(result.user_ids), updated, len(changed) - updated
+        )
+
+
+# --- Flask integration ---
+
+
+def init_app(app: Flask) -> AdaptiveEngine:
+    """Creates the engine for the policy selected by ADAPTIVE_POLICY."""
+    name = app.config["ADAPTIVE_POLICY"]
+    if name not in POLICIES:
+        raise ValueError(f"Unknown ADAPTIVE_POLICY: {name!r}")
+    engine = AdaptiveEngine(POLICIES[name]())
+    app.extensions[EXTENSION_KEY] = engine
+    return engine
+
+
+def get_engine() -> AdaptiveEngine:
+    """The current app's adaptive engine."""
+    return current_app.extensions[EXTENSION_KEY]
+
+
+@click.command("recompute-difficulty")
+@click.option("--dry-run", is_flag=True, help="Count changes without writing.")
+@with_appcontext
+def recompute_command(dry_run):
+    """Replay all answers through the current policy and update progress."""
+    from . import db  # pylint: disable=C0415
+
+    start = time.perf_counter()
+
+    def report(stage: str, rows: int) -> None:
+        elapsed = time.perf_counter() - start
+        click.echo(f"\r{stage:<6} {rows:>12,} rows  {elapsed:7.1f}s", nl=False)
+
+    result = get_engine().recompute(db.engine, dry_run=dry_run, progress=report)
+    click.echo()
+    click.echo(
+        f"Replayed {result.logs:,} answers over {result.pairs:,} learner/skill "
+        f"pairs in {time.perf_counter() - start:.1f}s: {result.changed:,} "
+        + ("would change." if dry_run else f"updated, {result.skipped:,} skipped.")
+    )
@@ -4,6 +4,8 @@ Authentication blueprint using Flask-Login and server-side sessions.
 Handles login, logout, and user loading.
 """
 
+import math
+
 from flask import (
     Blueprint,
     render_template,
@@ -28,9 +30,15 @@ from flask_login import (
 # Import your User model and potentially CRUD functions
 from .models import User
 from . import db  # Import db for session access
+from . import user_cache
+from .hashing import get_hasher
+from .throttle import get_throttle
 
 # from . import crud # Or import specific functions like get_user_by_identifier
 
+# Flash shown (with HTTP 429) when login attempts exceed the throttle limits
+THROTTLED_MESSAGE = "Too many login attempts. Please try again later."
+
 # Create Blueprint
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 
@@ -60,19 +68,41 @@ def login():
         identifier = request.form.get("identifier")
         password = request.form.get("password")
         error = None
+
+        # Reject excess attempts before spending any time on password hashing
+        throttle = get_throttle()
+        if throttle is not None:
+            retry_after = throttle.attempt(identifier, request.remote_addr)
+            if retry_after is not None:
+                # Rendered directly rather than flashed: no session write, so a
+                # flood of rejected attempts stays cheap
+                headers = {"Retry-After": str(math.ceil(retry_after))}
+                page = render_template("auth/login.html", error=THROTTLED_MESSAGE)
+                return page, 429, headers
+
         user = get_user_by_identifier(identifier)  # Fetch user
 
         # Use a slightly more generic error message for security
         # (doesn't reveal if username exists)
-        if user is None or not user.check_password(password):
+        if user is None:
+            # Same hashing cost as a real check, so timing doesn't reveal it
+            get_hasher().check_dummy(password or "")
+            error = "Invalid credentials."
+        elif not user.check_password(password):
             error = "Invalid credentials."
         # elif not user.check_password(password): # Combined above
         #     error = "Incorrect password."
 
         if error is None and user:  # Ensure user is not None here
+            # Transparently upgrade hashes made with old parameters
+            if user.password_needs_rehash():
+                user.set_password(password)
+                db.session.commit()
             # Log the user in using Flask-Login
             # The second argument is 'remember me'
             login_user(user, remember=request.form.get("remember") == "on")
+            if throttle is not None:
+                throttle.reset_identifier(identifier)
             flash("Login successful!", "success")
             # Redirect to the page they were trying to access, or index
             next_page = request.args.get("next")
@@ -112,14 +142,16 @@ def profile():
 # *within* create_app in __init__.py because it needs the LoginManager
 # instance. We define it here for clarity, but registration happens
 # in __init__.py.
-def load_user(user_id: str) -> User | None:
-    """User loader callback for Flask-Login. Converts user ID from session."""
-    # Use db.session from the imported db instance
+def load_user(user_id: str):
+    """
+    User loader callback for Flask-Login. Converts user ID from session.
+    Returns a read-only UserSnapshot from the per-worker cache (or the ORM
+    User when USER_CACHE_ENABLED is off); use
+    user_cache.current_user_for_update() in views that modify the user.
+    """
     try:
         user_id_int = int(user_id)
-        # Use db.session.get for efficiency (identity map)
-        return db.session.get(User, user_id_int)
-        # Or: return crud.get_user_by_id(db.session, user_id_int)
     except ValueError:
         # If user_id is not a valid integer
         return None
+    return user_cache.load_user(user_id_int)
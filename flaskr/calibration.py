@@ -0,0 +1,436 @@
+# flaskr/calibration.py
+"""
+Data-driven difficulty: a 1PL (Rasch) IRT model fitted to
+question_logs.is_correct. Each learner has an ability theta, each item
+(skill, difficulty_presented) a difficulty b, and
+P(correct) = sigmoid(theta - b); a skill's difficulty is the answer-weighted
+mean of its items.
+
+Fitting is vectorised NumPy over plain arrays read through the raw DB-API
+cursor (no ORM objects), in bounded chunks, so tens of millions of
+responses fit on one machine. A full fit starts every parameter from a
+N(0, 1/PRIOR_PRECISION) prior; an incremental update reads only logs newer
+than the last fit and uses the stored estimates and their precision as the
+prior, so it behaves like an online Elo update whose step shrinks as
+evidence accumulates.
+
+Parameters live in one .npz file (CALIBRATION_PATH) as dense arrays indexed
+by user id and by (skill id, level), so lookups are O(1) array reads. The
+practice view picks, among the learner's streak level and its neighbours,
+the level whose predicted accuracy is closest to CALIBRATION_TARGET_ACCURACY
+(pick_level); until a learner and the items are calibrated it keeps the
+streak level.
+"""
+
+import os
+import threading
+import time
+from typing import Optional, Sequence, Tuple
+
+import click
+import numpy as np
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+from sqlalchemy.engine import Engine
+
+# Key under app.extensions where the app's CalibrationStore is stored
+EXTENSION_KEY = "calibration"
+
+# Precision (inverse variance) of the N(0, 1/p) prior on every parameter
+PRIOR_PRECISION = 1.0
+# Newton iterations of a full fit and of an incremental update
+FULL_FIT_ITERATIONS = 20
+UPDATE_ITERATIONS = 5
+# Answers an item needs before its difficulty steers question choice
+MIN_ITEM_ANSWERS = 20
+# Responses per vectorised chunk (bounds temporary arrays) and per fetch
+_CHUNK = 2_000_000
+_FETCH = 100_000
+
+
+class Calibration:
+    """
+    Fitted parameters as dense arrays: `ability[user_id]`,
+    `difficulty[skill_id, level]` and `skill_difficulty[skill_id]`, with
+    their precisions and answer counts. Ids the fit has not seen read as the
+    prior mean, 0.0.
+    """
+
+    __slots__ = (
+        "ability",
+        "ability_precision",
+        "difficulty",
+        "difficulty_precision",
+        "item_answers",
+        "skill_difficulty",
+        "last_log_id",
+    )
+
+    def __init__(
+        self,
+        ability: np.ndarray,
+        ability_precision: np.ndarray,
+        difficulty: np.ndarray,
+        difficulty_precision: np.ndarray,
+        item_answers: np.ndarray,
+        last_log_id: int,
+    ):
+        self.ability = ability
+        self.ability_precision = ability_precision
+        self.difficulty = difficulty
+        self.difficulty_precision = difficulty_precision
+        self.item_answers = item_answers
+        answers = item_answers.sum(axis=1)
+        self.skill_difficulty = np.divide(
+            (difficulty * item_answers).sum(axis=1),
+            answers,
+            out=np.zeros(len(answers)),
+            where=answers > 0,
+        )
+        self.last_log_id = last_log_id
+
+    @classmethod
+    def empty(cls) -> "Calibration":
+        """No parameters yet: every lookup returns the prior mean."""
+        return cls(
+            np.zeros(0),
+            np.zeros(0),
+            np.zeros((0, 0)),
+            np.zeros((0, 0)),
+            np.zeros((0, 0), dtype=np.int64),
+            0,
+        )
+
+    # --- O(1) lookups ---
+
+    def user_ability(self, user_id: int) -> float:
+        """Estimated ability of a learner (logits)."""
+        if 0 <= user_id < len(self.ability):
+            return float(self.ability[user_id])
+        return 0.0
+
+    def item_difficulty(self, skill_id: int, level: int) -> float:
+        """Estimated difficulty of a skill at a presented level (logits)."""
+        skills, levels = self.difficulty.shape
+        if 0 <= skill_id < skills and 0 <= level < levels:
+            return float(self.difficulty[skill_id, level])
+        return 0.0
+
+    def skill(self, skill_id: int) -> float:
+        """Estimated difficulty of a skill across its levels (logits)."""
+        if 0 <= skill_id < len(self.skill_difficulty):
+            return float(self.skill_difficulty[skill_id])
+        return 0.0
+
+    def p_correct(self, user_id: int, skill_id: int, level: int) -> float:
+        """Predicted probability that the learner answers the item correctly."""
+        logit = self.user_ability(user_id) - self.item_difficulty(skill_id, level)
+        return float(1.0 / (1.0 + np.exp(-logit)))
+
+    def pick_level(
+        self, user_id: int, skill_id: int, levels: Sequence[int], target: float
+    ) -> Optional[int]:
+        """
+        The level in `levels` whose predicted P(correct) for the learner is
+        closest to `target` (ties go to the earlier level), among items with
+        at least MIN_ITEM_ANSWERS answers. None if the learner has no fitted
+        answers or no level qualifies.
+        """
+        if not (
+            0 <= user_id < len(self.ability)
+            and self.ability_precision[user_id] > PRIOR_PRECISION
+        ):
+            return None
+        skills, known_levels = self.item_answers.shape
+        if not 0 <= skill_id < skills:
+            return None
+        calibrated = [
+            level
+            for level in levels
+            if 0 <= level < known_levels
+            and self.item_answers[skill_id, level] >= MIN_ITEM_ANSWERS
+        ]
+        if not calibrated:
+            return None
+        return min(
+            calibrated,
+            key=lambda level: abs(self.p_correct(user_id, skill_id, level) - target),
+        )
+
+    # --- Persistence ---
+
+    def save(self, path: str) -> None:
+        """Writes the parameters atomically (readers never see a partial file)."""
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            ability=self.ability,
+            ability_precision=self.ability_precision,
+            difficulty=self.difficulty,
+            difficulty_precision=self.difficulty_precision,
+            item_answers=self.item_answers,
+            last_log_id=np.int64(self.last_log_id),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Calibration":
+        """Reads parameters written by `save`."""
+        with np.load(path) as data:
+            return cls(
+                data["ability"],
+                data["ability_precision"],
+                data["difficulty"],
+                data["difficulty_precision"],
+                data["item_answers"],
+                int(data["last_log_id"]),
+            )
+
+
+# --- Fitting ---
+
+
+class Responses:
+    """Graded answers as parallel arrays: learner, skill, level, correctness."""
+
+    __slots__ = ("users", "skills", "levels", "correct", "last_log_id")
+
+    def __init__(self, users, skills, levels, correct, last_log_id: int):
+        self.users = users
+        self.skills = skills
+        self.levels = levels
+        self.correct = correct
+        self.last_log_id = last_log_id
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+
+def read_responses(engine: Engine, after_log_id: int = 0) -> Responses:
+    """
+    Graded question_logs rows with id > `after_log_id`, in compact arrays
+    (10 bytes per response), fetched through the raw DB-API cursor.
+    """
+    columns = ([], [], [], [])
+    last_log_id = after_log_id
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(
+            "SELECT id, user_id, skill_id, difficulty_presented, is_correct "
+            "FROM question_logs WHERE is_correct IS NOT NULL "
+            f"AND id > {int(after_log_id)} ORDER BY id"
+        )
+        while True:
+            rows = cursor.fetchmany(_FETCH)
+            if not rows:
+                break
+            block = np.array(rows, dtype=np.int64)
+            columns[0].append(block[:, 1].astype(np.int32))
+            columns[1].append(block[:, 2].astype(np.int32))
+            columns[2].append(block[:, 3].astype(np.int8))
+            columns[3].append(block[:, 4].astype(bool))
+            last_log_id = int(block[-1, 0])
+        cursor.close()
+    finally:
+        raw.close()
+    dtypes = (np.int32, np.int32, np.int8, bool)
+    arrays = [
+        np.concatenate(blocks) if blocks else np.empty(0, dtype)
+        for blocks, dtype in zip(columns, dtypes)
+    ]
+    return Responses(*arrays, last_log_id)
+
+
+def _grown(values: np.ndarray, shape: Tuple[int, ...], fill: float) -> np.ndarray:
+    """`values` padded with `fill` to at least `shape`."""
+    shape = tuple(max(old, new) for old, new in zip(values.shape, shape))
+    if shape == values.shape:
+        return values.copy()
+    out = np.full(shape, fill, dtype=values.dtype)
+    out[tuple(slice(0, size) for size in values.shape)] = values
+    return out
+
+
+def _newton_step(
+    params, prior_mean, prior_precision, index, other, other_index, sign, correct
+):
+    """
+    One diagonal Newton step on `params` (abilities when sign is 1,
+    difficulties when -1) with the `other` side held fixed; `index` and
+    `other_index` map each response to its parameter on either side.
+    Gradient and curvature are accumulated chunk by chunk with bincount.
+    Returns the new parameters and the likelihood's curvature (Fisher
+    information).
+    """
+    size = len(params)
+    gradient = np.zeros(size)
+    curvature = np.zeros(size)
+    for start in range(0, len(correct), _CHUNK):
+        rows = slice(start, start + _CHUNK)
+        own = index[rows]
+        p = 1.0 / (1.0 + np.exp(-sign * (params[own] - other[other_index[rows]])))
+        gradient += np.bincount(own, weights=sign * (correct[rows] - p), minlength=size)
+        curvature += np.bincount(own, weights=p * (1.0 - p), minlength=size)
+    gradient -= prior_precision * (params - prior_mean)
+    return params + gradient / (curvature + prior_precision), curvature
+
+
+def fit(
+    responses: Responses,
+    prior: Optional[Calibration] = None,
+    iterations: Optional[int] = None,
+) -> Calibration:
+    """
+    Fits `responses`, starting from `prior` (the previous fit, for an
+    incremental update) or from the N(0, 1/PRIOR_PRECISION) prior. Returns
+    the posterior estimates; their precision is the prior's plus the
+    information in `responses`.
+    """
+    prior = prior or Calibration.empty()
+    if iterations is None:
+        iterations = UPDATE_ITERATIONS if len(prior.ability) else FULL_FIT_ITERATIONS
+    users = int(responses.users.max(initial=0)) + 1
+    shape = (
+        int(responses.skills.max(initial=0)) + 1,
+        int(responses.levels.max(initial=0)) + 1,
+    )
+    ability_mean = _grown(prior.ability, (users,), 0.0)
+    ability_prior = _grown(prior.ability_precision, (users,), PRIOR_PRECISION)
+    difficulty_mean = _grown(prior.difficulty, shape, 0.0)
+    difficulty_prior = _grown(prior.difficulty_precision, shape, PRIOR_PRECISION)
+    answers = _grown(prior.item_answers, shape, 0)
+    items = np.ravel_multi_index(
+        (responses.skills, responses.levels), difficulty_mean.shape
+    )
+    item_count = difficulty_mean.size
+    ability = ability_mean.copy()
+    difficulty = difficulty_mean.ravel().copy()
+    ability_info = difficulty_info = None
+    for _ in range(iterations):
+        ability, ability_info = _newton_step(
+            ability,
+            ability_mean,
+            ability_prior,
+            responses.users,
+            difficulty,
+            items,
+            1,
+            responses.correct,
+        )
+        difficulty, difficulty_info = _newton_step(
+            difficulty,
+            difficulty_mean.ravel(),
+            difficulty_prior.ravel(),
+            items,
+            ability,
+            responses.users,
+            -1,
+            responses.correct,
+        )
+    if ability_info is None:
+        ability_info = np.zeros(len(ability))
+        difficulty_info = np.zeros(item_count)
+    answers.ravel()[:] += np.bincount(items, minlength=item_count)
+    return Calibration(
+        ability,
+        ability_prior + ability_info,
+        difficulty.reshape(difficulty_mean.shape),
+        difficulty_prior + difficulty_info.reshape(difficulty_mean.shape),
+        answers,
+        max(responses.last_log_id, prior.last_log_id),
+    )
+
+
+def log_loss(calibration: Calibration, responses: Responses) -> float:
+    """Mean negative log-likelihood of `responses` under `calibration`."""
+    if not len(responses):
+        return 0.0
+    total = 0.0
+    for start in range(0, len(responses), _CHUNK):
+        rows = slice(start, start + _CHUNK)
+        logit = (
+            calibration.ability[responses.users[rows]]
+            - calibration.difficulty[responses.skills[rows], responses.levels[rows]]
+        )
+        # -log sigmoid(+-logit), computed without overflow
+        total += np.logaddexp(
+            0.0, np.where(responses.correct[rows], -logit, logit)
+        ).sum()
+    return total / len(responses)
+
+
+# --- Flask integration ---
+
+
+class CalibrationStore:
+    """
+    The app's current Calibration, loaded from CALIBRATION_PATH and reloaded
+    when the file changes (checked at most every `check_interval` seconds).
+    """
+
+    def __init__(self, path: str, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._calibration = Calibration.empty()
+        self._mtime: Optional[float] = None
+        self._checked_at = float("-inf")
+
+    def get(self) -> Calibration:
+        """The latest saved calibration (empty until the first fit)."""
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            with self._lock:
+                self._checked_at = now
+                try:
+                    mtime = os.stat(self.path).st_mtime
+                except FileNotFoundError:
+                    mtime = None
+                if mtime is not None and mtime != self._mtime:
+                    self._calibration = Calibration.load(self.path)
+                self._mtime = mtime
+        return self._calibration
+
+
+def init_app(app: Flask) -> CalibrationStore:
+    """Registers the calibration store for CALIBRATION_PATH."""
+    store = CalibrationStore(
+        app.config["CALIBRATION_PATH"], app.config["CALIBRATION_CHECK_INTERVAL"]
+    )
+    app.extensions[EXTENSION_KEY] = store
+    return store
+
+
+def get_calibration() -> Calibration:
+    """The current app's calibration."""
+    return current_app.extensions[EXTENSION_KEY].get()
+
+
+@click.command("calibrate")
+@click.option("--full", is_flag=True, help="Refit from scratch, not incrementally.")
+@click.option("--iterations", type=int, default=None, help="Newton iterations.")
+@with_appcontext
+def calibrate_command(full, iterations):
+    """Fit learner ability and item difficulty from graded answers."""
+    from . import db  # pylint: disable=C0415
+
+    path = current_app.config["CALIBRATION_PATH"]
+    prior = None
+    if not full and os.path.exists(path):
+        prior = Calibration.load(path)
+    start = time.perf_counter()
+    responses = read_responses(db.engine, prior.last_log_id if prior else 0)
+    read_seconds = time.perf_counter() - start
+    if prior is not None and not len(responses):
+        click.echo(f"No answers after log {prior.last_log_id}; nothing to do.")
+        return
+    calibration = fit(responses, prior, iterations)
+    calibration.save(path)
+    click.echo(
+        f"{'Updated' if prior else 'Fitted'} with {len(responses):,} answers "
+        f"(read {read_seconds:.1f}s, total {time.perf_counter() - start:.1f}s); "
+        f"log loss {log_loss(calibration, responses):.4f}; "
+        f"{len(calibration.ability):,} learner and "
+        f"{int((calibration.item_answers > 0).sum()):,} item estimates in {path}"
+    )
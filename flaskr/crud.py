@@ -4,18 +4,156 @@ Basic CRUD (Create, Read, Update, Delete) operations for SQLAlchemy models.
 These functions expect a SQLAlchemy Session object. In a Flask context,
 this is typically obtained from the request context or managed by an extension,
 and then passed into these functions.
+Readers decorated with @replica_read may be served by a read replica (see
+flaskr/db_routing.py); write paths read through the primary.
 """
+
 import datetime
+from contextlib import contextmanager
+from sqlalchemy import (
+    DateTime,
+    String,
+    and_,
+    cast,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import (
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 # Import your models (adjust path if needed)
-from .models import User, Skill, UserProgress, QuestionLog
+from .adaptive import (  # noqa: F401 # Adaptive rules, re-exported
+    CORRECT_STREAK_TO_LEVEL_UP,
+    DEFAULT_POLICY,
+    INCORRECT_STREAK_TO_LEVEL_DOWN,
+    MAX_DIFFICULTY,
+    MIN_DIFFICULTY,
+)
+from .db_routing import read_only, replica_read
+from .scheduler import due_at_expression, note_due, review_interval
+from .hashing import get_hasher
+from .models import User, Skill, UserProgress, QuestionLog, CatalogVersion
 
 # Import 'db' if you need access to db.session within these functions,
 # but typically the session is passed in from the Flask request context.
 # from . import db  # <-- REMOVED THIS LINE as it was unused
 
+# Max values per IN list in bulk validation queries. Keeps every statement
+# well under SQLite's host-parameter limit.
+BULK_CHUNK_SIZE = 500
+
+
+class ProgressState(NamedTuple):
+    """Adaptive state of a UserProgress row after an answer is recorded."""
+
+    current_difficulty: int
+    correct_streak: int
+    incorrect_streak: int
+    log_id: Optional[int] = None
+
+
+class HistoryCursor(NamedTuple):
+    """
+    Keyset position in a learner's history: the last log already seen.
+    `question_timestamp` is the stored value rendered as text, so it orders
+    exactly like the column; SQLite stores timestamps as text, with or
+    without microseconds (CURRENT_TIMESTAMP vs Python datetimes).
+    """
+
+    question_timestamp: str
+    log_id: int
+
+
+class HistoryPage(NamedTuple):
+    """One page of history, newest first, and the cursor of the next page."""
+
+    logs: List[QuestionLog]
+    next_cursor: Optional[HistoryCursor]
+
+
+# --- Helpers ---
+
+
+def _commit(db_session: Session, *instances) -> None:
+    """
+    Commits and refreshes `instances`, or, inside unit_of_work(), only
+    flushes so generated IDs are available and leaves the commit to the
+    outermost unit of work.
+    """
+    if in_unit_of_work(db_session):
+        db_session.flush()
+        return
+    db_session.commit()
+    for instance in instances:
+        db_session.refresh(instance)
+
+
+def _chunks(items: Sequence, size: int = BULK_CHUNK_SIZE) -> Iterator[Sequence]:
+    """Yields successive slices of at most `size` items."""
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _dialect_insert(db_session: Session, model):
+    """
+    Returns a dialect-specific INSERT for `model` that supports ON CONFLICT
+    (SQLite and PostgreSQL), or None for other backends.
+    """
+    dialect_name = db_session.get_bind(mapper=model).dialect.name
+    if dialect_name == "sqlite":
+        return sqlite.insert(model)
+    if dialect_name == "postgresql":
+        return postgresql.insert(model)
+    return None
+
+
+# --- Unit of Work ---
+
+# Session.info key holding the current unit_of_work nesting depth
+_UOW_DEPTH_KEY = "crud_unit_of_work_depth"
+
+
+@contextmanager
+def unit_of_work(db_session: Session) -> Iterator[Session]:
+    """
+    Defers the commits of every crud call made inside the block. Functions
+    flush instead (so IDs are assigned) and the outermost block commits once
+    on success or rolls everything back on error. Blocks may nest.
+    """
+    depth = db_session.info.get(_UOW_DEPTH_KEY, 0)
+    db_session.info[_UOW_DEPTH_KEY] = depth + 1
+    try:
+        yield db_session
+    except BaseException:
+        db_session.info[_UOW_DEPTH_KEY] = depth
+        if depth == 0:
+            db_session.rollback()
+        raise
+    db_session.info[_UOW_DEPTH_KEY] = depth
+    if depth == 0:
+        db_session.commit()
+
+
+def in_unit_of_work(db_session: Session) -> bool:
+    """Returns True while `db_session` is inside unit_of_work()."""
+    return db_session.info.get(_UOW_DEPTH_KEY, 0) > 0
+
+
 # --- User CRUD ---
 
 
@@ -28,13 +166,13 @@ def create_user(db_session: Session, user_identifier: str) -> User:
 
     new_user = User(user_identifier=user_identifier)
     db_session.add(new_user)
-    # Commit should ideally happen at the end of a request lifecycle in Flask
-    # For standalone use or clarity, commit can be here. Let's assume it is.
-    db_session.commit()
-    db_session.refresh(new_user)  # Refresh to get ID and defaults like created_at
+    # Commit should ideally happen at the end of a request lifecycle in Flask;
+    # inside unit_of_work() it does, and this only flushes to get the ID.
+    _commit(db_session, new_user)  # Refresh to get ID and defaults like created_at
     return new_user
 
 
+@replica_read
 def get_user_by_id(db_session: Session, user_id: int) -> Optional[User]:
     """Gets a user by their primary key ID."""
     # Use session.get for efficient PK lookups (introduced in SQLAlchemy 1.4)
@@ -50,7 +188,8 @@ def update_user_identifier(
     db_session: Session, user_id: int, new_identifier: str
 ) -> Optional[User]:
     """Updates a user's identifier. Returns updated user or None if not found."""
-    user = get_user_by_id(db_session, user_id)
+    # Primary read: a lagging replica could miss the user or a stale row
+    user = db_session.get(User, user_id)
     if user:
         # Check for potential identifier conflict before updating
         existing = get_user_by_identifier(db_session, new_identifier)
@@ -60,21 +199,59 @@ def update_user_identifier(
             )
         user.user_identifier = new_identifier
         # updated_at is handled by onupdate=func.now() in the model
-        db_session.commit()
-        db_session.refresh(user)
+        _commit(db_session, user)
     return user
 
 
 def delete_user(db_session: Session, user_id: int) -> bool:
     """Deletes a user by ID. Returns True if deleted, False otherwise."""
-    user = get_user_by_id(db_session, user_id)
+    user = db_session.get(User, user_id)  # Primary read, as for any write
     if user:
         db_session.delete(user)
-        db_session.commit()
+        _commit(db_session)
         return True
     return False
 
 
+def create_users_bulk(db_session: Session, users: Iterable[dict]) -> int:
+    """
+    Creates many users with one validation query per chunk, a single
+    executemany INSERT and one commit. Each dict needs `user_identifier` and
+    either `password_hash` (preferred for large imports) or `password`.
+    Raises ValueError if any identifier is duplicated or already exists.
+    Returns the number of users created.
+    """
+    rows = []
+    for user in users:
+        password_hash = user.get("password_hash")
+        if password_hash is None:
+            if user.get("password") is None:
+                raise ValueError(
+                    f"User '{user.get('user_identifier')}' needs a password "
+                    "or password_hash."
+                )
+            password_hash = get_hasher().generate(user["password"])
+        rows.append(
+            {"user_identifier": user["user_identifier"], "password_hash": password_hash}
+        )
+    if not rows:
+        return 0
+
+    identifiers = [row["user_identifier"] for row in rows]
+    if len(set(identifiers)) != len(identifiers):
+        raise ValueError("Duplicate user identifiers in bulk input.")
+    for chunk in _chunks(identifiers):
+        existing = db_session.scalars(
+            select(User.user_identifier).where(User.user_identifier.in_(chunk))
+        ).all()
+        if existing:
+            raise ValueError(f"User identifiers already exist: {existing[:10]}")
+
+    db_session.execute(insert(User), rows)
+    _commit(db_session)
+    return len(rows)
+
+
 # --- Skill CRUD ---
 
 
@@ -93,11 +270,12 @@ def create_skill(
         skill_id_string=skill_id_string, name=name, description=description
     )
     db_session.add(new_skill)
-    db_session.commit()
-    db_session.refresh(new_skill)
+    bump_catalog_version(db_session, SKILL_CATALOG)
+    _commit(db_session, new_skill)
     return new_skill
 
 
+@replica_read
 def get_skill_by_id(db_session: Session, skill_id: int) -> Optional[Skill]:
     """Gets a skill by its primary key ID."""
     return db_session.get(Skill, skill_id)
@@ -108,12 +286,106 @@ def get_skill_by_id_string(db_session: Session, skill_id_str: str) -> Optional[S
     return db_session.query(Skill).filter(Skill.skill_id_string == skill_id_str).first()
 
 
+@replica_read
 def get_all_skills(db_session: Session) -> List[Skill]:
     """Gets all skills."""
     return db_session.query(Skill).order_by(Skill.name).all()
 
 
-# Add update_skill, delete_skill as needed
+def upsert_skills_bulk(db_session: Session, skills: Iterable[dict]) -> int:
+    """
+    Inserts or updates many skills keyed on `skill_id_string` and commits
+    once. Each dict needs `skill_id_string` and `name`; `description` is
+    optional. Uses INSERT ... ON CONFLICT DO UPDATE on SQLite/PostgreSQL.
+    Returns the number of distinct skills written.
+    """
+    # Last occurrence wins for duplicate keys, as a sequence of upserts would
+    by_key = {}
+    for skill in skills:
+        by_key[skill["skill_id_string"]] = {
+            "skill_id_string": skill["skill_id_string"],
+            "name": skill["name"],
+            "description": skill.get("description"),
+        }
+    rows = list(by_key.values())
+    if not rows:
+        return 0
+
+    stmt = _dialect_insert(db_session, Skill)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Skill.skill_id_string],
+            set_={
+                "name": stmt.excluded.name,
+                "description": stmt.excluded.description,
+            },
+        )
+        db_session.execute(stmt, rows)
+    else:
+        # Portable fallback: one lookup per chunk, then bulk insert/update
+        existing_ids = {}
+        for chunk in _chunks(list(by_key)):
+            existing_ids.update(
+                db_session.execute(
+                    select(Skill.skill_id_string, Skill.id).where(
+                        Skill.skill_id_string.in_(chunk)
+                    )
+                ).all()
+            )
+        new_rows = [r for r in rows if r["skill_id_string"] not in existing_ids]
+        changed_rows = [
+            {"id": existing_ids[r["skill_id_string"]], **r}
+            for r in rows
+            if r["skill_id_string"] in existing_ids
+        ]
+        if new_rows:
+            db_session.execute(insert(Skill), new_rows)
+        if changed_rows:
+            db_session.execute(update(Skill), changed_rows)
+    bump_catalog_version(db_session, SKILL_CATALOG)
+    _commit(db_session)
+    return len(rows)
+
+
+# Add update_skill, delete_skill as needed (and call bump_catalog_version)
+
+# --- Catalog Versions ---
+
+# Catalog name whose version tracks changes to the skills table
+SKILL_CATALOG = "skills"
+
+
+def bump_catalog_version(db_session: Session, name: str) -> None:
+    """
+    Increments a catalog's version in the caller's transaction (no commit).
+    Call it from every write to the catalog's tables so process-local caches
+    (see flaskr/skill_catalog.py) reload on their next version check.
+    """
+    stmt = _dialect_insert(db_session, CatalogVersion)
+    if stmt is not None:
+        db_session.execute(
+            stmt.values(name=name, version=1).on_conflict_do_update(
+                index_elements=[CatalogVersion.name],
+                set_={"version": CatalogVersion.version + 1},
+            )
+        )
+        return
+    result = db_session.execute(
+        update(CatalogVersion)
+        .where(CatalogVersion.name == name)
+        .values(version=CatalogVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db_session.add(CatalogVersion(name=name, version=1))
+
+
+def get_catalog_version(db_session: Session, name: str) -> int:
+    """Returns a catalog's current version (0 if it was never bumped)."""
+    version = db_session.scalar(
+        select(CatalogVersion.version).where(CatalogVersion.name == name)
+    )
+    return version or 0
+
 
 # --- UserProgress CRUD ---
 
@@ -132,29 +404,72 @@ def get_user_progress(
 def get_or_create_user_progress(
     db_session: Session, user_id: int, skill_id: int, default_difficulty: int = 2
 ) -> UserProgress:
-    """Gets existing progress or creates a new record for a user/skill."""
+    """
+    Gets existing progress or creates a new record for a user/skill.
+    Existing rows cost one SELECT. Missing rows are created with a single
+    INSERT ... ON CONFLICT (user_id, skill_id) DO NOTHING RETURNING, so two
+    concurrent callers never hit the uq_user_skill constraint. Unknown users
+    or skills are rejected by the foreign keys and raise ValueError.
+    """
     progress = get_user_progress(db_session, user_id, skill_id)
-    if not progress:
-        # Ensure user and skill exist before creating progress
-        user = get_user_by_id(db_session, user_id)
-        skill = get_skill_by_id(db_session, skill_id)
-        if not user:
-            raise ValueError(f"User with id={user_id} does not exist.")
-        if not skill:
-            raise ValueError(f"Skill with id={skill_id} does not exist.")
-
-        print(
-            f"Creating new progress for user {user_id}, skill {skill_id}"
-        )  # Debug log
-        progress = UserProgress(
+    if progress:
+        return progress
+
+    stmt = _dialect_insert(db_session, UserProgress)
+    if stmt is None:
+        return _create_user_progress_checked(
+            db_session, user_id, skill_id, default_difficulty
+        )
+
+    stmt = (
+        stmt.values(
             user_id=user_id,
             skill_id=skill_id,
             current_difficulty=default_difficulty,
-            # Streaks default to 0 per model definition
+            correct_streak=0,
+            incorrect_streak=0,
         )
-        db_session.add(progress)
-        db_session.commit()
-        db_session.refresh(progress)
+        .on_conflict_do_nothing(
+            index_elements=[UserProgress.user_id, UserProgress.skill_id]
+        )
+        .returning(UserProgress)
+    )
+    try:
+        progress = db_session.scalars(stmt).one_or_none()
+    except IntegrityError as exc:
+        if not in_unit_of_work(db_session):
+            db_session.rollback()
+        raise ValueError(
+            f"User with id={user_id} or skill with id={skill_id} does not exist."
+        ) from exc
+    if progress is None:
+        # Lost the race: another transaction inserted the row after our lookup
+        progress = get_user_progress(db_session, user_id, skill_id)
+    _commit(db_session)
+    return progress
+
+
+def _create_user_progress_checked(
+    db_session: Session, user_id: int, skill_id: int, default_difficulty: int
+) -> UserProgress:
+    """Portable get-or-create for dialects without ON CONFLICT support."""
+    # Ensure user and skill exist before creating progress (on the primary:
+    # a lagging replica may not have them yet)
+    user = db_session.get(User, user_id)
+    skill = db_session.get(Skill, skill_id)
+    if not user:
+        raise ValueError(f"User with id={user_id} does not exist.")
+    if not skill:
+        raise ValueError(f"Skill with id={skill_id} does not exist.")
+
+    progress = UserProgress(
+        user_id=user_id,
+        skill_id=skill_id,
+        current_difficulty=default_difficulty,
+        # Streaks default to 0 per model definition
+    )
+    db_session.add(progress)
+    _commit(db_session, progress)
     return progress
 
 
@@ -165,8 +480,13 @@ def update_user_progress_state(
     difficulty: Optional[int] = None,
     correct_streak: Optional[int] = None,
     incorrect_streak: Optional[int] = None,
+    is_correct: Optional[bool] = None,
 ) -> Optional[UserProgress]:
-    """Updates specific adaptive state fields of a UserProgress record."""
+    """
+    Updates specific adaptive state fields of a UserProgress record. When
+    the update grades an answer, pass its `is_correct` to reschedule the
+    next review (see flaskr/scheduler.py); otherwise `due_at` is kept.
+    """
     progress = get_user_progress(db_session, user_id, skill_id)
     if progress:
         updated = False
@@ -184,11 +504,128 @@ def update_user_progress_state(
             progress.last_interaction_at = datetime.datetime.now(
                 datetime.timezone.utc
             )  # Use timezone-aware UTC now  # Update interaction time
-            db_session.commit()
-            db_session.refresh(progress)
+            # Streaks cannot tell a miss apart: a level change resets both
+            if is_correct is not None:
+                progress.due_at = progress.last_interaction_at + review_interval(
+                    progress.current_difficulty, progress.correct_streak, is_correct
+                )
+                note_due(db_session, user_id, skill_id, progress.due_at)
+            _commit(db_session, progress)
     return progress
 
 
+def ensure_progress_bulk(
+    db_session: Session,
+    pairs: Iterable[Tuple[int, int]],
+    default_difficulty: int = 2,
+) -> int:
+    """
+    Makes sure a UserProgress row exists for every (user_id, skill_id) pair.
+    Validates all referenced users and skills with set-based queries, inserts
+    the missing rows with INSERT ... ON CONFLICT DO NOTHING and commits once.
+    Raises ValueError if a user or skill does not exist.
+    Returns the number of distinct pairs processed.
+    """
+    unique_pairs = list(dict.fromkeys((int(u), int(s)) for u, s in pairs))
+    if not unique_pairs:
+        return 0
+
+    user_ids = sorted({user_id for user_id, _ in unique_pairs})
+    skill_ids = sorted({skill_id for _, skill_id in unique_pairs})
+    found_users = set()
+    for chunk in _chunks(user_ids):
+        found_users.update(
+            db_session.scalars(select(User.id).where(User.id.in_(chunk)))
+        )
+    found_skills = set()
+    for chunk in _chunks(skill_ids):
+        found_skills.update(
+            db_session.scalars(select(Skill.id).where(Skill.id.in_(chunk)))
+        )
+    missing_users = set(user_ids) - found_users
+    if missing_users:
+        raise ValueError(f"Users do not exist: {sorted(missing_users)[:10]}")
+    missing_skills = set(skill_ids) - found_skills
+    if missing_skills:
+        raise ValueError(f"Skills do not exist: {sorted(missing_skills)[:10]}")
+
+    rows = [
+        {
+            "user_id": user_id,
+            "skill_id": skill_id,
+            "current_difficulty": default_difficulty,
+            "correct_streak": 0,
+            "incorrect_streak": 0,
+        }
+        for user_id, skill_id in unique_pairs
+    ]
+    stmt = _dialect_insert(db_session, UserProgress)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_nothing(
+            index_elements=[UserProgress.user_id, UserProgress.skill_id]
+        )
+        db_session.execute(stmt, rows)
+    else:
+        existing = set()
+        for chunk in _chunks(user_ids):
+            existing.update(
+                db_session.execute(
+                    select(UserProgress.user_id, UserProgress.skill_id).where(
+                        UserProgress.user_id.in_(chunk)
+                    )
+                ).tuples()
+            )
+        rows = [r for r in rows if (r["user_id"], r["skill_id"]) not in existing]
+        if rows:
+            db_session.execute(insert(UserProgress), rows)
+    _commit(db_session)
+    return len(unique_pairs)
+
+
+# --- Review Schedule ---
+
+
+@replica_read
+def get_due_schedule(
+    db_session: Session, user_id: int
+) -> List[Tuple[int, datetime.datetime]]:
+    """(skill_id, due_at) of every scheduled skill of a user, earliest first."""
+    return [
+        tuple(row)
+        for row in db_session.execute(
+            select(UserProgress.skill_id, UserProgress.due_at)
+            .where(UserProgress.user_id == user_id, UserProgress.due_at.is_not(None))
+            .order_by(UserProgress.due_at)
+        )
+    ]
+
+
+def iter_users_due(
+    db_session: Session, until: datetime.datetime, batch_size: int = 10_000
+) -> Iterator[Tuple[int, int, datetime.datetime]]:
+    """
+    Streams (user_id, due_skills, earliest_due_at) for every user with a
+    review due by `until`, e.g. the end of today for a reminder job. One
+    range scan on ix_user_progress_due, fetched `batch_size` rows at a time.
+    """
+    stmt = (
+        select(
+            UserProgress.user_id,
+            func.count(),
+            func.min(UserProgress.due_at),
+        )
+        .where(UserProgress.due_at <= until)
+        .group_by(UserProgress.user_id)
+        .order_by(UserProgress.user_id)
+        .execution_options(yield_per=batch_size)
+    )
+    with read_only(db_session):
+        result = db_session.execute(stmt)
+    with result:
+        for row in result:
+            yield tuple(row)
+
+
 # --- QuestionLog CRUD ---
 
 
@@ -211,11 +648,11 @@ def create_question_log(db_session: Session, log_data: dict) -> QuestionLog:
 
     new_log = QuestionLog(**log_data)
     db_session.add(new_log)
-    db_session.commit()
-    db_session.refresh(new_log)
+    _commit(db_session, new_log)
     return new_log
 
 
+@replica_read
 def get_recent_logs_for_user_skill(
     db_session: Session, user_id: int, skill_id: int, limit: int = 10
 ) -> List[QuestionLog]:
@@ -229,4 +666,202 @@ def get_recent_logs_for_user_skill(
     )
 
 
+@replica_read
+def get_recent_question_texts(
+    db_session: Session, user_id: int, skill_id: int, limit: int = 50
+) -> List[str]:
+    """Texts of a user's most recent questions in a skill, newest first."""
+    return list(
+        db_session.scalars(
+            select(QuestionLog.question_text_generated)
+            .where(QuestionLog.user_id == user_id, QuestionLog.skill_id == skill_id)
+            .order_by(QuestionLog.question_timestamp.desc())
+            .limit(limit)
+        )
+    )
+
+
+def _older_than(db_session: Session, cursor: HistoryCursor):
+    """
+    Keyset predicate for logs strictly before `cursor` in (question_timestamp,
+    id) order, written as `ts <= :ts AND (ts < :ts OR id < :id)` so the
+    leading range is served by ix_question_logs_user_skill_time.
+    """
+    timestamp = literal(cursor.question_timestamp, String)
+    if db_session.get_bind(mapper=QuestionLog).dialect.name != "sqlite":
+        timestamp = cast(timestamp, DateTime)
+    column = QuestionLog.question_timestamp
+    return and_(
+        column <= timestamp, or_(column < timestamp, QuestionLog.id < cursor.log_id)
+    )
+
+
+def _history_query(
+    db_session: Session, user_id: int, skill_id: int, before: Optional[HistoryCursor]
+):
+    """SELECT of a user's logs for a skill, newest first, older than `before`."""
+    stmt = (
+        select(QuestionLog)
+        .where(QuestionLog.user_id == user_id, QuestionLog.skill_id == skill_id)
+        .order_by(QuestionLog.question_timestamp.desc(), QuestionLog.id.desc())
+    )
+    if before is not None:
+        stmt = stmt.where(_older_than(db_session, before))
+    return stmt
+
+
+@replica_read
+def get_log_history_page(
+    db_session: Session,
+    user_id: int,
+    skill_id: int,
+    limit: int = 50,
+    before: Optional[HistoryCursor] = None,
+) -> HistoryPage:
+    """
+    Gets up to `limit` logs older than `before` (newest first when None).
+    Keyset pagination: every page costs the same index seek however deep it
+    is, unlike OFFSET. Pass the returned `next_cursor` back as `before` for
+    the next page; it is None once the history is exhausted.
+    """
+    stmt = _history_query(db_session, user_id, skill_id, before).add_columns(
+        cast(QuestionLog.question_timestamp, String).label("timestamp_key")
+    )
+    rows = db_session.execute(stmt.limit(limit + 1)).all()
+    logs = [log for log, _ in rows[:limit]]
+    if len(rows) <= limit:
+        return HistoryPage(logs, None)
+    return HistoryPage(logs, HistoryCursor(rows[limit - 1][1], logs[-1].id))
+
+
+def iter_log_history(
+    db_session: Session,
+    user_id: int,
+    skill_id: int,
+    before: Optional[HistoryCursor] = None,
+    batch_size: int = 1000,
+) -> Iterator[QuestionLog]:
+    """
+    Streams a user's logs for a skill, newest first, from one query fetched
+    `batch_size` rows at a time (yield_per), so memory stays constant however
+    long the history is as long as the caller does not keep the objects.
+    The session's transaction holds the query open until the iterator is
+    exhausted or closed.
+    """
+    stmt = _history_query(db_session, user_id, skill_id, before).execution_options(
+        yield_per=batch_size
+    )
+    with read_only(db_session):
+        result = db_session.scalars(stmt)
+    with result:
+        yield from result
+
+
+# --- Answer Recording ---
+
+
+def record_answer(
+    db_session: Session,
+    user_id: int,
+    skill_id: int,
+    is_correct: bool,
+    log_data: dict,
+    default_difficulty: int = 2,
+    policy=None,
+    submit_log: Optional[Callable[[dict], None]] = None,
+) -> ProgressState:
+    """
+    Records a graded answer atomically: inserts the QuestionLog row and
+    advances the user's streaks/difficulty with one UPDATE ... RETURNING,
+    then commits. `log_data` holds the remaining QuestionLog fields
+    (difficulty_presented, question_text_generated, ...).
+    The first answer for a skill also creates the progress row. The same
+    UPDATE schedules the pair's next review (due_at).
+    `policy` (an adaptive policy, DEFAULT_POLICY when None) supplies the
+    UPDATE's SET expressions.
+    With `submit_log` (e.g. the write-behind QuestionLogWriter.submit) the
+    log row is handed to it after the commit instead of being inserted in
+    this transaction; the returned `log_id` is then None.
+    """
+    log_row = {
+        **log_data,
+        "user_id": user_id,
+        "skill_id": skill_id,
+        "is_correct": is_correct,
+    }
+    log_id = None
+    if submit_log is None:
+        log_id = db_session.scalar(
+            insert(QuestionLog).values(**log_row).returning(QuestionLog.id)
+        )
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    assignments = (policy or DEFAULT_POLICY).assignments(is_correct)
+    stmt = (
+        update(UserProgress)
+        .where(UserProgress.user_id == user_id, UserProgress.skill_id == skill_id)
+        .values(
+            **assignments,
+            last_interaction_at=now,
+            due_at=due_at_expression(assignments, is_correct, now),
+        )
+    )
+    state = _execute_state_update(db_session, stmt, user_id, skill_id)
+    if state is None:
+        # First answer for this skill: create the row, then apply the answer
+        insert_stmt = _dialect_insert(db_session, UserProgress)
+        if insert_stmt is not None:
+            db_session.execute(
+                insert_stmt.values(
+                    user_id=user_id,
+                    skill_id=skill_id,
+                    current_difficulty=default_difficulty,
+                    correct_streak=0,
+                    incorrect_streak=0,
+                ).on_conflict_do_nothing(
+                    index_elements=[UserProgress.user_id, UserProgress.skill_id]
+                )
+            )
+        else:
+            db_session.add(
+                UserProgress(
+                    user_id=user_id,
+                    skill_id=skill_id,
+                    current_difficulty=default_difficulty,
+                )
+            )
+            db_session.flush()
+        state = _execute_state_update(db_session, stmt, user_id, skill_id)
+
+    note_due(
+        db_session, user_id, skill_id, now + review_interval(*state[:2], is_correct)
+    )
+    _commit(db_session)
+    if submit_log is not None:
+        submit_log(log_row)
+    return ProgressState(*state, log_id=log_id)
+
+
+def _execute_state_update(
+    db_session: Session, stmt, user_id: int, skill_id: int
+) -> Optional[Tuple[int, int, int]]:
+    """Runs a UserProgress UPDATE and returns the new adaptive state."""
+    state_columns = (
+        UserProgress.current_difficulty,
+        UserProgress.correct_streak,
+        UserProgress.incorrect_streak,
+    )
+    if db_session.get_bind(mapper=UserProgress).dialect.update_returning:
+        row = db_session.execute(stmt.returning(*state_columns)).first()
+        return tuple(row) if row is not None else None
+    if db_session.execute(stmt).rowcount == 0:
+        return None
+    row = db_session.execute(
+        select(*state_columns).where(
+            UserProgress.user_id == user_id, UserProgress.skill_id == skill_id
+        )
+    ).first()
+    return tuple(row) if row is not None else None
+
+
 # Add other specific query functions as needed
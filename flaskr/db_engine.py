@@ -0,0 +1,168 @@
+# flaskr/db_engine.py
+"""
+Engine-level database configuration applied in the application factory.
+Registers connection event listeners on the SQLAlchemy engines created by
+Flask-SQLAlchemy (e.g. SQLite PRAGMAs that must be set per connection).
+
+With SQLITE_PROFILE = "production", file-backed SQLite engines also get WAL
+journaling (readers no longer block the writer), synchronous=NORMAL, a busy
+timeout, memory-mapped I/O, a larger page cache, a bounded connection pool
+and a background thread that checkpoints the WAL periodically.
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import OperationalError
+
+PRODUCTION_PROFILE = "production"
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record) -> None:
+    """Connect listener: SQLite ignores FOREIGN KEY clauses unless asked."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _is_file_sqlite(url) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database not in (
+        None,
+        "",
+        ":memory:",
+    )
+
+
+def production_pragmas(config) -> list:
+    """PRAGMA statements run on every new connection in the production profile."""
+    return [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        # Negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KIB'])}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def production_engine_options(config) -> dict:
+    """
+    Pool settings for a file-backed SQLite engine in the production profile.
+    Sized per worker process: one connection per request thread plus a
+    little overflow for background threads (log writer, checkpointer).
+    """
+    return {
+        "pool_size": config["SQLITE_POOL_SIZE"],
+        "max_overflow": config["SQLITE_POOL_MAX_OVERFLOW"],
+        "pool_timeout": config["SQLITE_POOL_TIMEOUT"],
+        # Python's sqlite3 busy handler; the PRAGMA above sets the same limit
+        "connect_args": {"timeout": config["SQLITE_BUSY_TIMEOUT_MS"] / 1000},
+    }
+
+
+def apply_engine_options(config) -> None:
+    """
+    Merges production pool settings into SQLALCHEMY_ENGINE_OPTIONS. Must run
+    before `db.init_app`, which creates the engines. Explicit options win.
+    """
+    if config.get("SQLITE_PROFILE") != PRODUCTION_PROFILE:
+        return
+    if not _is_file_sqlite(config["SQLALCHEMY_DATABASE_URI"]):
+        return
+    options = dict(production_engine_options(config))
+    options.update(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+
+class WalCheckpointer:
+    """
+    Runs `PRAGMA wal_checkpoint(PASSIVE)` every `interval` seconds so the
+    WAL is folded back into the database even when long readers keep
+    SQLite's automatic checkpoints from completing. Started lazily and per
+    process, so a forked worker gets its own thread.
+    """
+
+    def __init__(self, engine: Engine, interval: float):
+        self.engine = engine
+        self.interval = interval
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self) -> None:
+        """Starts the checkpoint thread in this process if not running."""
+        if self.interval <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            thread = threading.Thread(
+                target=self._run, name="sqlite-wal-checkpoint", daemon=True
+            )
+            thread.start()
+            self._pid = os.getpid()
+
+    def checkpoint(self) -> tuple:
+        """Checkpoints now; returns SQLite's (busy, log, checkpointed) row."""
+        with self.engine.connect() as conn:
+            return tuple(conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)").one())
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.checkpoint()
+            except OperationalError:
+                # Busy or locked: the next interval will catch up
+                pass
+
+
+def _configure_production_sqlite(engine: Engine, config) -> WalCheckpointer:
+    pragmas = production_pragmas(config)
+    checkpointer = WalCheckpointer(engine, config["SQLITE_CHECKPOINT_INTERVAL"])
+
+    def apply_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+        checkpointer.ensure_started()
+
+    event.listen(engine, "connect", apply_pragmas)
+    return checkpointer
+
+
+def configure_engine(engine: Engine, config) -> Optional[WalCheckpointer]:
+    """
+    Attaches per-connection setup for `engine` based on app config. Returns
+    the engine's WAL checkpointer when the production profile applies.
+    """
+    if engine.dialect.name != "sqlite":
+        return None
+    if config.get("SQLITE_FOREIGN_KEYS", True):
+        # crud relies on the FKs to reject progress/logs for unknown rows
+        event.listen(engine, "connect", _enable_sqlite_foreign_keys)
+    if config.get("SQLITE_PROFILE") == PRODUCTION_PROFILE and _is_file_sqlite(
+        engine.url
+    ):
+        return _configure_production_sqlite(engine, config)
+    return None
+
+
+def init_app(app: Flask) -> None:
+    """Configures every engine (default and binds) of the app's `db`."""
+    from . import db  # pylint: disable=C0415
+
+    checkpointers = {}  # Keyed like db.engines (None is the default bind)
+    with app.app_context():
+        for key, engine in db.engines.items():
+            checkpointer = configure_engine(engine, app.config)
+            if checkpointer is not None:
+                checkpointers[key] = checkpointer
+    app.extensions["sqlite_checkpointers"] = checkpointers
@@ -0,0 +1,201 @@
+# flaskr/db_routing.py
+"""
+Read/write engine routing for `db.session`.
+Reads marked read-only (the `replica_read` crud functions, `read_only`
+blocks and `read_only_view` views) go to the replica databases listed in
+DB_READ_REPLICA_URIS, chosen round-robin. Everything else, and every read
+after the session has written anything, goes to the primary so a request
+always sees its own writes. A replica that fails to connect is skipped for
+DB_REPLICA_RETRY_INTERVAL seconds; with no healthy replica, reads fall back
+to the primary.
+"""
+
+import functools
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from flask import Flask, current_app, has_app_context
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql.dml import UpdateBase
+
+from . import db_engine
+
+# Key under app.extensions where the app's router is stored
+EXTENSION_KEY = "db_router"
+# Session.info keys
+_READ_ONLY_KEY = "db_routing_read_only_depth"
+_STICKY_KEY = "db_routing_wrote"
+_ROUTED_KEY = "db_routing_last_replica"
+
+
+class ReplicaRouter:
+    """Round-robin choice among healthy replica engines."""
+
+    def __init__(
+        self,
+        primary: Engine,
+        replicas: List[Engine],
+        retry_interval: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.retry_interval = retry_interval
+        self._clock = clock
+        self._next = itertools.cycle(range(len(self.replicas)))
+        self._down_until: Dict[Engine, float] = {}
+        self._lock = threading.Lock()
+
+    def choose(self) -> Optional[Engine]:
+        """Returns the next healthy replica, or None to use the primary."""
+        now = self._clock()
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = self.replicas[next(self._next)]
+                if self._down_until.get(replica, 0.0) <= now:
+                    return replica
+        return None
+
+    def mark_down(self, replica: Engine) -> None:
+        """Skips `replica` for the next `retry_interval` seconds."""
+        with self._lock:
+            self._down_until[replica] = self._clock() + self.retry_interval
+
+    def healthy(self) -> List[Engine]:
+        """Replicas currently eligible for reads."""
+        now = self._clock()
+        with self._lock:
+            return [r for r in self.replicas if self._down_until.get(r, 0.0) <= now]
+
+
+class RoutingSession(FlaskSession):
+    """Flask-SQLAlchemy session that sends read-only reads to replicas."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None:
+            return engine
+        router = _current_router()
+        if router is None or engine is not router.primary:
+            return engine
+        if isinstance(clause, UpdateBase):
+            # Core INSERT/UPDATE/DELETE (e.g. record_answer) write too
+            self.info[_STICKY_KEY] = True
+            return engine
+        if (
+            self.info.get(_READ_ONLY_KEY)
+            and not self.info.get(_STICKY_KEY)
+            and not self._flushing
+        ):
+            replica = router.choose()
+            if replica is not None:
+                self.info[_ROUTED_KEY] = replica
+                return replica
+        return engine
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _stick_to_primary(session, flush_context) -> None:
+    # Anything flushed is visible only on the primary until replicated
+    session.info[_STICKY_KEY] = True
+
+
+def _current_router() -> Optional[ReplicaRouter]:
+    if not has_app_context():
+        return None
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+# --- Marking reads as read-only ---
+
+
+@contextmanager
+def read_only(db_session) -> Iterator[None]:
+    """Routes the block's reads to a replica unless the session has written."""
+    db_session.info[_READ_ONLY_KEY] = db_session.info.get(_READ_ONLY_KEY, 0) + 1
+    try:
+        yield
+    finally:
+        db_session.info[_READ_ONLY_KEY] -= 1
+
+
+def has_written(db_session) -> bool:
+    """True once the session has written; its reads then use the primary."""
+    return bool(db_session.info.get(_STICKY_KEY))
+
+
+def replica_read(func):
+    """
+    Decorator for crud readers taking `db_session` first: runs them
+    read-only, and once more on the primary if the replica they were
+    routed to fails with an OperationalError.
+    """
+
+    @functools.wraps(func)
+    def wrapper(db_session, *args, **kwargs):
+        db_session.info.pop(_ROUTED_KEY, None)
+        try:
+            with read_only(db_session):
+                return func(db_session, *args, **kwargs)
+        except OperationalError:
+            replica = db_session.info.pop(_ROUTED_KEY, None)
+            router = _current_router()
+            if replica is None or router is None:
+                raise
+            router.mark_down(replica)
+            return func(db_session, *args, **kwargs)
+
+    return wrapper
+
+
+def read_only_view(view):
+    """Decorator for views whose queries may all be served by a replica."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        from . import db  # pylint: disable=C0415
+
+        with read_only(db.session):
+            return view(*args, **kwargs)
+
+    return wrapper
+
+
+# --- Flask integration ---
+
+
+def init_app(app: Flask) -> Optional[ReplicaRouter]:
+    """Builds the router and replica engines from DB_READ_REPLICA_URIS."""
+    uris = app.config["DB_READ_REPLICA_URIS"]
+    if not uris:
+        return None
+    from . import db  # pylint: disable=C0415
+
+    # Same options as the primary; not Flask-SQLAlchemy binds, so that
+    # db.create_all() and migrations never target a replica.
+    options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    replicas = [create_engine(uri, **options) for uri in uris]
+    for replica in replicas:
+        db_engine.configure_engine(replica, app.config)
+    with app.app_context():
+        router = ReplicaRouter(
+            db.engine,
+            replicas,
+            retry_interval=app.config["DB_REPLICA_RETRY_INTERVAL"],
+        )
+
+    def replica_error(context) -> None:
+        # Connection failures (no connection yet) or dropped connections
+        if context.connection is None or context.is_disconnect:
+            router.mark_down(context.engine)
+
+    for replica in replicas:
+        event.listen(replica, "handle_error", replica_error)
+    app.extensions[EXTENSION_KEY] = router
+    return router
@@ -0,0 +1,207 @@
+# flaskr/hashing.py
+"""
+Password hashing service.
+Runs werkzeug's scrypt/PBKDF2 in a small process pool so a burst of logins
+does not monopolise the request threads of a worker. A per-process cap on
+in-flight hashing operations, with a queue timeout, makes overload fail
+fast (HashingUnavailable -> HTTP 503) instead of piling up requests.
+A pool broken by a dead worker (e.g. OOM-killed) is replaced on the next
+call rather than failing every login until the process restarts.
+"""
+
+import atexit
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional
+
+from flask import Flask, current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Key under app.extensions where the app's hasher is stored
+EXTENSION_KEY = "password_hasher"
+
+
+class HashingUnavailable(Exception):
+    """Raised when no hashing slot frees up within the queue timeout."""
+
+
+def _generate(password: str, method: str) -> str:
+    # Module-level so the process pool can pickle it
+    return generate_password_hash(password, method=method)
+
+
+def _check(pwhash: str, password: str) -> bool:
+    return check_password_hash(pwhash, password)
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords, off the request thread when `workers` > 0.
+
+    At most `max_pending` operations run or wait in the pool at once; a
+    caller that cannot get a slot within `queue_timeout` seconds gets
+    HashingUnavailable. With `workers=0` hashing runs inline (still capped).
+    """
+
+    def __init__(
+        self,
+        method: str = "scrypt",
+        workers: int = 2,
+        max_pending: int = 8,
+        queue_timeout: float = 2.0,
+    ):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._executor_lock = threading.Lock()
+        self._method_prefix: Optional[str] = None
+        self._dummy_hash: Optional[str] = None
+        self._timing_listeners: List[Callable[[str, float], None]] = []
+
+    # --- Public API ---
+
+    def generate(self, password: str) -> str:
+        """Returns a new hash of `password` using the configured method."""
+        return self._run(_generate, password, self.method)
+
+    def check(self, pwhash: str, password: str) -> bool:
+        """Verifies `password` against a stored werkzeug hash."""
+        return self._run(_check, pwhash, password)
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        """
+        True if `pwhash` was made with other parameters than the configured
+        method (e.g. pbkdf2 vs scrypt, or a different work factor).
+        """
+        return pwhash.split("$", 1)[0] != self.method_prefix
+
+    def check_dummy(self, password: str) -> bool:
+        """
+        Verifies `password` against a cached hash of a random secret. Used
+        for unknown identifiers so they cost the same as a real check and
+        response timing does not reveal which identifiers exist.
+        """
+        self.check(self._dummy(), password)
+        return False
+
+    @property
+    def method_prefix(self) -> str:
+        """Fully expanded method string werkzeug writes for `self.method`."""
+        if self._method_prefix is None:
+            # werkzeug expands defaults (e.g. "scrypt" -> "scrypt:32768:8:1");
+            # hashing once is the only stable way to learn the expansion.
+            self._method_prefix = self._dummy().split("$", 1)[0]
+        return self._method_prefix
+
+    def add_timing_listener(self, listener: Callable[[str, float], None]) -> None:
+        """
+        Registers `listener(operation, seconds)`, called after every
+        "generate"/"check" with its duration including the wait for a slot.
+        """
+        self._timing_listeners.append(listener)
+
+    def shutdown(self) -> None:
+        """Stops the worker processes (if any were started)."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    # --- Internals ---
+
+    def _run(self, fn, *args):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HashingUnavailable(
+                f"Password hashing saturated ({self.max_pending} in flight)."
+            )
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            executor = self._pool()
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                # A worker died; the executor never recovers, so replace it
+                self._discard_pool(executor)
+            try:
+                return self._pool().submit(fn, *args).result()
+            except BrokenProcessPool as error:
+                self._discard_pool(self._executor)
+                raise HashingUnavailable("Password hashing pool failed.") from error
+        finally:
+            self._slots.release()
+            if self._timing_listeners:
+                seconds = time.perf_counter() - start
+                operation = fn.__name__.lstrip("_")
+                for listener in self._timing_listeners:
+                    listener(operation, seconds)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Created lazily and per process: a forked gunicorn worker must not
+        # reuse the master's executor.
+        with self._executor_lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                # "spawn" avoids forking a process that has live threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _discard_pool(self, executor: Optional[ProcessPoolExecutor]) -> None:
+        # Only if no other thread has replaced the broken executor already
+        with self._executor_lock:
+            if executor is not None and self._executor is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _dummy(self) -> str:
+        # Hash of a random secret, made in the pool (a race only hashes twice)
+        if self._dummy_hash is None:
+            self._dummy_hash = self.generate(secrets.token_urlsafe(16))
+        return self._dummy_hash
+
+
+# --- Flask integration ---
+
+# Inline hasher used outside an app context (scripts, model unit tests)
+_default_hasher = PasswordHasher(workers=0)
+
+
+def init_app(app: Flask) -> PasswordHasher:
+    """Creates the app's hasher from the PASSWORD_HASH_* settings."""
+    hasher = PasswordHasher(
+        method=app.config["PASSWORD_HASH_METHOD"],
+        workers=app.config["PASSWORD_HASH_WORKERS"],
+        max_pending=app.config["PASSWORD_HASH_MAX_PENDING"],
+        queue_timeout=app.config["PASSWORD_HASH_QUEUE_TIMEOUT"],
+    )
+    app.extensions[EXTENSION_KEY] = hasher
+    atexit.register(hasher.shutdown)
+
+    @app.errorhandler(HashingUnavailable)
+    def hashing_unavailable(error):
+        app.logger.warning("Rejecting request: %s", error)
+        return "Service busy, please retry shortly.", 503, {"Retry-After": "1"}
+
+    return hasher
+
+
+def get_hasher() -> PasswordHasher:
+    """Returns the current app's hasher, or an inline default one."""
+    if has_app_context():
+        hasher = current_app.extensions.get(EXTENSION_KEY)
+        if hasher is not None:
+            return hasher
+    return _default_hasher
@@ -0,0 +1,215 @@
+# flaskr/instrumentation.py
+"""
+Per-request SQL instrumentation.
+Hooks SQLAlchemy's before/after_cursor_execute on every engine to count
+statements and time them. Statements are reduced to fingerprints (literals
+and IN lists replaced by placeholders) so a request that runs the same
+SELECT shape many times, the signature of an N+1 lazy load such as
+iterating `user.progress`, is flagged. Totals go to X-SQL-* response
+headers in debug mode and to one structured log line per request otherwise.
+Other modules can observe every statement with `add_query_listener`.
+"""
+
+import functools
+import json
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, List, Tuple
+
+from flask import Flask, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Header names exposed in debug mode
+HEADER_COUNT = "X-SQL-Queries"
+HEADER_TIME = "X-SQL-Time-ms"
+HEADER_N_PLUS_ONE = "X-SQL-N-Plus-One"
+
+# Collectors receiving the current context's statements (request + captures)
+_collectors: ContextVar[Tuple["QueryStats", ...]] = ContextVar(
+    "sql_collectors", default=()
+)
+_listeners: List[Callable] = []
+_engine_hooks_installed = False
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PARAMS = re.compile(r"\?|%\(\w+\)s|%s|:\w+")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"(VALUES\s*\([^)]*\))(?:\s*,\s*\([^)]*\))+", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """
+    Normalises a SQL statement to its shape: literals and bound parameters
+    become `?`, IN lists and multi-row VALUES collapse to one entry.
+    """
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _STRING.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    shape = _PARAMS.sub("?", shape)
+    shape = _IN_LIST.sub("IN (?...)", shape)
+    shape = _VALUES_LIST.sub(r"\1, ...", shape)
+    return shape
+
+
+class QueryStats:
+    """Statement count, total time and fingerprint counts for one scope."""
+
+    def __init__(self, n_plus_one_threshold: int = 5):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints: Counter = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        """Adds one executed statement."""
+        self.count += 1
+        self.seconds += seconds
+        self.fingerprints[fingerprint(statement)] += 1
+
+    @property
+    def milliseconds(self) -> float:
+        """Total statement time in milliseconds."""
+        return self.seconds * 1000
+
+    def n_plus_one(self) -> List[Tuple[str, int]]:
+        """SELECT shapes repeated at least `n_plus_one_threshold` times."""
+        return [
+            (shape, times)
+            for shape, times in self.fingerprints.most_common()
+            if times >= self.n_plus_one_threshold and shape.upper().startswith("SELECT")
+        ]
+
+    def report(self) -> str:
+        """Multi-line summary, most repeated statement shapes first."""
+        lines = [f"{self.count} statements in {self.milliseconds:.1f}ms"]
+        lines.extend(
+            f"  {times:>4}x {shape}" for shape, times in self.fingerprints.most_common()
+        )
+        return "\n".join(lines)
+
+
+# --- Engine hooks ---
+
+
+def add_query_listener(listener: Callable) -> None:
+    """
+    Registers `listener(conn, statement, parameters, seconds)`, called after
+    every statement executed through any SQLAlchemy engine.
+    """
+    _install_engine_hooks()
+    _listeners.append(listener)
+
+
+def remove_query_listener(listener: Callable) -> None:
+    """Unregisters a listener added with `add_query_listener`."""
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the per-execution context, so a statement that raises leaves
+    # nothing behind on the pooled connection
+    context.sql_start_time = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "sql_start_time", None)
+    if start is None:
+        return
+    seconds = time.perf_counter() - start
+    for stats in _collectors.get():
+        stats.record(statement, seconds)
+    for listener in _listeners:
+        listener(conn, statement, parameters, seconds)
+
+
+def _install_engine_hooks() -> None:
+    # Listening on the Engine class covers the primary, binds and replicas
+    global _engine_hooks_installed  # pylint: disable=global-statement
+    if _engine_hooks_installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    _engine_hooks_installed = True
+
+
+@contextmanager
+def capture_queries(n_plus_one_threshold: int = 5) -> Iterator[QueryStats]:
+    """Collects the statements executed in this context during the block."""
+    _install_engine_hooks()
+    stats = QueryStats(n_plus_one_threshold)
+    token = _collectors.set(_collectors.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _collectors.reset(token)
+
+
+@contextmanager
+def assert_query_budget(max_queries: int) -> Iterator[QueryStats]:
+    """
+    Fails with AssertionError if the block runs more than `max_queries`
+    statements. The message lists the statement shapes that ran.
+    """
+    with capture_queries() as stats:
+        yield stats
+    assert (
+        stats.count <= max_queries
+    ), f"Query budget exceeded: {stats.count} > {max_queries}\n{stats.report()}"
+
+
+# --- Flask integration ---
+
+
+def init_app(app: Flask) -> None:
+    """Collects per-request SQL stats when SQL_INSTRUMENTATION_ENABLED."""
+    _install_engine_hooks()
+    if not app.config["SQL_INSTRUMENTATION_ENABLED"]:
+        return
+    threshold = app.config["SQL_N_PLUS_ONE_THRESHOLD"]
+
+    @app.before_request
+    def start_query_stats():
+        g.sql_stats = QueryStats(threshold)
+        g.sql_stats_token = _collectors.set(_collectors.get() + (g.sql_stats,))
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.get("sql_stats")
+        if stats is None:
+            return response
+        suspects = stats.n_plus_one()
+        if app.debug:
+            response.headers[HEADER_COUNT] = str(stats.count)
+            response.headers[HEADER_TIME] = f"{stats.milliseconds:.2f}"
+            response.headers[HEADER_N_PLUS_ONE] = str(len(suspects))
+        elif app.config["SQL_INSTRUMENTATION_LOG"]:
+            line = {
+                "event": "sql_stats",
+                "method": request.method,
+                "path": request.path,
+                "endpoint": request.endpoint,
+                "status": response.status_code,
+                "queries": stats.count,
+                "sql_ms": round(stats.milliseconds, 2),
+                "n_plus_one": [
+                    {"statement": shape[:200], "count": times}
+                    for shape, times in suspects
+                ],
+            }
+            log = app.logger.warning if suspects else app.logger.info
+            log(json.dumps(line))
+        return response
+
+    @app.teardown_request
+    def stop_query_stats(exc):
+        token = g.pop("sql_stats_token", None)
+        if token is not None:
+            _collectors.reset(token)
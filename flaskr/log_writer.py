@@ -0,0 +1,327 @@
+# flaskr/log_writer.py
+"""
+Write-behind buffered writer for QuestionLog rows.
+Accepts log payloads into a bounded in-process queue and flushes them to the
+database with multi-row INSERTs once a size or time threshold is reached.
+Payloads that cannot be written (queue full, database error, failed flush at
+shutdown) are appended to a JSONL spill file and replayed on the next flush.
+When a batch is rejected its rows are retried one by one, and rows the
+database still refuses go to a JSONL dead-letter file instead of blocking
+every later flush.
+"""
+
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import threading
+from typing import List, Optional
+
+from flask import Flask, current_app
+from sqlalchemy import exc
+
+logger = logging.getLogger(__name__)
+
+# Key under app.extensions where the writer for an app is stored
+EXTENSION_KEY = "question_log_writer"
+
+# Errors that say the database is unavailable, not that a row is bad: rows
+# hitting these are kept in the spill file for the next flush
+_TRANSIENT_ERRORS = (exc.OperationalError, exc.InterfaceError)
+
+
+class QuestionLogWriter:
+    """
+    Buffers QuestionLog payloads and writes them in batches.
+
+    The writer owns a daemon thread (started lazily on first submit, so it is
+    created inside each gunicorn worker rather than the master) that flushes
+    whenever `batch_size` rows are pending or `flush_interval` seconds pass.
+    At most one flush interval of accepted rows can be lost on a hard crash;
+    everything else goes either to the database or to the spill file.
+    """
+
+    def __init__(
+        self,
+        engine,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+        spill_path: Optional[str] = None,
+        dead_letter_path: Optional[str] = None,
+    ):
+        # Imported lazily: models imports `db` from the package __init__
+        from .models import QuestionLog
+
+        self._engine = engine
+        self._table = QuestionLog.__table__
+        self._columns = [c.name for c in self._table.columns if c.name != "id"]
+        # NOT NULL columns a payload must fill (the timestamp is stamped here)
+        self._required = [
+            c.name
+            for c in self._table.columns
+            if not c.nullable and c.name not in ("id", "question_timestamp")
+        ]
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.dead_letter_path = dead_letter_path
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max_queue)
+        self._flush_lock = threading.Lock()  # Serialises flushes and spills
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    # --- Producer side ---
+
+    def submit(self, log_data: dict) -> None:
+        """
+        Queues a QuestionLog payload for a later batched INSERT.
+        Stamps `question_timestamp` now, so the stored time reflects when the
+        answer happened rather than when the batch was written.
+        """
+        row = self._normalize(log_data)
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            logger.warning("QuestionLog queue full; spilling payload to disk.")
+            self._spill([row])
+            return
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        """Returns the approximate number of queued, unwritten payloads."""
+        return self._queue.qsize()
+
+    def _normalize(self, log_data: dict) -> dict:
+        missing = [field for field in self._required if log_data.get(field) is None]
+        if missing:
+            raise ValueError(f"Missing required QuestionLog fields: {missing}")
+        unknown = set(log_data) - set(self._columns)
+        if unknown:
+            raise ValueError(f"Unknown QuestionLog fields: {sorted(unknown)}")
+
+        row = {column: log_data.get(column) for column in self._columns}
+        if row["question_timestamp"] is None:
+            row["question_timestamp"] = datetime.datetime.now(datetime.timezone.utc)
+        return row
+
+    # --- Consumer side ---
+
+    def flush(self) -> int:
+        """
+        Synchronously writes all queued payloads plus any spilled ones.
+        Returns the number of rows inserted. If the database is unavailable
+        the rows are spilled to disk instead and 0 is returned; if it rejects
+        the batch, the rows are retried one by one (see `_insert_each`).
+        """
+        with self._flush_lock:
+            queued = self._drain()
+            spilled = self._read_spill()
+            rows = spilled + queued
+            if not rows:
+                return 0
+            try:
+                with self._engine.begin() as conn:
+                    for start in range(0, len(rows), self.batch_size):
+                        chunk = rows[start : start + self.batch_size]
+                        # Multi-row VALUES: one statement per chunk
+                        conn.execute(self._table.insert().values(chunk))
+            except _TRANSIENT_ERRORS:
+                logger.exception(
+                    "QuestionLog flush failed; spilling %d rows.", len(queued)
+                )
+                # Spilled rows are still on disk; only the queued ones move
+                self._write_spill(queued)
+                return 0
+            except Exception:  # pylint: disable=broad-except
+                logger.exception(
+                    "QuestionLog batch rejected; retrying %d rows one by one.",
+                    len(rows),
+                )
+                return self._insert_each(rows, replaces_spill=bool(spilled))
+            # Only discard the spill file once its rows are committed
+            if spilled:
+                os.remove(self.spill_path)
+            return len(rows)
+
+    def _insert_each(self, rows: List[dict], replaces_spill: bool) -> int:
+        """
+        Inserts rows in their own transactions after a rejected batch. Rows
+        the database refuses go to the dead-letter file; if it becomes
+        unavailable, the rest are kept in the spill file. Returns the number
+        inserted. Caller holds the lock.
+        """
+        written, rejected, kept = 0, [], []
+        for index, row in enumerate(rows):
+            try:
+                with self._engine.begin() as conn:
+                    conn.execute(self._table.insert().values(row))
+            except _TRANSIENT_ERRORS:
+                kept = rows[index:]
+                break
+            except Exception as error:  # pylint: disable=broad-except
+                logger.error("Dead-lettering QuestionLog row: %s", error)
+                rejected.append(row)
+            else:
+                written += 1
+        if rejected:
+            self._append(self.dead_letter_path, rejected, "dead-letter")
+        if not replaces_spill:
+            self._write_spill(kept)
+            return written
+        # Swap the replayed spill file for what is left of it, in one rename
+        partial = f"{self.spill_path}.tmp"
+        if os.path.exists(partial):
+            os.remove(partial)
+        if self._append(partial, kept, "spill"):
+            os.replace(partial, self.spill_path)
+        else:
+            os.remove(self.spill_path)
+        return written
+
+    def close(self) -> None:
+        """Stops the background thread and flushes whatever is left."""
+        self._stopped.set()
+        self._wakeup.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout=max(self.flush_interval, 1.0) * 5)
+        self.flush()
+
+    def _drain(self) -> List[dict]:
+        rows = []
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                return rows
+
+    def _ensure_thread(self) -> None:
+        # A forked worker inherits the object but not the thread
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="question-log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            self.flush()
+
+    # --- Spill file ---
+
+    def _spill(self, rows: List[dict]) -> None:
+        with self._flush_lock:
+            self._write_spill(rows)
+
+    def _write_spill(self, rows: List[dict]) -> None:
+        """Appends rows to the spill file and fsyncs. Caller holds the lock."""
+        self._append(self.spill_path, rows, "spill")
+
+    @staticmethod
+    def _append(path: Optional[str], rows: List[dict], kind: str) -> bool:
+        """Appends rows to a JSONL file and fsyncs; False if nothing written."""
+        if not rows:
+            return False
+        if not path:
+            logger.error(
+                "No %s path configured; dropping %d QuestionLog rows.", kind, len(rows)
+            )
+            return False
+        with open(path, "a", encoding="utf-8") as fh:
+            for row in rows:
+                fh.write(json.dumps(row, default=_json_default) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+        return True
+
+    def _read_spill(self) -> List[dict]:
+        """Reads rows from the spill file. Caller holds the lock."""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return []
+        rows = []
+        with open(self.spill_path, encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    logger.warning("Skipping unreadable spill line.")
+                    continue
+                timestamp = row.get("question_timestamp")
+                if isinstance(timestamp, str):
+                    row["question_timestamp"] = datetime.datetime.fromisoformat(
+                        timestamp
+                    )
+                rows.append(row)
+        return rows
+
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialise {type(value).__name__} to the spill file.")
+
+
+# --- Flask integration ---
+
+
+def init_app(app: Flask) -> Optional[QuestionLogWriter]:
+    """Creates the app's writer if QUESTION_LOG_WRITER_ENABLED is set."""
+    if not app.config.get("QUESTION_LOG_WRITER_ENABLED"):
+        return None
+
+    from . import db  # pylint: disable=C0415
+
+    with app.app_context():
+        engine = db.engine
+    writer = QuestionLogWriter(
+        engine,
+        batch_size=app.config["QUESTION_LOG_BATCH_SIZE"],
+        flush_interval=app.config["QUESTION_LOG_FLUSH_INTERVAL"],
+        max_queue=app.config["QUESTION_LOG_QUEUE_SIZE"],
+        spill_path=app.config["QUESTION_LOG_SPILL_PATH"],
+        dead_letter_path=app.config["QUESTION_LOG_DEAD_LETTER_PATH"],
+    )
+    app.extensions[EXTENSION_KEY] = writer
+    # Synchronous flush when the worker process shuts down
+    atexit.register(writer.close)
+    return writer
+
+
+def get_writer() -> Optional[QuestionLogWriter]:
+    """Returns the current app's writer, or None when buffering is off."""
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def submit_question_log(log_data: dict) -> None:
+    """
+    Records a QuestionLog for the current app without waiting for a commit.
+    Falls back to a regular `crud.create_question_log` when the writer is
+    disabled. Callers that need the generated id should call
+    `crud.create_question_log` directly.
+    """
+    writer = get_writer()
+    if writer is not None:
+        writer.submit(log_data)
+        return
+
+    from . import crud, db  # pylint: disable=C0415
+
+    crud.create_question_log(db.session, log_data)
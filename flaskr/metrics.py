@@ -0,0 +1,362 @@
+# flaskr/metrics.py
+"""
+Prometheus text-format metrics at /metrics.
+Latency histograms for requests (per endpoint), SQL statements, session
+store operations, password hashing, question model calls, and question
+and user cache lookups. Each process records into plain in-memory bucket
+lists guarded by one short lock. With several gunicorn workers, set
+METRICS_MULTIPROCESS_DIR: every process then periodically writes its totals
+to its own file there, and a scrape merges all files, so the numbers cover
+every worker whichever one answers. Files of workers that have exited are
+folded into one archive file so counters never go back.
+Off unless METRICS_ENABLED is set; with METRICS_TOKEN, scrapes must send it
+as `Authorization: Bearer <token>`.
+"""
+
+import bisect
+import fcntl
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+import weakref
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import Flask, Response, abort, g, request
+
+from . import instrumentation
+
+# Key under app.extensions where the app's registry is stored
+EXTENSION_KEY = "metrics"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds in seconds, from sub-millisecond SQL to slow hashing
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+REQUEST_DURATION = "sigma_http_request_duration_seconds"
+SQL_DURATION = "sigma_sql_statement_duration_seconds"
+SESSION_DURATION = "sigma_session_store_duration_seconds"
+HASH_DURATION = "sigma_password_hash_duration_seconds"
+MODEL_DURATION = "sigma_model_request_duration_seconds"
+QUESTION_CACHE_DURATION = "sigma_question_cache_lookup_seconds"
+USER_CACHE_DURATION = "sigma_user_cache_lookup_seconds"
+
+_HELP = {
+    REQUEST_DURATION: "Request latency by endpoint and method.",
+    SQL_DURATION: "SQL statement execution time by kind (read/write).",
+    SESSION_DURATION: "Session load/save time by operation.",
+    HASH_DURATION: "Password hashing time by operation (including queueing).",
+    MODEL_DURATION: "Question model call attempts by outcome.",
+    QUESTION_CACHE_DURATION: "Question cache lookups by result (hit tier or miss).",
+    USER_CACHE_DURATION: "Flask-Login user loads by result (hit or miss).",
+}
+
+# Series key: (metric name, sorted label pairs)
+SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class MetricsRegistry:
+    """Histograms of one process, optionally shared through a directory."""
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        flush_interval: float = 5.0,
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buckets = tuple(buckets)
+        # Per series: bucket counts (non-cumulative, last = +Inf), sum
+        self._series: Dict[SeriesKey, List] = {}
+        self._lock = threading.Lock()
+        self._flusher_pid: Optional[int] = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    # --- Recording ---
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        """Adds one observation to the `name` histogram series for `labels`."""
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += seconds
+        if self.directory and self._flusher_pid != os.getpid():
+            self._start_flusher()
+
+    def snapshot(self) -> Dict[SeriesKey, List]:
+        """Copy of this process's series."""
+        with self._lock:
+            return {
+                key: [list(counts), total]
+                for key, (counts, total) in self._series.items()
+            }
+
+    # --- Multi-process store ---
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def flush(self) -> None:
+        """Writes this process's totals to its file (atomic replace)."""
+        if not self.directory:
+            return
+        path = self._path(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_encode(self.snapshot()), f)
+        os.replace(tmp_path, path)
+
+    def _start_flusher(self) -> None:
+        # One flusher thread per process, started on first use
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(
+            target=self._flush_loop, name="metrics-flush", daemon=True
+        ).start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                pass  # Disk trouble must not take the worker down
+
+    def collect(self) -> Dict[SeriesKey, List]:
+        """Totals across all processes sharing the directory (or just this one)."""
+        if not self.directory:
+            return self.snapshot()
+        self.flush()
+        with open(os.path.join(self.directory, "metrics.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._archive_dead_workers()
+                merged: Dict[SeriesKey, List] = {}
+                for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+                    _merge(merged, _read(path))
+                return merged
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _archive_dead_workers(self) -> None:
+        archive_path = os.path.join(self.directory, "metrics-archive.json")
+        archive = None
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            pid = os.path.basename(path)[len("metrics-") : -len(".json")]
+            if not pid.isdigit() or _pid_alive(int(pid)):
+                continue
+            if archive is None:
+                archive = _read(archive_path)
+            _merge(archive, _read(path))
+            os.remove(path)
+        if archive is not None:
+            with open(f"{archive_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(_encode(archive), f)
+            os.replace(f"{archive_path}.tmp", archive_path)
+
+    # --- Exposition ---
+
+    def render(self) -> str:
+        """Prometheus text exposition format of the collected totals."""
+        series = self.collect()
+        lines: List[str] = []
+        for name in sorted({key[0] for key in series}):
+            lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key in sorted(k for k in series if k[0] == name):
+                counts, total = series[key]
+                labels = key[1]
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(
+                        f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}"
+                    )
+                lines.append(f"{name}_sum{_labels(labels)} {total}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    pairs = list(pairs)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _encode(series: Dict[SeriesKey, List]) -> list:
+    return [
+        [name, list(labels), counts, total]
+        for (name, labels), (counts, total) in series.items()
+    ]
+
+
+def _read(path: str) -> Dict[SeriesKey, List]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            rows = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {
+        (name, tuple(tuple(pair) for pair in labels)): [counts, total]
+        for name, labels, counts, total in rows
+    }
+
+
+def _merge(into: Dict[SeriesKey, List], other: Dict[SeriesKey, List]) -> None:
+    for key, (counts, total) in other.items():
+        current = into.get(key)
+        if current is None:
+            into[key] = [list(counts), total]
+        else:
+            current[0] = [a + b for a, b in zip(current[0], counts)]
+            current[1] += total
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# --- Flask integration ---
+
+# Registry per engine, so statements from any thread (including background
+# writers without an app context) land in their app's histograms
+_engine_registries: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_sql_listener_installed = False
+
+
+def _observe_sql(conn, statement, parameters, seconds) -> None:
+    registry = _engine_registries.get(conn.engine)
+    if registry is not None:
+        # Write time includes waiting for SQLite's write lock under contention
+        head = statement.lstrip()[:6].upper()
+        kind = "read" if head in ("SELECT", "PRAGMA") else "write"
+        registry.observe(SQL_DURATION, seconds, kind=kind)
+
+
+def _install_sql_listener() -> None:
+    global _sql_listener_installed  # pylint: disable=global-statement
+    if not _sql_listener_installed:
+        instrumentation.add_query_listener(_observe_sql)
+        _sql_listener_installed = True
+
+
+def _time_session_interface(app: Flask, registry: MetricsRegistry) -> None:
+    # Wraps whichever session interface is installed (SQLite or Flask-Session)
+    interface = app.session_interface
+    open_session, save_session = interface.open_session, interface.save_session
+
+    def timed_open(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return open_session(*args, **kwargs)
+        finally:
+            registry.observe(
+                SESSION_DURATION, time.perf_counter() - start, operation="open"
+            )
+
+    def timed_save(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return save_session(*args, **kwargs)
+        finally:
+            registry.observe(
+                SESSION_DURATION, time.perf_counter() - start, operation="save"
+            )
+
+    interface.open_session = timed_open
+    interface.save_session = timed_save
+
+
+def init_app(app: Flask) -> Optional[MetricsRegistry]:
+    """Adds the histograms and the /metrics route when METRICS_ENABLED."""
+    if not app.config["METRICS_ENABLED"]:
+        return None
+    from . import db, db_routing, hashing  # pylint: disable=C0415
+
+    registry = MetricsRegistry(
+        directory=app.config["METRICS_MULTIPROCESS_DIR"],
+        flush_interval=app.config["METRICS_FLUSH_INTERVAL"],
+    )
+    app.extensions[EXTENSION_KEY] = registry
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.teardown_request
+    def observe_request(exc):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            registry.observe(
+                REQUEST_DURATION,
+                time.perf_counter() - start,
+                endpoint=request.endpoint or "unmatched",
+                method=request.method,
+            )
+
+    with app.app_context():
+        for engine in db.engines.values():
+            _engine_registries[engine] = registry
+    router = app.extensions.get(db_routing.EXTENSION_KEY)
+    for engine in router.replicas if router is not None else ():
+        _engine_registries[engine] = registry
+    _install_sql_listener()
+    _time_session_interface(app, registry)
+    hasher = app.extensions.get(hashing.EXTENSION_KEY)
+    if hasher is not None:
+        hasher.add_timing_listener(
+            lambda operation, seconds: registry.observe(
+                HASH_DURATION, seconds, operation=operation
+            )
+        )
+
+    token = app.config["METRICS_TOKEN"]
+
+    @app.route("/metrics")
+    def metrics():
+        """Prometheus scrape endpoint, behind METRICS_TOKEN when it is set."""
+        if token and not hmac.compare_digest(
+            request.headers.get("Authorization", "").encode(),
+            f"Bearer {token}".encode(),
+        ):
+            abort(401)
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    return registry
@@ -0,0 +1,312 @@
+# flaskr/model_client.py
+"""
+HTTP client for remote question models.
+A small pool of keep-alive http.client connections per provider, so a
+question costs one round trip rather than a TCP/TLS handshake as well.
+Every attempt has a timeout. Transient failures (connection errors,
+timeouts, 429 and 5xx) are retried a bounded number of times with
+full-jitter backoff, and a circuit breaker stops calling a provider that
+keeps failing: request threads then fail fast with ModelUnavailable
+(HTTP 503) instead of each waiting out its timeouts.
+"""
+
+import collections
+import http.client
+import json
+import random
+import threading
+import time
+import urllib.parse
+from typing import Callable, Deque, List, NamedTuple, Optional, Tuple
+
+# Statuses worth retrying; any other 4xx is the request's fault
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class ModelError(Exception):
+    """The provider rejected the request or answered unusably."""
+
+
+class ModelUnavailable(ModelError):
+    """The circuit is open, or every attempt failed transiently."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ConnectionPool:
+    """
+    Keep-alive connections to one origin, at most `size` in use at once.
+    Connections are opened lazily (so a pool created before gunicorn forks
+    holds no sockets), reused most-recent-first and dropped once idle for
+    `idle_timeout` seconds, before the server is likely to close them.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        size: int = 8,
+        timeout: float = 10.0,
+        idle_timeout: float = 30.0,
+    ):
+        parts = urllib.parse.urlsplit(base_url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {base_url!r}")
+        self._connection_class = (
+            http.client.HTTPSConnection
+            if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self.host = parts.hostname
+        self.port = parts.port
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.connections_opened = 0
+        self._idle: Deque[Tuple[http.client.HTTPConnection, float]] = (
+            collections.deque()
+        )
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def _checkout(self, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn, last_used = self._idle.pop()
+                if now - last_used < self.idle_timeout:
+                    break
+                conn.close()
+            else:
+                conn = None
+                self.connections_opened += 1
+        if conn is None:
+            return self._connection_class(self.host, self.port, timeout=timeout), False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _checkin(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes] = None,
+        headers: Optional[dict] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[int, bytes]:
+        """
+        Sends one request and returns (status, body). Raises TimeoutError if
+        no connection frees up, or the server stays silent, for `timeout`
+        seconds; other socket and protocol errors propagate as raised.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No free connection to {self.host} in {timeout}s")
+        try:
+            while True:
+                conn, reused = self._checkout(timeout)
+                try:
+                    conn.request(method, path, body=body, headers=headers or {})
+                    response = conn.getresponse()
+                    data = response.read()
+                except (
+                    http.client.RemoteDisconnected,
+                    BrokenPipeError,
+                    ConnectionResetError,
+                ):
+                    conn.close()
+                    if reused:
+                        continue  # The server closed an idle connection
+                    raise
+                except BaseException:
+                    conn.close()
+                    raise
+                if response.will_close:
+                    conn.close()
+                else:
+                    self._checkin(conn)
+                return response.status, data
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """Closes the idle connections (in-use ones close when returned)."""
+        with self._lock:
+            while self._idle:
+                self._idle.pop()[0].close()
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures; while open every
+    call is refused. After `reset_timeout` seconds one trial call is let
+    through (half-open): success closes the circuit, failure reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        """One of "closed", "open" or "half_open"."""
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may proceed now; claims the trial when half-open."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._retry_after_locked() == 0:
+                self._state = self.HALF_OPEN
+                return True
+            return False
+
+    def _retry_after_locked(self) -> float:
+        # Seconds until an open circuit lets a trial call through
+        return max(0.0, self._opened_at + self.reset_timeout - self._clock())
+
+    def retry_after(self) -> float:
+        """Seconds until the next trial call (0 when closed)."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return 0.0
+            return max(self._retry_after_locked(), 1.0)
+
+    def record_success(self) -> None:
+        """A call got a response from the provider."""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        """A call failed transiently."""
+        with self._lock:
+            self._failures += 1
+            if (
+                self._state == self.HALF_OPEN
+                or self._failures >= self.failure_threshold
+            ):
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class RetryPolicy(NamedTuple):
+    """Up to `attempts` tries, sleeping U(0, min(cap, base * 2**n)) between."""
+
+    attempts: int = 3
+    backoff: float = 0.2
+    max_backoff: float = 2.0
+
+    def delay(self, retry: int, rng: random.Random) -> float:
+        """Full-jitter sleep before retry number `retry` (0-based)."""
+        return rng.uniform(0, min(self.max_backoff, self.backoff * 2**retry))
+
+
+class ModelClient:
+    """
+    JSON-over-HTTP calls to one provider through a ConnectionPool, with
+    per-attempt timeouts, retries and a circuit breaker. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        retry: RetryPolicy = RetryPolicy(),
+        breaker: Optional[CircuitBreaker] = None,
+        timeout: Optional[float] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        rng: Optional[random.Random] = None,
+    ):
+        self.pool = pool
+        self.retry = retry
+        self.breaker = breaker or CircuitBreaker()
+        self.timeout = pool.timeout if timeout is None else timeout
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+        self._timing_listeners: List[Callable[[str, float], None]] = []
+
+    def add_timing_listener(self, listener: Callable[[str, float], None]) -> None:
+        """
+        Registers `listener(outcome, seconds)`, called after every attempt
+        with "ok", "timeout", "connection_error", "server_error" or
+        "client_error", and with "circuit_open" for refused calls.
+        """
+        self._timing_listeners.append(listener)
+
+    def _observe(self, outcome: str, start: float) -> None:
+        seconds = time.perf_counter() - start
+        for listener in self._timing_listeners:
+            listener(outcome, seconds)
+
+    def post_json(self, path: str, payload, headers: Optional[dict] = None):
+        """POSTs `payload` as JSON and returns the decoded JSON response."""
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        error: Optional[Exception] = None
+        for attempt in range(self.retry.attempts):
+            if attempt:
+                self._sleep(self.retry.delay(attempt - 1, self._rng))
+            start = time.perf_counter()
+            if not self.breaker.allow():
+                self._observe("circuit_open", start)
+                retry_after = self.breaker.retry_after()
+                raise ModelUnavailable(
+                    f"Circuit open for {self.pool.host}; retry in {retry_after:.0f}s",
+                    retry_after=retry_after,
+                ) from error
+            try:
+                status, data = self.pool.request(
+                    "POST", path, body, headers, self.timeout
+                )
+            except TimeoutError as exc:
+                outcome, error = "timeout", exc
+            except (OSError, http.client.HTTPException) as exc:
+                outcome, error = "connection_error", exc
+            else:
+                if status < 400 or status not in RETRY_STATUSES:
+                    # The provider answered: it is up, whatever it said
+                    self.breaker.record_success()
+                    self._observe("ok" if status < 400 else "client_error", start)
+                    return _decode(status, data)
+                outcome, error = "server_error", ModelError(f"HTTP {status}")
+            self.breaker.record_failure()
+            self._observe(outcome, start)
+        raise ModelUnavailable(
+            f"{self.pool.host} failed {self.retry.attempts} attempts: {error!r}",
+            retry_after=max(self.breaker.retry_after(), 1.0),
+        ) from error
+
+    def close(self) -> None:
+        """Closes the pool's idle connections."""
+        self.pool.close()
+
+
+def _decode(status: int, data: bytes):
+    if status >= 400:
+        raise ModelError(f"HTTP {status}: {data[:200]!r}")
+    try:
+        return json.loads(data)
+    except ValueError as exc:
+        raise ModelError(f"Invalid JSON response: {data[:200]!r}") from exc
@@ -24,11 +24,11 @@ from sqlalchemy.orm import (
     relationship,
     DeclarativeBase,  # Added for Base class
 )
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 
 # Import the db instance created in __init__.py
 from . import db
+from .hashing import get_hasher
 
 
 # Base class for declarative models (optional but good practice)
@@ -69,14 +69,20 @@ class User(db.Model, UserMixin):  # type: ignore[name-defined]
     )
 
     # Password handling methods
+    # Hashing runs through the app's PasswordHasher (see flaskr/hashing.py),
+    # which may raise HashingUnavailable when the worker is saturated.
     def set_password(self, password: str) -> None:
         """Hashes the password and stores it."""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = get_hasher().generate(password)
 
     def check_password(self, password: str) -> bool:
         """Checks if the provided password matches the stored hash."""
         # Since password_hash is non-nullable, we don't need the None check
-        return check_password_hash(self.password_hash, password)
+        return get_hasher().check(self.password_hash, password)
+
+    def password_needs_rehash(self) -> bool:
+        """True if the stored hash uses other than the configured parameters."""
+        return get_hasher().needs_rehash(self.password_hash)
 
     # __repr__
     def __repr__(self) -> str:
@@ -126,6 +132,9 @@ class UserProgress(db.Model):  # type: ignore[name-defined]
     __table_args__ = (
         UniqueConstraint("user_id", "skill_id", name="uq_user_skill"),
         Index("ix_user_progress_user_skill", "user_id", "skill_id"),
+        # A user's next reviews, and everyone due by a time (flaskr/scheduler.py)
+        Index("ix_user_progress_user_due", "user_id", "due_at"),
+        Index("ix_user_progress_due", "due_at"),
     )
 
     id = db.Column(Integer, primary_key=True)
@@ -135,6 +144,7 @@ class UserProgress(db.Model):  # type: ignore[name-defined]
     correct_streak = db.Column(Integer, nullable=False, default=0)
     incorrect_streak = db.Column(Integer, nullable=False, default=0)
     last_interaction_at = db.Column(DateTime, nullable=True)
+    due_at = db.Column(DateTime, nullable=True)  # Next spaced-repetition review
 
     # Timestamps using mapped_column
     created_at: Mapped[datetime.datetime] = mapped_column(
@@ -218,3 +228,21 @@ class QuestionLog(db.Model):  # type: ignore[name-defined]
             f"<Log id={self.id}, user={self.user_id}, "
             f"skill={self.skill_id}, {correct_str}>"
         )
+
+
+# CatalogVersion Class using db.Model
+class CatalogVersion(db.Model):  # type: ignore[name-defined]
+    """
+    Monotonic change counter for a cached reference catalog (e.g. skills).
+    Writers bump it in the same transaction as their change so every worker
+    can tell with one primary-key read whether its cached copy is stale.
+    """
+
+    __tablename__ = "catalog_versions"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        """Provide a helpful representation when printing the object."""
+        return f"<CatalogVersion name='{self.name}', version={self.version}>"
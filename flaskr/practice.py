@@ -0,0 +1,238 @@
+# flaskr/practice.py
+"""
+Practice blueprint: JSON endpoints that serve a question for a skill and
+grade the learner's answer.
+Questions come from the app's generator, through the question cache
+(flaskr/question_cache.py) when enabled, skipping the learner's recent ones.
+The question awaiting an answer is kept in the server-side session, so the
+expected answer never reaches the client. Grading records the answer with
+crud.record_answer (one INSERT and one UPDATE ... RETURNING) under the
+app's adaptive policy (flaskr/adaptive.py); with QUESTION_LOG_WRITER_ENABLED
+the log row goes to the write-behind writer (flaskr/log_writer.py) instead.
+Once `flask calibrate` has fitted the learner and the skill's levels, a
+question may be served one level off the streak difficulty, wherever the
+predicted accuracy is closest to CALIBRATION_TARGET_ACCURACY
+(flaskr/calibration.py).
+/practice/due lists skills due for review from the per-process due queue
+(flaskr/scheduler.py). History is paged with keyset cursors
+(crud.get_log_history_page), handed to clients as signed, opaque tokens, or
+streamed whole as NDJSON; both history views read from a replica when
+DB_READ_REPLICA_URIS is set (flaskr/db_routing.py).
+"""
+
+import json
+import time
+
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    current_app,
+    jsonify,
+    request,
+    session,
+    stream_with_context,
+)
+from flask_login import current_user, login_required
+from itsdangerous import BadSignature, URLSafeSerializer
+
+from . import crud, db, skill_catalog
+from .adaptive import get_engine
+from .calibration import get_calibration
+from .db_routing import read_only_view
+from .log_writer import get_writer
+from .question_cache import get_question_cache
+from .questions import get_generator, normalize_answer
+from .scheduler import get_due_queue
+
+# Session key holding the question awaiting an answer
+PENDING_KEY = "practice_pending"
+# Due skills per /practice/due response: default and upper bound of ?limit=
+DUE_LIMIT = 5
+DUE_MAX_LIMIT = 50
+# Logs per history page: default and upper bound of ?limit=
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+bp = Blueprint("practice", __name__, url_prefix="/practice")
+
+
+def _skill_or_404(skill_id_string: str):
+    skill = skill_catalog.get_skill_by_id_string(db.session, skill_id_string)
+    if skill is None:
+        abort(404)
+    return skill
+
+
+def _calibrated_difficulty(skill_id: int, difficulty: int) -> int:
+    """The streak difficulty, or the neighbour the calibration prefers."""
+    target = current_app.config["CALIBRATION_TARGET_ACCURACY"]
+    if target is None:
+        return difficulty
+    policy = get_engine().policy
+    levels = [
+        level
+        for level in (difficulty, difficulty - 1, difficulty + 1)
+        if policy.min_difficulty <= level <= policy.max_difficulty
+    ]
+    level = get_calibration().pick_level(current_user.id, skill_id, levels, target)
+    return difficulty if level is None else level
+
+
+def _cursor_serializer() -> URLSafeSerializer:
+    return URLSafeSerializer(current_app.secret_key, salt="sigma-history-cursor")
+
+
+def encode_cursor(cursor: crud.HistoryCursor) -> str:
+    """Opaque, signed token for a history cursor."""
+    return _cursor_serializer().dumps(list(cursor))
+
+
+def decode_cursor(token: str) -> crud.HistoryCursor:
+    """The cursor inside `token`; raises BadSignature if it was tampered with."""
+    timestamp, log_id = _cursor_serializer().loads(token)
+    return crud.HistoryCursor(str(timestamp), int(log_id))
+
+
+def _log_json(log) -> dict:
+    return {
+        "id": log.id,
+        "answered_at": log.question_timestamp.isoformat(),
+        "difficulty": log.difficulty_presented,
+        "question": log.question_text_generated,
+        "expected_answer": log.expected_answer,
+        "answer": log.user_answer,
+        "correct": log.is_correct,
+        "response_time_ms": log.response_time_ms,
+    }
+
+
+@bp.route("/due")
+@login_required
+def due():
+    """The learner's skills due for review, most overdue first."""
+    limit = min(max(request.args.get("limit", DUE_LIMIT, type=int), 1), DUE_MAX_LIMIT)
+    catalog = skill_catalog.get_catalog(db.session)
+    skills = []
+    for skill_id, due_at in get_due_queue().next_due(
+        db.session, current_user.id, limit
+    ):
+        skill = catalog.get(skill_id)
+        if skill is not None:
+            skills.append(
+                {"skill": skill.skill_id_string, "due_at": due_at.isoformat()}
+            )
+    return jsonify(skills=skills)
+
+
+@bp.route("/<skill_id_string>/question")
+@login_required
+def question(skill_id_string):
+    """Generates a question at the learner's current (calibrated) difficulty."""
+    skill = _skill_or_404(skill_id_string)
+    progress = crud.get_user_progress(db.session, current_user.id, skill.id)
+    if progress is not None:
+        difficulty = progress.current_difficulty
+    else:
+        difficulty = get_engine().default_difficulty
+    difficulty = _calibrated_difficulty(skill.id, difficulty)
+    cache = get_question_cache()
+    if cache is None:
+        generated = get_generator().generate(skill.name, difficulty)
+    else:
+        recent = crud.get_recent_question_texts(
+            db.session, current_user.id, skill.id, cache.repeat_window
+        )
+        generated = cache.generate(
+            get_generator(), skill.name, difficulty, exclude=set(recent)
+        )
+    session[PENDING_KEY] = {
+        "skill_id": skill.id,
+        "difficulty": difficulty,
+        "text": generated.text,
+        "expected": generated.expected_answer,
+        "prompt": generated.prompt,
+        "issued_at": time.time(),
+    }
+    return jsonify(
+        skill=skill.skill_id_string, difficulty=difficulty, question=generated.text
+    )
+
+
+@bp.route("/<skill_id_string>/answer", methods=("POST",))
+@login_required
+def answer(skill_id_string):
+    """Grades the answer to the pending question and records it."""
+    skill = _skill_or_404(skill_id_string)
+    pending = session.get(PENDING_KEY)
+    if pending is None or pending["skill_id"] != skill.id:
+        return jsonify(error="No question is pending for this skill."), 409
+    payload = request.get_json(silent=True) or request.form
+    given = payload.get("answer") or ""
+    is_correct = normalize_answer(given) == normalize_answer(pending["expected"])
+    session.pop(PENDING_KEY)
+
+    engine = get_engine()
+    writer = get_writer()
+    state = crud.record_answer(
+        db.session,
+        current_user.id,
+        skill.id,
+        is_correct,
+        {
+            "session_id": getattr(session, "sid", None),
+            "difficulty_presented": pending["difficulty"],
+            "prompt_used": pending["prompt"],
+            "question_text_generated": pending["text"],
+            "expected_answer": pending["expected"],
+            "user_answer": given[:255],
+            "response_time_ms": int((time.time() - pending["issued_at"]) * 1000),
+        },
+        default_difficulty=engine.default_difficulty,
+        policy=engine.policy,
+        submit_log=writer.submit if writer is not None else None,
+    )
+    return jsonify(
+        correct=is_correct,
+        expected_answer=pending["expected"],
+        difficulty=state.current_difficulty,
+        correct_streak=state.correct_streak,
+        incorrect_streak=state.incorrect_streak,
+    )
+
+
+@bp.route("/<skill_id_string>/history")
+@login_required
+@read_only_view
+def history(skill_id_string):
+    """One page of the learner's answers, newest first; ?cursor= pages back."""
+    skill = _skill_or_404(skill_id_string)
+    limit = min(
+        max(request.args.get("limit", HISTORY_PAGE_SIZE, type=int), 1),
+        HISTORY_MAX_PAGE_SIZE,
+    )
+    before = None
+    if request.args.get("cursor"):
+        try:
+            before = decode_cursor(request.args["cursor"])
+        except (BadSignature, TypeError, ValueError):
+            return jsonify(error="Invalid cursor."), 400
+    page = crud.get_log_history_page(
+        db.session, current_user.id, skill.id, limit=limit, before=before
+    )
+    return jsonify(
+        skill=skill.skill_id_string,
+        logs=[_log_json(log) for log in page.logs],
+        next_cursor=encode_cursor(page.next_cursor) if page.next_cursor else None,
+    )
+
+
+@bp.route("/<skill_id_string>/history.ndjson")
+@login_required
+@read_only_view
+def history_export(skill_id_string):
+    """The learner's whole history for a skill, streamed one JSON line per log."""
+    skill = _skill_or_404(skill_id_string)
+    logs = crud.iter_log_history(db.session, current_user.id, skill.id)
+    lines = (json.dumps(_log_json(log)) + "\n" for log in logs)
+    return Response(stream_with_context(lines), mimetype="application/x-ndjson")
@@ -0,0 +1,191 @@
+# flaskr/profiling.py
+"""
+Opt-in sampled request profiling.
+A WSGI middleware runs cProfile on one request in PROFILING_SAMPLE_RATE, or
+on any request carrying a valid X-Profile-Token header (a timestamped
+signature made with the app's SECRET_KEY by `flask profile token`), and
+writes a pstats file per profiled request into PROFILING_DIR, keeping only
+the newest PROFILING_RETENTION files. `flask profile summarize` merges them.
+One request per process is profiled at a time; a request sampled while
+another is being profiled is served unprofiled.
+"""
+
+import cProfile
+import glob
+import io
+import itertools
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from typing import Callable, List, Optional
+
+import click
+from flask import Flask, current_app
+from flask.cli import AppGroup
+from itsdangerous import BadSignature, TimestampSigner
+
+# Request header (WSGI environ key) that forces profiling of one request
+TOKEN_HEADER = "X-Profile-Token"
+_TOKEN_ENVIRON_KEY = "HTTP_X_PROFILE_TOKEN"
+_TOKEN_PAYLOAD = b"profile"
+_UNSAFE_PATH_CHARS = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def token_signer(secret_key: str) -> TimestampSigner:
+    """Signer for X-Profile-Token values."""
+    return TimestampSigner(secret_key, salt="sigma-profile")
+
+
+class ProfilingMiddleware:
+    """
+    Wraps a WSGI app and profiles sampled or token-carrying requests.
+
+    `sample_rate` N profiles one request in N on average (0 = only requests
+    with a valid token). Profiles cover the application call, which in
+    Flask includes view execution and response rendering.
+    """
+
+    def __init__(
+        self,
+        wsgi_app,
+        directory: str,
+        sample_rate: int = 0,
+        signer: Optional[TimestampSigner] = None,
+        token_max_age: int = 3600,
+        retention: int = 50,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.wsgi_app = wsgi_app
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.signer = signer
+        self.token_max_age = token_max_age
+        self.retention = retention
+        self._rng = rng
+        self._lock = threading.Lock()
+        # Held while a request is profiled: Python 3.12+ allows one profiler
+        self._active = threading.Lock()
+        self._seq = itertools.count()  # Unique file names within a process
+        os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, environ, start_response):
+        if not self._should_profile(environ):
+            return self.wsgi_app(environ, start_response)
+        if not self._active.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+        try:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # "Another profiling tool is already active" (3.12+), e.g. a
+                # debugger or coverage; never fail the request for a sample
+                return self.wsgi_app(environ, start_response)
+            start = time.perf_counter()
+            try:
+                return self.wsgi_app(environ, start_response)
+            finally:
+                profiler.disable()
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self._save(profiler, environ, elapsed_ms)
+        finally:
+            self._active.release()
+
+    def _should_profile(self, environ) -> bool:
+        token = environ.get(_TOKEN_ENVIRON_KEY)
+        if token and self.signer is not None:
+            try:
+                self.signer.unsign(token, max_age=self.token_max_age)
+                return True
+            except BadSignature:
+                pass
+        return self.sample_rate > 0 and self._rng() < 1 / self.sample_rate
+
+    def _save(self, profiler: cProfile.Profile, environ, elapsed_ms: float) -> None:
+        path = _UNSAFE_PATH_CHARS.sub("_", environ.get("PATH_INFO", "/")).strip("_")
+        name = (
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{environ.get('REQUEST_METHOD', 'GET')}-"
+            f"{path or 'root'}-{elapsed_ms:.0f}ms-{os.getpid()}-{next(self._seq)}.prof"
+        )
+        try:
+            profiler.dump_stats(os.path.join(self.directory, name))
+            self._enforce_retention()
+        except OSError:
+            pass  # A lost profile must not fail the request
+
+    def _enforce_retention(self) -> None:
+        with self._lock:
+            files = profile_files(self.directory)
+            for path in files[: max(0, len(files) - self.retention)]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # Removed concurrently by another worker
+
+
+def profile_files(directory: str, match: Optional[str] = None) -> List[str]:
+    """Profile files in `directory`, oldest first, optionally filtered by name."""
+    files = glob.glob(os.path.join(directory, "*.prof"))
+    if match:
+        files = [path for path in files if match in os.path.basename(path)]
+    return sorted(files, key=os.path.getmtime)
+
+
+def summarize(files: List[str], sort: str = "cumulative", limit: int = 30) -> str:
+    """Merged pstats report of `files`."""
+    out = io.StringIO()
+    stats = pstats.Stats(files[0], stream=out)
+    for path in files[1:]:
+        stats.add(path)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+# --- Flask integration ---
+
+profile_cli = AppGroup("profile", help="Sampled request profiles.")
+
+
+@profile_cli.command("summarize")
+@click.option("--match", default=None, help="Only files whose name contains this.")
+@click.option(
+    "--sort",
+    type=click.Choice(["cumulative", "tottime", "ncalls"]),
+    default="cumulative",
+    show_default=True,
+)
+@click.option("--limit", default=30, show_default=True, help="Functions to print.")
+def summarize_command(match, sort, limit):
+    """Merge the stored profiles and print the top functions."""
+    files = profile_files(current_app.config["PROFILING_DIR"], match)
+    if not files:
+        raise click.ClickException("No profiles found.")
+    click.echo(f"{len(files)} profiles")
+    click.echo(summarize(files, sort, limit))
+
+
+@profile_cli.command("token")
+def token_command():
+    """Print an X-Profile-Token header value for profiling one request."""
+    token = token_signer(current_app.secret_key).sign(_TOKEN_PAYLOAD)
+    click.echo(f"{TOKEN_HEADER}: {token.decode('ascii')}")
+
+
+def init_app(app: Flask) -> Optional[ProfilingMiddleware]:
+    """Wraps app.wsgi_app when PROFILING_ENABLED and adds the CLI."""
+    app.cli.add_command(profile_cli)
+    if not app.config["PROFILING_ENABLED"]:
+        return None
+    middleware = ProfilingMiddleware(
+        app.wsgi_app,
+        directory=app.config["PROFILING_DIR"],
+        sample_rate=app.config["PROFILING_SAMPLE_RATE"],
+        signer=token_signer(app.secret_key),
+        token_max_age=app.config["PROFILING_TOKEN_MAX_AGE"],
+        retention=app.config["PROFILING_RETENTION"],
+    )
+    app.wsgi_app = middleware
+    return middleware
@@ -0,0 +1,367 @@
+# flaskr/question_cache.py
+"""
+Content-addressed cache of generated questions.
+Learners at the same skill and difficulty send the generator effectively
+the same prompt, so each generated question is kept under
+sha256(normalized prompt, skill, difficulty) and served again to other
+learners. Two tiers: a per-process LRU of recently used keys (TTLCache:
+QUESTION_CACHE_KEYS, QUESTION_CACHE_MEMORY_TTL) over one SQLite file
+shared by all workers (QUESTION_CACHE_PATH), trimmed least recently used
+first to QUESTION_CACHE_MAX_BYTES.
+
+Variety policy: a key holds up to QUESTION_CACHE_VARIANTS questions, each
+served for QUESTION_CACHE_MAX_AGE seconds. Learners are not served a
+question among their last QUESTION_CACHE_REPEAT_WINDOW in the skill; when
+every fresh variant is excluded the generator is called and its question
+joins the pool, replacing the oldest when full. While a pool is not full,
+QUESTION_CACHE_FRESH_RATE of hits generate anyway so the pool fills out.
+If the generator fails, any cached variant is served rather than an error.
+"""
+
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Callable, Collection, List, NamedTuple, Optional, Sequence, Tuple
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+
+from . import metrics
+from .cache import TTLCache
+from .model_client import ModelError
+from .questions import Question, QuestionGenerator, generate_many, get_generator
+
+# Key under app.extensions where the app's question cache is stored
+EXTENSION_KEY = "question_cache"
+# Bytes counted per stored row on top of its text columns
+_ROW_OVERHEAD = 64
+
+
+class CachedQuestion(NamedTuple):
+    """A generated question and when it was generated (epoch seconds)."""
+
+    question: Question
+    created_at: float
+
+
+def cache_key(prompt: str, skill_name: str, difficulty: int) -> str:
+    """Hex digest of the case- and whitespace-normalized prompt, skill and level."""
+    normalized = " ".join(prompt.split()).casefold()
+    return hashlib.sha256(
+        "\x1f".join((normalized, skill_name, str(difficulty))).encode("utf-8")
+    ).hexdigest()
+
+
+class SQLiteQuestionStore:
+    """
+    The shared tier: question rows by key, with the time each key was last
+    loaded. Every `trim_every` inserts, the least recently used rows beyond
+    `max_bytes` are deleted.
+    """
+
+    def __init__(self, path: str, max_bytes: int, trim_every: int = 64):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.trim_every = trim_every
+        self._local = threading.local()
+        self._inserts = 0
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS question_cache ("
+            "id INTEGER PRIMARY KEY, key TEXT NOT NULL, question TEXT NOT NULL, "
+            "expected_answer TEXT NOT NULL, prompt TEXT, "
+            "created_at REAL NOT NULL, last_used_at REAL NOT NULL, "
+            "size INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_question_cache_key "
+            "ON question_cache (key, created_at)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_question_cache_last_used "
+            "ON question_cache (last_used_at)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread (and per process after a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, key: str, now: float, oldest: float) -> List[CachedQuestion]:
+        """A key's questions created after `oldest`, oldest first; marks it used."""
+        conn = self._connect()
+        conn.execute(
+            "UPDATE question_cache SET last_used_at = ? WHERE key = ?", (now, key)
+        )
+        return [
+            CachedQuestion(Question(text, expected, prompt), created_at)
+            for text, expected, prompt, created_at in conn.execute(
+                "SELECT question, expected_answer, prompt, created_at "
+                "FROM question_cache WHERE key = ? AND created_at > ? "
+                "ORDER BY created_at",
+                (key, oldest),
+            )
+        ]
+
+    def add(self, key: str, entry: CachedQuestion, keep: int) -> None:
+        """Stores a question, keeping only the key's `keep` newest."""
+        question = entry.question
+        size = _ROW_OVERHEAD + sum(
+            len(value.encode("utf-8"))
+            for value in (question.text, question.expected_answer, question.prompt)
+            if value
+        )
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO question_cache (key, question, expected_answer, "
+                "prompt, created_at, last_used_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    question.text,
+                    question.expected_answer,
+                    question.prompt,
+                    entry.created_at,
+                    entry.created_at,
+                    size,
+                ),
+            )
+            conn.execute(
+                "DELETE FROM question_cache WHERE key = ? AND id NOT IN ("
+                "SELECT id FROM question_cache WHERE key = ? "
+                "ORDER BY created_at DESC LIMIT ?)",
+                (key, key, keep),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._inserts += 1
+        if self._inserts % self.trim_every == 0:
+            self.trim()
+
+    def trim(self) -> int:
+        """Deletes least recently used rows beyond `max_bytes`; returns how many."""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT last_used_at FROM ("
+            "SELECT id, last_used_at, SUM(size) OVER "
+            "(ORDER BY last_used_at DESC, id DESC) AS running "
+            "FROM question_cache) WHERE running > ? "
+            "ORDER BY last_used_at DESC, id DESC LIMIT 1",
+            (self.max_bytes,),
+        ).fetchone()
+        if row is None:
+            return 0
+        return conn.execute(
+            "DELETE FROM question_cache WHERE last_used_at <= ?", row
+        ).rowcount
+
+    def total_bytes(self) -> int:
+        """Counted size of all stored rows."""
+        (total,) = (
+            self._connect()
+            .execute("SELECT COALESCE(SUM(size), 0) FROM question_cache")
+            .fetchone()
+        )
+        return total
+
+
+class QuestionCache:
+    """Serves questions from the two tiers, calling the generator on misses."""
+
+    def __init__(
+        self,
+        store: SQLiteQuestionStore,
+        keys: int = 1000,
+        memory_ttl: Optional[float] = 60.0,
+        variants: int = 20,
+        max_age: float = 7 * 24 * 3600.0,
+        fresh_rate: float = 0.1,
+        repeat_window: int = 50,
+        rng: Optional[random.Random] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.store = store
+        self.memory = TTLCache(maxsize=keys, ttl=memory_ttl)
+        self.variants = variants
+        self.max_age = max_age
+        self.fresh_rate = fresh_rate
+        self.repeat_window = repeat_window
+        self._rng = rng or random.Random()
+        self._clock = clock
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+        self._timing_listeners: List[Callable[[str, float], None]] = []
+
+    def add_timing_listener(self, listener: Callable[[str, float], None]) -> None:
+        """
+        Registers `listener(result, seconds)`, called after every lookup
+        with "memory_hit", "disk_hit", "miss" (nothing servable), "refresh"
+        (generated under the fresh rate) or "fallback" (generator failed).
+        """
+        self._timing_listeners.append(listener)
+
+    def _record(self, result: str, start: float) -> None:
+        with self._lock:
+            self._counts[result] += 1
+        seconds = time.perf_counter() - start
+        for listener in self._timing_listeners:
+            listener(result, seconds)
+
+    def _pool(self, key: str, now: float) -> Tuple[Tuple[CachedQuestion, ...], str]:
+        pool = self.memory.get(key)
+        if pool is not None:
+            return pool, "memory_hit"
+        pool = tuple(self.store.load(key, now, now - self.max_age))
+        self.memory.set(key, pool)
+        return pool, "disk_hit"
+
+    def generate(
+        self,
+        generator: QuestionGenerator,
+        skill_name: str,
+        difficulty: int,
+        exclude: Collection[str] = (),
+    ) -> Question:
+        """
+        A question for `skill_name` at `difficulty` whose text is not in
+        `exclude` (the learner's recent questions), cached when possible.
+        """
+        start = time.perf_counter()
+        now = self._clock()
+        key = cache_key(
+            generator.prompt_for(skill_name, difficulty), skill_name, difficulty
+        )
+        pool, result = self._pool(key, now)
+        fresh = tuple(entry for entry in pool if entry.created_at > now - self.max_age)
+        candidates = [
+            entry.question for entry in fresh if entry.question.text not in exclude
+        ]
+        refresh = len(fresh) < self.variants and self._rng.random() < self.fresh_rate
+        if candidates and not refresh:
+            self._record(result, start)
+            return self._rng.choice(candidates)
+
+        try:
+            question = generator.generate(skill_name, difficulty)
+        except ModelError:
+            if not pool:
+                raise
+            self._record("fallback", start)
+            return self._rng.choice(candidates or [entry.question for entry in pool])
+        entry = CachedQuestion(question, now)
+        self.store.add(key, entry, keep=self.variants)
+        self.memory.set(key, (fresh + (entry,))[-self.variants :])
+        self._record("refresh" if candidates else "miss", start)
+        return question
+
+    def warm(
+        self,
+        generator: QuestionGenerator,
+        requests: Sequence[Tuple[str, int]],
+        concurrency: int = 8,
+    ) -> Tuple[int, int]:
+        """
+        Generates one question per (skill_name, difficulty) concurrently
+        and stores each; returns (stored, failed).
+        """
+        now = self._clock()
+        stored = failed = 0
+        results = generate_many(generator, requests, concurrency)
+        for (skill_name, difficulty), question in zip(requests, results):
+            if isinstance(question, Exception):
+                failed += 1
+                continue
+            key = cache_key(
+                generator.prompt_for(skill_name, difficulty), skill_name, difficulty
+            )
+            self.store.add(key, CachedQuestion(question, now), keep=self.variants)
+            self.memory.pop(key)
+            stored += 1
+        return stored, failed
+
+    def stats(self) -> dict:
+        """Lookup counts by result, overall hit rate and tier sizes."""
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = sum(counts.values())
+        hits = counts.get("memory_hit", 0) + counts.get("disk_hit", 0)
+        return {
+            **counts,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_keys": len(self.memory),
+            "disk_bytes": self.store.total_bytes(),
+        }
+
+
+def init_app(app: Flask) -> Optional[QuestionCache]:
+    """
+    Creates the app's question cache when QUESTION_CACHE_ENABLED and times
+    its lookups into /metrics when enabled.
+    """
+    if not app.config["QUESTION_CACHE_ENABLED"]:
+        return None
+    cache = QuestionCache(
+        SQLiteQuestionStore(
+            app.config["QUESTION_CACHE_PATH"], app.config["QUESTION_CACHE_MAX_BYTES"]
+        ),
+        keys=app.config["QUESTION_CACHE_KEYS"],
+        memory_ttl=app.config["QUESTION_CACHE_MEMORY_TTL"],
+        variants=app.config["QUESTION_CACHE_VARIANTS"],
+        max_age=app.config["QUESTION_CACHE_MAX_AGE"],
+        fresh_rate=app.config["QUESTION_CACHE_FRESH_RATE"],
+        repeat_window=app.config["QUESTION_CACHE_REPEAT_WINDOW"],
+    )
+    app.extensions[EXTENSION_KEY] = cache
+    registry = app.extensions.get(metrics.EXTENSION_KEY)
+    if registry is not None:
+        cache.add_timing_listener(
+            lambda result, seconds: registry.observe(
+                metrics.QUESTION_CACHE_DURATION, seconds, result=result
+            )
+        )
+    return cache
+
+
+def get_question_cache() -> Optional[QuestionCache]:
+    """The current app's question cache, or None when disabled."""
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+# --- CLI ---
+
+
+@click.command("warm-question-cache")
+@click.option("--per-level", default=1, show_default=True, help="Questions per key.")
+@click.option("--concurrency", default=8, show_default=True)
+@with_appcontext
+def warm_command(per_level, concurrency):
+    """Generate questions for every skill and difficulty into the cache."""
+    from . import db, skill_catalog  # pylint: disable=C0415
+    from .adaptive import MAX_DIFFICULTY, MIN_DIFFICULTY  # pylint: disable=C0415
+
+    cache = get_question_cache()
+    if cache is None:
+        raise click.ClickException("QUESTION_CACHE_ENABLED is off.")
+    requests = [
+        (skill.name, difficulty)
+        for skill in skill_catalog.get_all_skills(db.session)
+        for difficulty in range(MIN_DIFFICULTY, MAX_DIFFICULTY + 1)
+        for _ in range(per_level)
+    ]
+    stored, failed = cache.warm(get_generator(), requests, concurrency)
+    click.echo(f"Stored {stored:,} questions ({failed:,} failed).")
@@ -0,0 +1,260 @@
+# flaskr/questions.py
+"""
+Question generation for practice sessions.
+Views ask the app's generator for a question at a skill and difficulty and
+get back the text, the expected answer and the prompt that produced it
+(stored with the QuestionLog row). QUESTION_GENERATOR selects the
+implementation from GENERATORS; "stub" generates arithmetic locally, so
+development, tests and load tests run offline, and "gemini" calls the
+Gemini API through flaskr/model_client.py (pooled connections, timeouts,
+retries, circuit breaker). generate_many fans several questions out
+concurrently with asyncio.
+"""
+
+import asyncio
+import json
+import math
+import random
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+from flask import Flask, current_app, jsonify
+
+from . import metrics
+from .model_client import (
+    CircuitBreaker,
+    ConnectionPool,
+    ModelClient,
+    ModelError,
+    ModelUnavailable,
+    RetryPolicy,
+)
+
+# Key under app.extensions where the app's generator is stored
+EXTENSION_KEY = "question_generator"
+
+
+class Question(NamedTuple):
+    """A generated question and how to grade it."""
+
+    text: str
+    expected_answer: str
+    prompt: Optional[str] = None
+
+
+def normalize_answer(answer: Optional[str]) -> str:
+    """Canonical form for grading: trimmed, case-folded, inner spaces collapsed."""
+    return " ".join((answer or "").split()).casefold()
+
+
+class QuestionGenerator:
+    """
+    Provider interface. Implementations are registered in GENERATORS and
+    built by `from_config`; `generate` must be thread-safe, since request
+    threads and generate_many call it concurrently.
+    """
+
+    @classmethod
+    def from_config(cls, config: Mapping) -> "QuestionGenerator":
+        """Builds the generator from the app config."""
+        raise NotImplementedError
+
+    def prompt_for(self, skill_name: str, difficulty: int) -> str:
+        """The prompt `generate` sends (the question cache keys on it)."""
+        raise NotImplementedError
+
+    def generate(self, skill_name: str, difficulty: int) -> Question:
+        """A question for `skill_name` at `difficulty` (1-5)."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Releases connections or other resources (if any)."""
+
+
+class StubQuestionGenerator(QuestionGenerator):
+    """
+    Offline generator: an addition or subtraction whose operands grow with
+    the difficulty. `latency` seconds of sleep per question stand in for a
+    remote model call in load tests.
+    """
+
+    def __init__(self, latency: float = 0.0, rng: Optional[random.Random] = None):
+        self.latency = latency
+        self._rng = rng or random.Random()
+
+    @classmethod
+    def from_config(cls, config: Mapping) -> "StubQuestionGenerator":
+        return cls(latency=config["QUESTION_STUB_LATENCY_MS"] / 1000)
+
+    def prompt_for(self, skill_name: str, difficulty: int) -> str:
+        return f"stub: {skill_name} difficulty {difficulty}"
+
+    def generate(self, skill_name: str, difficulty: int) -> Question:
+        """A question for `skill_name` at `difficulty` (1-5)."""
+        if self.latency:
+            time.sleep(self.latency)
+        high = 10 ** min(max(difficulty, 1), 5)
+        a, b = self._rng.randint(1, high), self._rng.randint(1, high)
+        prompt = self.prompt_for(skill_name, difficulty)
+        if difficulty >= 3 and self._rng.random() < 0.5:
+            return Question(f"What is {a} - {b}?", str(a - b), prompt)
+        return Question(f"What is {a} + {b}?", str(a + b), prompt)
+
+
+class GeminiQuestionGenerator(QuestionGenerator):
+    """
+    Asks a Gemini model (generateContent REST API) for a question and its
+    answer as JSON. Unusable responses raise ModelError; an unreachable or
+    failing provider raises ModelUnavailable (HTTP 503 in views).
+    """
+
+    PROMPT = (
+        "Write one practice question for the skill {skill!r} at difficulty "
+        "{difficulty} on a scale of 1 (easiest) to 5 (hardest). Reply with "
+        'JSON only: {{"question": "...", "answer": "..."}}, where answer is '
+        "the short, exact expected answer."
+    )
+
+    def __init__(self, client: ModelClient, api_key: str, model: str):
+        self.client = client
+        self.api_key = api_key
+        self.model = model
+
+    @classmethod
+    def from_config(cls, config: Mapping) -> "GeminiQuestionGenerator":
+        if not config["GEMINI_API_KEY"]:
+            raise ValueError('QUESTION_GENERATOR="gemini" needs GEMINI_API_KEY')
+        pool = ConnectionPool(
+            config["QUESTION_API_URL"],
+            size=config["QUESTION_POOL_SIZE"],
+            timeout=config["QUESTION_TIMEOUT"],
+        )
+        client = ModelClient(
+            pool,
+            retry=RetryPolicy(
+                attempts=config["QUESTION_RETRY_ATTEMPTS"],
+                backoff=config["QUESTION_RETRY_BACKOFF"],
+            ),
+            breaker=CircuitBreaker(
+                failure_threshold=config["QUESTION_BREAKER_FAILURES"],
+                reset_timeout=config["QUESTION_BREAKER_RESET"],
+            ),
+        )
+        return cls(client, config["GEMINI_API_KEY"], config["QUESTION_MODEL"])
+
+    def prompt_for(self, skill_name: str, difficulty: int) -> str:
+        return self.PROMPT.format(skill=skill_name, difficulty=difficulty)
+
+    def generate(self, skill_name: str, difficulty: int) -> Question:
+        prompt = self.prompt_for(skill_name, difficulty)
+        response = self.client.post_json(
+            f"/v1beta/models/{self.model}:generateContent",
+            {
+                "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+                "generationConfig": {"responseMimeType": "application/json"},
+            },
+            headers={"x-goog-api-key": self.api_key},
+        )
+        try:
+            text = response["candidates"][0]["content"]["parts"][0]["text"]
+            fields = json.loads(text)
+            return Question(str(fields["question"]), str(fields["answer"]), prompt)
+        except (KeyError, IndexError, TypeError, ValueError) as exc:
+            raise ModelError(f"Unusable model response: {response!r:.200}") from exc
+
+    def close(self) -> None:
+        self.client.close()
+
+
+# Names accepted by QUESTION_GENERATOR
+GENERATORS = {"stub": StubQuestionGenerator, "gemini": GeminiQuestionGenerator}
+
+
+# --- Concurrent fan-out ---
+
+
+async def agenerate_many(
+    generator: QuestionGenerator,
+    requests: Sequence[Tuple[str, int]],
+    executor: Executor,
+    concurrency: int = 8,
+) -> List[Union[Question, Exception]]:
+    """
+    Generates a question per (skill_name, difficulty), at most `concurrency`
+    at a time on `executor`'s threads. Results keep the order of `requests`;
+    a failed item holds its exception instead of failing the batch.
+    """
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(skill_name: str, difficulty: int) -> Question:
+        async with limit:
+            return await loop.run_in_executor(
+                executor, generator.generate, skill_name, difficulty
+            )
+
+    return await asyncio.gather(
+        *(one(skill_name, difficulty) for skill_name, difficulty in requests),
+        return_exceptions=True,
+    )
+
+
+def generate_many(
+    generator: QuestionGenerator,
+    requests: Sequence[Tuple[str, int]],
+    concurrency: int = 8,
+) -> List[Union[Question, Exception]]:
+    """
+    Blocking wrapper around agenerate_many for request threads and CLI
+    commands: the batch takes about as long as its slowest question rather
+    than the sum of all of them.
+    """
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(concurrency, len(requests))),
+        thread_name_prefix="question-fanout",
+    ) as executor:
+        return asyncio.run(agenerate_many(generator, requests, executor, concurrency))
+
+
+def init_app(app: Flask) -> QuestionGenerator:
+    """
+    Creates the generator selected by QUESTION_GENERATOR, times its model
+    calls into /metrics when enabled and maps ModelUnavailable to HTTP 503
+    (other ModelErrors to 502).
+    """
+    name = app.config["QUESTION_GENERATOR"]
+    if name not in GENERATORS:
+        raise ValueError(f"Unknown QUESTION_GENERATOR: {name!r}")
+    generator = GENERATORS[name].from_config(app.config)
+    app.extensions[EXTENSION_KEY] = generator
+
+    registry = app.extensions.get(metrics.EXTENSION_KEY)
+    client = getattr(generator, "client", None)
+    if registry is not None and client is not None:
+        client.add_timing_listener(
+            lambda outcome, seconds: registry.observe(
+                metrics.MODEL_DURATION, seconds, outcome=outcome
+            )
+        )
+
+    @app.errorhandler(ModelUnavailable)
+    def model_unavailable(error):
+        app.logger.warning("Question generation unavailable: %s", error)
+        return (
+            jsonify(error="Question service busy, please retry shortly."),
+            503,
+            {"Retry-After": str(math.ceil(error.retry_after))},
+        )
+
+    @app.errorhandler(ModelError)
+    def model_error(error):
+        app.logger.error("Question generation failed: %s", error)
+        return jsonify(error="Question service error."), 502
+
+    return generator
+
+
+def get_generator() -> QuestionGenerator:
+    """The current app's question generator."""
+    return current_app.extensions[EXTENSION_KEY]
@@ -0,0 +1,217 @@
+# flaskr/scheduler.py
+"""
+Spaced-repetition due queue.
+Every graded answer schedules the (user, skill) pair's next review in
+`user_progress.due_at`: soon after a miss, then further out the higher the
+difficulty and correct streak. crud.record_answer sets it in the same
+atomic UPDATE as the streaks (due_at_expression); update_user_progress_state
+recomputes it when given the graded answer's is_correct.
+
+Reads go through a per-process DueQueue: one heap of (due time, skill) per
+active learner, loaded with one query on ix_user_progress_user_due and
+kept in a TTL-bounded LRU. Committed writes in this process update a loaded
+heap in O(log n); other workers' writes show up once the entry expires
+(DUE_QUEUE_TTL). Reminder jobs use crud.iter_users_due, one range scan on
+ix_user_progress_due.
+"""
+
+import datetime
+import heapq
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import click
+from flask import Flask, current_app, has_app_context
+from flask.cli import with_appcontext
+from sqlalchemy import case, event, literal
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+
+# Key under app.extensions where the app's DueQueue is stored
+EXTENSION_KEY = "due_queue"
+# Session.info key collecting due times written in the current transaction
+_PENDING_KEY = "scheduler_pending_due"
+
+# Review after a miss
+RETRY_INTERVAL = datetime.timedelta(minutes=10)
+# Review after a correct answer, by min(difficulty - 1 + correct_streak, 5)
+REVIEW_INTERVALS = tuple(datetime.timedelta(days=2**n) for n in range(6))
+
+
+def review_interval(
+    difficulty: int, correct_streak: int, is_correct: bool
+) -> datetime.timedelta:
+    """Time until the next review, from the state after the answer."""
+    if not is_correct:
+        return RETRY_INTERVAL
+    box = min(max(difficulty - 1 + correct_streak, 0), len(REVIEW_INTERVALS) - 1)
+    return REVIEW_INTERVALS[box]
+
+
+def due_at_expression(assignments: dict, is_correct: bool, now: datetime.datetime):
+    """
+    SQL for the new due_at, given an answer's SET expressions (whose
+    right-hand sides are the post-answer state); equals
+    `now + review_interval(...)` of the state the UPDATE produces.
+    """
+    if not is_correct:
+        return literal(now + RETRY_INTERVAL)
+    box = assignments["current_difficulty"] - 1 + assignments["correct_streak"]
+    return case(
+        *(
+            (box >= n, literal(now + REVIEW_INTERVALS[n]))
+            for n in range(len(REVIEW_INTERVALS) - 1, 0, -1)
+        ),
+        else_=literal(now + REVIEW_INTERVALS[0]),
+    )
+
+
+def _epoch(moment: datetime.datetime) -> float:
+    # Naive datetimes are UTC, as stored by SQLite
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.timestamp()
+
+
+def _utc(epoch: float) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(epoch, datetime.timezone.utc)
+
+
+class _UserHeap:
+    """One learner's schedule: a heap with lazy deletion of replaced entries."""
+
+    __slots__ = ("heap", "due")
+
+    def __init__(self, rows):
+        self.due: Dict[int, float] = {skill_id: _epoch(due) for skill_id, due in rows}
+        self.heap: List[Tuple[float, int]] = [
+            (due, skill_id) for skill_id, due in self.due.items()
+        ]
+        heapq.heapify(self.heap)
+
+    def update(self, skill_id: int, due: float) -> None:
+        self.due[skill_id] = due
+        heapq.heappush(self.heap, (due, skill_id))
+        if len(self.heap) > 2 * len(self.due) + 8:
+            self.heap = [(due, skill_id) for skill_id, due in self.due.items()]
+            heapq.heapify(self.heap)
+
+    def _is_live(self, entry: Tuple[float, int]) -> bool:
+        return self.due.get(entry[1]) == entry[0]
+
+    def peek(self, limit: int, now: float) -> List[Tuple[int, float]]:
+        # Drop replaced entries from the top, so the first due skill is heap[0]
+        while self.heap and not self._is_live(self.heap[0]):
+            heapq.heappop(self.heap)
+        if not self.heap or self.heap[0][0] > now:
+            return []
+        if limit == 1:
+            return [(self.heap[0][1], self.heap[0][0])]
+        stale = len(self.heap) - len(self.due)
+        entries = heapq.nsmallest(limit + stale, self.heap)
+        return [
+            (skill_id, due)
+            for due, skill_id in entries
+            if due <= now and self._is_live((due, skill_id))
+        ][:limit]
+
+
+class DueQueue:
+    """Per-process heaps of due skills for recently active learners."""
+
+    def __init__(self, maxsize: int, ttl: Optional[float]):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def next_due(
+        self,
+        db_session: Session,
+        user_id: int,
+        limit: int = 5,
+        now: Optional[datetime.datetime] = None,
+    ) -> List[Tuple[int, datetime.datetime]]:
+        """
+        Up to `limit` (skill_id, due_at) pairs whose review is due, most
+        overdue first. Loads the learner's schedule on a miss.
+        """
+        from . import crud  # pylint: disable=C0415
+
+        user_heap = self.cache.get(user_id)
+        if user_heap is None:
+            user_heap = _UserHeap(crud.get_due_schedule(db_session, user_id))
+            self.cache.set(user_id, user_heap)
+        now_epoch = _epoch(now or datetime.datetime.now(datetime.timezone.utc))
+        with self._lock:
+            entries = user_heap.peek(limit, now_epoch)
+        return [(skill_id, _utc(due)) for skill_id, due in entries]
+
+    def update(self, user_id: int, skill_id: int, due_at: datetime.datetime) -> None:
+        """Moves a skill in a loaded learner's heap (O(log n))."""
+        user_heap = self.cache.get(user_id)
+        if user_heap is not None:
+            with self._lock:
+                user_heap.update(skill_id, _epoch(due_at))
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current hit rate."""
+        return self.cache.stats()
+
+
+def init_app(app: Flask) -> DueQueue:
+    """Creates the app's due queue from DUE_QUEUE_USERS / DUE_QUEUE_TTL."""
+    queue = DueQueue(app.config["DUE_QUEUE_USERS"], app.config["DUE_QUEUE_TTL"])
+    app.extensions[EXTENSION_KEY] = queue
+    return queue
+
+
+def get_due_queue() -> DueQueue:
+    """The current app's due queue."""
+    return current_app.extensions[EXTENSION_KEY]
+
+
+# --- Write notifications ---
+
+
+def note_due(
+    db_session: Session, user_id: int, skill_id: int, due_at: datetime.datetime
+) -> None:
+    """Records a written due_at; loaded heaps see it once the session commits."""
+    db_session.info.setdefault(_PENDING_KEY, []).append((user_id, skill_id, due_at))
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending and has_app_context():
+        queue = current_app.extensions.get(EXTENSION_KEY)
+        if queue is not None:
+            for user_id, skill_id, due_at in pending:
+                queue.update(user_id, skill_id, due_at)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+# --- CLI ---
+
+
+@click.command("due-users")
+@click.option(
+    "--until",
+    type=click.DateTime(),
+    default=None,
+    help="Due by this UTC time [default: end of today].",
+)
+@with_appcontext
+def due_users_command(until):
+    """Print users with reviews due (user_id, due skills, earliest due_at)."""
+    from . import crud, db  # pylint: disable=C0415
+
+    if until is None:
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        until = datetime.datetime.combine(today, datetime.time.max)
+    for user_id, due_skills, earliest in crud.iter_users_due(db.session, until):
+        click.echo(f"{user_id}\t{due_skills}\t{earliest.isoformat()}")
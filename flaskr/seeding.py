@@ -0,0 +1,378 @@
+# flaskr/seeding.py
+"""
+Synthetic data generator behind `flask seed`.
+Fills an empty SQLite database with users (real password hashes), a skill
+catalog, user_progress rows and a heavy-tailed question_logs history: a few
+very active users answer most questions, correctness follows each user's
+ability against the difficulty presented, and response times are
+log-normal. Rows stream from generators into multi-row INSERTs on the raw
+connection with durability PRAGMAs relaxed for the load. The same seed
+always generates the same rows (password salts aside).
+"""
+
+import itertools
+import sqlite3
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import click
+import numpy as np
+from flask.cli import with_appcontext
+from sqlalchemy.engine import Engine
+
+from .hashing import get_hasher
+from .models import QuestionLog
+from .scheduler import REVIEW_INTERVALS
+
+# Password of every seeded user (hashes differ by salt only)
+SEED_PASSWORD = "sigma-seed-password"
+# History starts here (Unix time); one log row per LOG_INTERVAL_SECONDS
+HISTORY_START = 1704067200  # 2024-01-01 00:00:00 UTC
+LOG_INTERVAL_SECONDS = 1
+# Rows generated per vectorised block
+_BLOCK = 50_000
+
+# scheduler.REVIEW_INTERVALS in seconds, indexed by review box
+_REVIEW_SECONDS = np.array(
+    [interval.total_seconds() for interval in REVIEW_INTERVALS], dtype=np.int64
+)
+
+# Host parameters per statement: SQLite's compile-time limit (999 before 3.32)
+_MAX_VARIABLES = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
+
+class SeedSpec(NamedTuple):
+    """Size and randomness of one generated dataset."""
+
+    users: int
+    skills: int
+    logs: int
+    skills_per_user: int = 8
+    seed: int = 0
+    # Distinct password hashes shared out round-robin across users
+    password_pool: int = 16
+
+
+class Population:
+    """
+    Per-user traits drawn once from the seed: ability, practised skills
+    (Zipf-like skill popularity) and activity weight (Pareto, so a few users
+    answer most questions).
+    """
+
+    def __init__(self, spec: SeedSpec):
+        rng = np.random.default_rng([spec.seed, 1])
+        per_user = min(spec.skills_per_user, spec.skills)
+        self.abilities = rng.normal(0, 1, spec.users)
+        self.activity_cum = np.cumsum(rng.pareto(1.2, spec.users) + 1)
+        # Weighted sampling without replacement, vectorised: the top-k of
+        # log(weight) + Gumbel noise per user (in chunks to bound memory)
+        log_weights = -0.8 * np.log(np.arange(1, spec.skills + 1))
+        self.practised = np.empty((spec.users, per_user), dtype=np.int64)
+        for start in range(0, spec.users, 10_000):
+            keys = log_weights + rng.gumbel(
+                size=(min(10_000, spec.users - start), spec.skills)
+            )
+            top = np.argpartition(-keys, per_user - 1, axis=1)[:, :per_user]
+            self.practised[start : start + len(keys)] = top + 1
+
+    def difficulties(self, user_index: np.ndarray, rng) -> np.ndarray:
+        """Difficulty levels near each user's ability (1-5)."""
+        noisy = 3 + self.abilities[user_index] + rng.normal(0, 0.8, len(user_index))
+        return np.clip(np.rint(noisy), 1, 5).astype(np.int64)
+
+
+# --- Row generators (tuples in the column order of TABLES) ---
+
+
+def generate_users(spec: SeedSpec, password_hashes: List[str]) -> Iterator[tuple]:
+    """Rows of (id, user_identifier, password_hash)."""
+    for user_id in range(1, spec.users + 1):
+        yield (
+            user_id,
+            f"seed-user-{user_id}",
+            password_hashes[user_id % len(password_hashes)],
+        )
+
+
+def generate_skills(spec: SeedSpec) -> Iterator[tuple]:
+    """Rows of (id, skill_id_string, name, description)."""
+    for skill_id in range(1, spec.skills + 1):
+        yield (
+            skill_id,
+            f"seed-skill-{skill_id}",
+            f"Skill {skill_id}",
+            f"Generated skill {skill_id}",
+        )
+
+
+def generate_progress(spec: SeedSpec, population: Population) -> Iterator[tuple]:
+    """Rows of TABLES["user_progress"], one per practised skill."""
+    rng = np.random.default_rng([spec.seed, 2])
+    per_user = population.practised.shape[1]
+    span = max(1, spec.logs) * LOG_INTERVAL_SECONDS
+    for start in range(0, spec.users, _BLOCK):
+        users = np.repeat(np.arange(start, min(start + _BLOCK, spec.users)), per_user)
+        difficulties = population.difficulties(users, rng)
+        streaks = rng.integers(0, 3, len(users))
+        last_interaction = HISTORY_START + rng.integers(0, span, len(users))
+        # Scheduled as after a correct answer (no incorrect streaks)
+        boxes = np.clip(difficulties - 1 + streaks, 0, len(_REVIEW_SECONDS) - 1)
+        yield from zip(
+            (users + 1).tolist(),
+            population.practised[
+                users, np.tile(np.arange(per_user), len(users) // per_user)
+            ].tolist(),
+            difficulties.tolist(),
+            streaks.tolist(),
+            itertools.repeat(0),
+            last_interaction.tolist(),
+            (last_interaction + _REVIEW_SECONDS[boxes]).tolist(),
+        )
+
+
+def generate_logs(spec: SeedSpec, population: Population) -> Iterator[tuple]:
+    """Rows of TABLES["question_logs"], in question_timestamp order."""
+    rng = np.random.default_rng([spec.seed, 3])
+    per_user = population.practised.shape[1]
+    total_weight = population.activity_cum[-1]
+    # Texts by operand pair and answers by value, shared across rows
+    questions = np.array(
+        [f"What is {a} + {b}?" for a in range(100) for b in range(100)], dtype=object
+    )
+    numbers = np.array([str(n) for n in range(201)], dtype=object)
+    for start in range(0, spec.logs, _BLOCK):
+        n = min(_BLOCK, spec.logs - start)
+        users = np.searchsorted(
+            population.activity_cum, rng.random(n) * total_weight, side="right"
+        )
+        skills = population.practised[users, rng.integers(0, per_user, n)]
+        difficulty = population.difficulties(users, rng)
+        # Logistic in ability minus difficulty; about 70% correct overall
+        p_correct = 1 / (1 + np.exp(-(population.abilities[users] - difficulty + 3.8)))
+        correct = rng.random(n) < p_correct
+        # Log-normal, slower on harder and on missed questions
+        response_ms = rng.lognormal(np.log(2500 + 1500 * difficulty), 0.5)
+        response_ms = np.minimum(300_000, response_ms * np.where(correct, 1.0, 1.4))
+        a, b = rng.integers(2, 100, n), rng.integers(2, 100, n)
+        answers = np.where(correct, a + b, a + b + rng.choice((-1, 1), n))
+        timestamps = HISTORY_START + (start + np.arange(n)) * LOG_INTERVAL_SECONDS
+        days = (timestamps - HISTORY_START) // 86400
+        yield from zip(
+            (users + 1).tolist(),
+            skills.tolist(),
+            [f"seed-{u}-{d}" for u, d in zip((users + 1).tolist(), days.tolist())],
+            timestamps.tolist(),
+            difficulty.tolist(),
+            questions[a * 100 + b].tolist(),
+            numbers[a + b].tolist(),
+            numbers[answers].tolist(),
+            correct.tolist(),
+            response_ms.astype(np.int64).tolist(),
+        )
+
+
+# --- Loading ---
+
+TABLES = {
+    "users": ("id", "user_identifier", "password_hash"),
+    "skills": ("id", "skill_id_string", "name", "description"),
+    "user_progress": (
+        "user_id",
+        "skill_id",
+        "current_difficulty",
+        "correct_streak",
+        "incorrect_streak",
+        "last_interaction_at",
+        "due_at",
+    ),
+    "question_logs": (
+        "user_id",
+        "skill_id",
+        "session_id",
+        "question_timestamp",
+        "difficulty_presented",
+        "question_text_generated",
+        "expected_answer",
+        "user_answer",
+        "is_correct",
+        "response_time_ms",
+    ),
+}
+
+# Generated values that SQLite converts on insert (Unix time -> DATETIME text)
+_VALUE_SQL = {
+    "last_interaction_at": "datetime(?, 'unixepoch')",
+    "due_at": "datetime(?, 'unixepoch')",
+    "question_timestamp": "datetime(?, 'unixepoch')",
+}
+
+
+def insert_rows(
+    conn: sqlite3.Connection,
+    table: str,
+    rows: Iterable[tuple],
+    batch_size: int = 50_000,
+    progress: Optional[Callable[[str, int], None]] = None,
+) -> int:
+    """
+    Streams `rows` into `table` with multi-row INSERTs, committing every
+    `batch_size` rows. Calls `progress(table, rows_so_far)` per batch.
+    """
+    columns = TABLES[table]
+    per_statement = max(1, min(500, _MAX_VARIABLES // len(columns)))
+    placeholders = "(" + ", ".join(_VALUE_SQL.get(c, "?") for c in columns) + ")"
+
+    def statement(n_rows: int) -> str:
+        return f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ", ".join(
+            [placeholders] * n_rows
+        )
+
+    full_statement = statement(per_statement)
+    total = 0
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        whole = len(batch) - len(batch) % per_statement
+        conn.executemany(
+            full_statement,
+            (
+                list(itertools.chain.from_iterable(batch[i : i + per_statement]))
+                for i in range(0, whole, per_statement)
+            ),
+        )
+        if whole < len(batch):
+            conn.execute(
+                statement(len(batch) - whole),
+                list(itertools.chain.from_iterable(batch[whole:])),
+            )
+        conn.commit()
+        total += len(batch)
+        if progress is not None:
+            progress(table, total)
+    return total
+
+
+def seed_database(
+    engine: Engine,
+    spec: SeedSpec,
+    password_hashes: List[str],
+    batch_size: int = 50_000,
+    progress: Optional[Callable[[str, int], None]] = None,
+) -> Dict[str, int]:
+    """
+    Generates `spec` into the (empty) SQLite database behind `engine`.
+    Synchronous writes and the rollback journal are relaxed during the load
+    and restored afterwards; question_logs' secondary indexes are dropped
+    and rebuilt once at the end, even when the load fails. Returns rows
+    inserted per table.
+    """
+    if engine.dialect.name != "sqlite":
+        raise ValueError("Seeding supports SQLite databases only.")
+    if not password_hashes:
+        raise ValueError("At least one password hash is required.")
+    engine.dispose()  # No pooled connection may see the relaxed PRAGMAs
+    raw = engine.raw_connection()
+    counts: Dict[str, int] = {}
+    indexes_dropped = False
+    try:
+        conn = raw.driver_connection
+        if conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is not None:
+            raise ValueError("The database already has users; seed an empty one.")
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+        conn.execute("PRAGMA journal_mode=MEMORY")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-262144")  # 256 MiB
+        try:
+            population = Population(spec)
+            counts["users"] = insert_rows(
+                conn,
+                "users",
+                generate_users(spec, password_hashes),
+                batch_size,
+                progress,
+            )
+            counts["skills"] = insert_rows(
+                conn, "skills", generate_skills(spec), batch_size, progress
+            )
+            counts["user_progress"] = insert_rows(
+                conn,
+                "user_progress",
+                generate_progress(spec, population),
+                batch_size,
+                progress,
+            )
+            indexes_dropped = True
+            for index in QuestionLog.__table__.indexes:
+                conn.execute(f"DROP INDEX IF EXISTS {index.name}")
+            counts["question_logs"] = insert_rows(
+                conn,
+                "question_logs",
+                generate_logs(spec, population),
+                batch_size,
+                progress,
+            )
+        finally:
+            conn.execute(f"PRAGMA journal_mode={journal_mode}")
+            conn.execute(f"PRAGMA synchronous={synchronous}")
+    finally:
+        raw.close()
+        engine.dispose()
+        # Built once after the bulk load, and also if it failed part way:
+        # history, due and calibration queries must never lose them
+        if indexes_dropped:
+            for index in QuestionLog.__table__.indexes:
+                index.create(engine, checkfirst=True)
+    return counts
+
+
+def password_hashes(count: int) -> List[str]:
+    """`count` hashes of SEED_PASSWORD made with the app's hashing method."""
+    return [get_hasher().generate(SEED_PASSWORD) for _ in range(count)]
+
+
+# --- CLI ---
+
+
+@click.command("seed")
+@click.option("--users", default=10_000, show_default=True)
+@click.option("--skills", default=100, show_default=True)
+@click.option("--logs", default=1_000_000, show_default=True)
+@click.option("--skills-per-user", default=8, show_default=True)
+@click.option("--seed", "seed_value", default=0, show_default=True, help="RNG seed.")
+@click.option("--password-pool", default=16, show_default=True, help="Distinct hashes.")
+@click.option("--batch-size", default=50_000, show_default=True)
+@with_appcontext
+def seed_command(
+    users, skills, logs, skills_per_user, seed_value, password_pool, batch_size
+):
+    """Fill an empty database with deterministic synthetic data."""
+    from . import crud, db  # pylint: disable=C0415
+
+    spec = SeedSpec(users, skills, logs, skills_per_user, seed_value, password_pool)
+    start = time.perf_counter()
+
+    def report(table: str, rows: int) -> None:
+        elapsed = time.perf_counter() - start
+        click.echo(f"\r{table:<14} {rows:>12,} rows  {elapsed:7.1f}s", nl=False)
+
+    hashes = password_hashes(password_pool)
+    try:
+        counts = seed_database(db.engine, spec, hashes, batch_size, report)
+    except ValueError as exc:
+        raise click.ClickException(str(exc)) from exc
+    # Process-local skill caches reload on their next version check
+    crud.bump_catalog_version(db.session, crud.SKILL_CATALOG)
+    db.session.commit()
+    elapsed = time.perf_counter() - start
+    click.echo()
+    for table, rows in counts.items():
+        click.echo(f"{table:<14} {rows:>12,}")
+    click.echo(
+        f"Seeded in {elapsed:.1f}s (seed {seed_value}). Users log in as "
+        f"seed-user-<id> with password '{SEED_PASSWORD}'."
+    )
@@ -0,0 +1,251 @@
+# flaskr/session_store.py
+"""
+Server-side sessions in one SQLite database in WAL mode.
+Replaces the filesystem backend (one small file per session, fsynced on
+every request, never garbage-collected). Session data is stored as
+msgpack, rows are written only when the session was modified (or its
+expiry needs extending), and a background thread deletes expired rows.
+Selected with SESSION_TYPE = "sqlite".
+"""
+
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from typing import Optional
+
+import msgspec
+from flask import Flask
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+# Key under app.extensions where the app's session store is stored
+EXTENSION_KEY = "session_store"
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict that tracks modification and carries its server id."""
+
+    def __init__(self, initial=None, sid: str = "", expires_at: float = 0.0):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.new = initial is None
+        self.modified = False
+
+
+class SQLiteSessionStore:
+    """Session rows keyed by id, with an indexed expiry timestamp."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "sid TEXT PRIMARY KEY, data BLOB NOT NULL, expires_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_sessions_expires_at "
+            "ON sessions (expires_at)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread (and per process after a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, sid: str, now: float):
+        """Returns `(data, expires_at)` for a live session, else None."""
+        return (
+            self._connect()
+            .execute(
+                "SELECT data, expires_at FROM sessions "
+                "WHERE sid = ? AND expires_at > ?",
+                (sid, now),
+            )
+            .fetchone()
+        )
+
+    def set(self, sid: str, data: bytes, expires_at: float) -> None:
+        """Inserts or replaces a session row."""
+        self._connect().execute(
+            "INSERT INTO sessions (sid, data, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (sid) DO UPDATE SET "
+            "data = excluded.data, expires_at = excluded.expires_at",
+            (sid, data, expires_at),
+        )
+
+    def touch(self, sid: str, expires_at: float) -> None:
+        """Extends a session's expiry without rewriting its data."""
+        self._connect().execute(
+            "UPDATE sessions SET expires_at = ? WHERE sid = ?", (expires_at, sid)
+        )
+
+    def delete(self, sid: str) -> None:
+        """Removes a session row."""
+        self._connect().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def sweep(self, now: float) -> int:
+        """Deletes expired sessions and returns how many were removed."""
+        cursor = self._connect().execute(
+            "DELETE FROM sessions WHERE expires_at <= ?", (now,)
+        )
+        return cursor.rowcount
+
+    def count(self) -> int:
+        """Number of stored sessions, expired or not."""
+        (count,) = self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()
+        return count
+
+
+class SQLiteSessionInterface(SessionInterface):
+    """
+    Flask session interface over a SQLiteSessionStore.
+
+    The cookie holds only a random session id (signed when `use_signer`).
+    Unmodified sessions cost one indexed SELECT per request; their expiry is
+    only rewritten once less than half of `lifetime` remains.
+    """
+
+    def __init__(
+        self,
+        store: SQLiteSessionStore,
+        lifetime: timedelta,
+        use_signer: bool = True,
+        sweep_interval: float = 300.0,
+        clock=time.time,
+    ):
+        self.store = store
+        self.lifetime = lifetime.total_seconds()
+        self.use_signer = use_signer
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_pid: Optional[int] = None
+        self._sweeper_lock = threading.Lock()
+        self._encoder = msgspec.msgpack.Encoder()
+        self._decoder = msgspec.msgpack.Decoder()
+
+    # --- SessionInterface ---
+
+    def open_session(self, app, request) -> ServerSession:
+        self._ensure_sweeper()
+        sid = self._unsign(app, request.cookies.get(self.get_cookie_name(app)))
+        if sid:
+            row = self.store.get(sid, self._clock())
+            if row is not None:
+                data, expires_at = row
+                try:
+                    return ServerSession(self._decoder.decode(data), sid, expires_at)
+                except msgspec.DecodeError:
+                    app.logger.warning("Discarding undecodable session %s", sid)
+        return ServerSession(sid=self._new_sid())
+
+    def save_session(self, app, session: ServerSession, response) -> None:
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                # Emptied (e.g. logout): drop the row and the cookie
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = self._clock()
+        expires_at = now + self.lifetime
+        if session.modified:
+            self.store.set(session.sid, self._encoder.encode(dict(session)), expires_at)
+        elif session.expires_at - now < self.lifetime / 2:
+            self.store.touch(session.sid, expires_at)
+        else:
+            return  # Clean and fresh: no write, no cookie
+
+        response.set_cookie(
+            name,
+            self._sign(app, session.sid),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+    # --- Session ids ---
+
+    @staticmethod
+    def _new_sid() -> str:
+        return secrets.token_urlsafe(32)
+
+    def _signer(self, app) -> Signer:
+        return Signer(app.secret_key, salt="flask-session", key_derivation="hmac")
+
+    def _sign(self, app, sid: str) -> str:
+        if not self.use_signer:
+            return sid
+        return self._signer(app).sign(sid).decode("utf-8")
+
+    def _unsign(self, app, value: Optional[str]) -> Optional[str]:
+        if not value or not self.use_signer:
+            return value
+        try:
+            return self._signer(app).unsign(value).decode("utf-8")
+        except BadSignature:
+            return None
+
+    # --- Expiry sweeper ---
+
+    def sweep(self) -> int:
+        """Deletes expired sessions now; returns how many were removed."""
+        return self.store.sweep(self._clock())
+
+    def _ensure_sweeper(self) -> None:
+        # Started lazily and per process, like the other background workers
+        if self.sweep_interval <= 0 or self._sweeper_pid == os.getpid():
+            return
+        with self._sweeper_lock:
+            if self._sweeper_pid == os.getpid():
+                return
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, name="session-sweeper", daemon=True
+            )
+            self._sweeper.start()
+            self._sweeper_pid = os.getpid()
+
+    def _sweep_loop(self) -> None:
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except sqlite3.Error:
+                # Locked or unavailable: try again next interval
+                pass
+
+
+def init_app(app: Flask) -> SQLiteSessionInterface:
+    """Installs the SQLite session interface from the SESSION_SQLITE_* settings."""
+    interface = SQLiteSessionInterface(
+        SQLiteSessionStore(app.config["SESSION_SQLITE_PATH"]),
+        lifetime=app.permanent_session_lifetime,
+        use_signer=app.config["SESSION_USE_SIGNER"],
+        sweep_interval=app.config["SESSION_SQLITE_SWEEP_INTERVAL"],
+    )
+    app.session_interface = interface
+    app.extensions[EXTENSION_KEY] = interface
+    return interface
@@ -0,0 +1,124 @@
+# flaskr/skill_catalog.py
+"""
+Process-local, read-only cache of the skill catalog.
+The skills table changes rarely, so each worker keeps an immutable snapshot
+indexed by id and by `skill_id_string`. Freshness is tied to the "skills"
+catalog version that crud bumps on every skill write: the version is read
+once per request and the snapshot reloads when it has moved. Lookups are
+dictionary hits with no SQL.
+"""
+
+import threading
+import weakref
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional, Tuple
+
+from flask import g, has_request_context
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import crud
+from .models import Skill
+
+
+class SkillEntry(NamedTuple):
+    """Immutable, detached copy of one Skill row."""
+
+    id: int
+    skill_id_string: str
+    name: str
+    description: Optional[str]
+
+
+class SkillCatalog:
+    """An immutable snapshot of the skills table at one catalog version."""
+
+    __slots__ = ("version", "skills", "_by_id", "_by_id_string")
+
+    def __init__(self, version: int, entries: Tuple[SkillEntry, ...]):
+        self.version = version
+        # Ordered by name, matching crud.get_all_skills
+        self.skills: Tuple[SkillEntry, ...] = tuple(
+            sorted(entries, key=lambda entry: entry.name)
+        )
+        self._by_id: Mapping[int, SkillEntry] = MappingProxyType(
+            {entry.id: entry for entry in self.skills}
+        )
+        self._by_id_string: Mapping[str, SkillEntry] = MappingProxyType(
+            {entry.skill_id_string: entry for entry in self.skills}
+        )
+
+    def get(self, skill_id: int) -> Optional[SkillEntry]:
+        """Returns the skill with this primary key, if any."""
+        return self._by_id.get(skill_id)
+
+    def get_by_id_string(self, skill_id_string: str) -> Optional[SkillEntry]:
+        """Returns the skill with this string identifier, if any."""
+        return self._by_id_string.get(skill_id_string)
+
+    def __len__(self) -> int:
+        return len(self.skills)
+
+
+# One snapshot per engine, so apps on different databases never share one
+_catalogs: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _load(db_session: Session, version: int) -> SkillCatalog:
+    rows = db_session.execute(
+        select(Skill.id, Skill.skill_id_string, Skill.name, Skill.description)
+    ).all()
+    return SkillCatalog(version, tuple(SkillEntry(*row) for row in rows))
+
+
+def get_catalog(db_session: Session) -> SkillCatalog:
+    """
+    Returns the current catalog snapshot, reloading it if the stored catalog
+    version differs from the cached one. During a request the result is
+    memoised on `g`, so each request checks the version at most once.
+    """
+    if has_request_context() and "skill_catalog" in g:
+        return g.skill_catalog
+
+    engine = db_session.get_bind(mapper=Skill)
+    version = crud.get_catalog_version(db_session, crud.SKILL_CATALOG)
+    catalog = _catalogs.get(engine)
+    if catalog is None or catalog.version != version:
+        with _lock:
+            catalog = _catalogs.get(engine)
+            if catalog is None or catalog.version != version:
+                catalog = _load(db_session, version)
+                _catalogs[engine] = catalog
+
+    if has_request_context():
+        g.skill_catalog = catalog
+    return catalog
+
+
+def invalidate() -> None:
+    """Drops every cached snapshot and the current request's memo."""
+    with _lock:
+        _catalogs.clear()
+    if has_request_context():
+        g.pop("skill_catalog", None)
+
+
+# --- Cached counterparts of the crud skill readers ---
+
+
+def get_all_skills(db_session: Session) -> Tuple[SkillEntry, ...]:
+    """Cached `crud.get_all_skills`: all skills ordered by name."""
+    return get_catalog(db_session).skills
+
+
+def get_skill_by_id(db_session: Session, skill_id: int) -> Optional[SkillEntry]:
+    """Cached `crud.get_skill_by_id`."""
+    return get_catalog(db_session).get(skill_id)
+
+
+def get_skill_by_id_string(
+    db_session: Session, skill_id_str: str
+) -> Optional[SkillEntry]:
+    """Cached `crud.get_skill_by_id_string`."""
+    return get_catalog(db_session).get_by_id_string(skill_id_str)
@@ -0,0 +1,283 @@
+# flaskr/slow_queries.py
+"""
+Slow query log.
+Every statement slower than SLOW_QUERY_THRESHOLD_MS is recorded with its
+fingerprint, the shape of its bound parameters, the flaskr function that
+issued it (e.g. crud.get_recent_logs_for_user_skill) and, on SQLite, its
+EXPLAIN QUERY PLAN. Records go to a small SQLite file used as a ring
+buffer (the newest SLOW_QUERY_CAPACITY rows are kept), shared by all
+workers. `flask slow-queries` prints the worst fingerprints.
+"""
+
+import json
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from typing import Dict, List, Optional
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+
+from . import instrumentation
+
+# Key under app.extensions where the app's recorder is stored
+EXTENSION_KEY = "slow_queries"
+# Modules whose frames are skipped when looking for the issuing function
+_INTERNAL_MODULES = (
+    "flaskr.instrumentation",
+    "flaskr.slow_queries",
+    "flaskr.db_routing",
+    "flaskr.metrics",
+)
+
+
+def parameter_shape(parameters) -> str:
+    """Types of the bound parameters, e.g. "(int, int, int)" or "3x(str)"."""
+    if parameters is None:
+        return "()"
+    if isinstance(parameters, dict):
+        inner = ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items())
+        return "{" + inner + "}"
+    if (
+        isinstance(parameters, list)
+        and parameters
+        and isinstance(parameters[0], (tuple, list, dict))
+    ):
+        # executemany: row count times the first row's shape
+        return f"{len(parameters)}x{parameter_shape(parameters[0])}"
+    return "(" + ", ".join(type(v).__name__ for v in parameters) + ")"
+
+
+def issuing_function() -> Optional[str]:
+    """Innermost flaskr function on the stack outside the SQL plumbing."""
+    frame = sys._getframe(1)  # pylint: disable=protected-access
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("flaskr") and not module.startswith(_INTERNAL_MODULES):
+            return f"{module.rsplit('.', 1)[-1]}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+class SlowQueryRecorder:
+    """Captures slow statements into a bounded SQLite ring buffer."""
+
+    def __init__(
+        self,
+        path: str,
+        threshold_ms: float = 100.0,
+        capacity: int = 10000,
+        explain: bool = True,
+    ):
+        self.path = path
+        self.threshold = threshold_ms / 1000
+        self.capacity = capacity
+        self.explain = explain
+        self._local = threading.local()
+        # EXPLAIN output per fingerprint; plans rarely change within a process
+        self._plans: Dict[str, str] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread (and per process after a fork); the file
+        # is only created once there is something to record or read
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS slow_queries ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, recorded_at REAL NOT NULL, "
+                "duration_ms REAL NOT NULL, fingerprint TEXT NOT NULL, "
+                "statement TEXT NOT NULL, parameter_shape TEXT, caller TEXT, "
+                "plan TEXT)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def observe(self, conn, statement: str, parameters, seconds: float) -> None:
+        """Query listener: records `statement` if it exceeded the threshold."""
+        if seconds < self.threshold or getattr(self._local, "busy", False):
+            return
+        self._local.busy = True  # EXPLAIN below must not re-enter
+        try:
+            shape = instrumentation.fingerprint(statement)
+            self.record(
+                duration_ms=seconds * 1000,
+                fingerprint=shape,
+                statement=statement,
+                parameter_shape=parameter_shape(parameters),
+                caller=issuing_function(),
+                plan=self._plan(conn, shape, statement, parameters),
+            )
+        except sqlite3.Error:
+            pass  # Losing a log entry beats failing the request
+        finally:
+            self._local.busy = False
+
+    def _plan(self, conn, shape: str, statement: str, parameters) -> Optional[str]:
+        if not self.explain or conn.dialect.name != "sqlite":
+            return None
+        if not shape.upper().startswith("SELECT"):
+            return None
+        if shape not in self._plans:
+            # Raw DBAPI cursor: bypasses SQLAlchemy events (and this listener)
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+                self._plans[shape] = "\n".join(row[-1] for row in cursor.fetchall())
+            except Exception:  # pylint: disable=broad-except
+                self._plans[shape] = None
+            finally:
+                cursor.close()
+        return self._plans[shape]
+
+    def record(self, **entry) -> None:
+        """Appends one entry and trims the buffer to `capacity` rows."""
+        conn = self._connect()
+        cursor = conn.execute(
+            "INSERT INTO slow_queries (recorded_at, duration_ms, fingerprint, "
+            "statement, parameter_shape, caller, plan) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                time.time(),
+                entry["duration_ms"],
+                entry["fingerprint"],
+                entry["statement"],
+                entry.get("parameter_shape"),
+                entry.get("caller"),
+                entry.get("plan"),
+            ),
+        )
+        if cursor.lastrowid % 100 == 0:
+            conn.execute(
+                "DELETE FROM slow_queries WHERE id <= ?",
+                (cursor.lastrowid - self.capacity,),
+            )
+
+    def entries(self) -> List[dict]:
+        """All buffered entries, oldest first."""
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(
+                "SELECT * FROM slow_queries ORDER BY id DESC LIMIT ?", (self.capacity,)
+            ).fetchall()
+        finally:
+            conn.row_factory = None
+        return [dict(row) for row in reversed(rows)]
+
+    def top(self, limit: int = 10, by: str = "total") -> List[dict]:
+        """
+        Buffered entries grouped by fingerprint, worst first by total or p95
+        time: count, total/p95/max ms, the most frequent caller and last plan.
+        """
+        groups: Dict[str, List[dict]] = {}
+        for entry in self.entries():
+            groups.setdefault(entry["fingerprint"], []).append(entry)
+        summaries = []
+        for shape, entries in groups.items():
+            durations = sorted(e["duration_ms"] for e in entries)
+            callers = Counter(e["caller"] for e in entries if e["caller"])
+            summaries.append(
+                {
+                    "fingerprint": shape,
+                    "count": len(durations),
+                    "total_ms": sum(durations),
+                    "p95_ms": durations[max(0, math.ceil(0.95 * len(durations)) - 1)],
+                    "max_ms": durations[-1],
+                    "caller": callers.most_common(1)[0][0] if callers else None,
+                    "parameter_shape": entries[-1]["parameter_shape"],
+                    "plan": entries[-1]["plan"],
+                }
+            )
+        summaries.sort(key=lambda s: s[f"{by}_ms"], reverse=True)
+        return summaries[:limit]
+
+    def clear(self) -> None:
+        """Empties the buffer."""
+        self._connect().execute("DELETE FROM slow_queries")
+
+
+# --- Flask integration ---
+
+# Recorder per engine, like the metrics registries
+_engine_recorders: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_listener_installed = False
+
+
+def _observe(conn, statement, parameters, seconds) -> None:
+    recorder = _engine_recorders.get(conn.engine)
+    if recorder is not None:
+        recorder.observe(conn, statement, parameters, seconds)
+
+
+@click.command("slow-queries")
+@click.option("--top", "limit", default=10, show_default=True, help="Fingerprints.")
+@click.option(
+    "--by",
+    type=click.Choice(["total", "p95"]),
+    default="total",
+    show_default=True,
+    help="Ranking.",
+)
+@click.option("--plans/--no-plans", default=False, help="Show query plans.")
+@click.option("--json", "as_json", is_flag=True, help="Machine-readable output.")
+@click.option("--clear", is_flag=True, help="Empty the buffer afterwards.")
+@with_appcontext
+def slow_queries_command(limit, by, plans, as_json, clear):
+    """Show the slowest statement fingerprints from the slow query log."""
+    recorder = current_app.extensions.get(EXTENSION_KEY)
+    if recorder is None:
+        raise click.ClickException("Slow query log is disabled (SLOW_QUERY_ENABLED).")
+    summaries = recorder.top(limit, by)
+    if as_json:
+        click.echo(json.dumps(summaries, indent=2))
+    elif not summaries:
+        click.echo("No slow queries recorded.")
+    for rank, summary in enumerate([] if as_json else summaries, start=1):
+        click.echo(
+            f"{rank:>2}. count={summary['count']} total={summary['total_ms']:.1f}ms "
+            f"p95={summary['p95_ms']:.1f}ms max={summary['max_ms']:.1f}ms "
+            f"caller={summary['caller'] or '-'}"
+        )
+        click.echo(f"    {summary['fingerprint']}")
+        click.echo(f"    params {summary['parameter_shape']}")
+        if plans and summary["plan"]:
+            for line in summary["plan"].splitlines():
+                click.echo(f"    plan: {line}")
+    if clear:
+        recorder.clear()
+
+
+def init_app(app: Flask) -> Optional[SlowQueryRecorder]:
+    """Starts recording from the SLOW_QUERY_* settings and adds the CLI."""
+    global _listener_installed  # pylint: disable=global-statement
+    app.cli.add_command(slow_queries_command)
+    if not app.config["SLOW_QUERY_ENABLED"]:
+        return None
+    from . import db, db_routing  # pylint: disable=C0415
+
+    recorder = SlowQueryRecorder(
+        app.config["SLOW_QUERY_LOG_PATH"],
+        threshold_ms=app.config["SLOW_QUERY_THRESHOLD_MS"],
+        capacity=app.config["SLOW_QUERY_CAPACITY"],
+        explain=app.config["SLOW_QUERY_EXPLAIN"],
+    )
+    app.extensions[EXTENSION_KEY] = recorder
+    with app.app_context():
+        engines = list(db.engines.values())
+    router = app.extensions.get(db_routing.EXTENSION_KEY)
+    engines.extend(router.replicas if router is not None else ())
+    for engine in engines:
+        _engine_recorders[engine] = recorder
+    if not _listener_installed:
+        instrumentation.add_query_listener(_observe)
+        _listener_installed = True
+    return recorder
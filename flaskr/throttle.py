@@ -0,0 +1,226 @@
+# flaskr/throttle.py
+"""
+Sliding-window login throttling.
+Counts login attempts per identifier and per client IP and rejects the
+excess before any password hash is verified, so credential stuffing cannot
+pin the workers' CPUs. Attempts are kept in memory per worker by default,
+or in a shared SQLite file so all workers on a host see the same counts.
+Attempts over a key's limit are rejected without being recorded, so a
+flood neither grows the log nor (with SQLite) takes the write lock.
+Expired attempts are swept for every key once per window, so keys that are
+never hit again (sprayed identifiers, one-off IPs) do not accumulate.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, Optional
+
+from flask import Flask, current_app
+
+# Key under app.extensions where the app's throttle is stored
+EXTENSION_KEY = "login_throttle"
+
+
+class MemoryBackend:
+    """Per-process attempt log: one timestamp deque per key."""
+
+    def __init__(self):
+        self._attempts: Dict[str, Deque[float]] = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, now: float, window: float, limit: int) -> Optional[float]:
+        """
+        Records an attempt if `key` has fewer than `limit` in the window and
+        returns None; otherwise returns the oldest attempt's timestamp.
+        """
+        with self._lock:
+            attempts = self._attempts[key]
+            while attempts and attempts[0] <= now - window:
+                attempts.popleft()
+            if len(attempts) >= limit:
+                return attempts[0] if attempts else now
+            attempts.append(now)
+            return None
+
+    def oldest(self, key: str) -> Optional[float]:
+        """Timestamp of the oldest attempt still held for `key`."""
+        with self._lock:
+            attempts = self._attempts.get(key)
+            return attempts[0] if attempts else None
+
+    def reset(self, key: str) -> None:
+        """Forgets every attempt for `key`."""
+        with self._lock:
+            self._attempts.pop(key, None)
+
+    def sweep(self, cutoff: float) -> None:
+        """Drops attempts at or before `cutoff`, and keys left empty."""
+        with self._lock:
+            for key in list(self._attempts):
+                attempts = self._attempts[key]
+                while attempts and attempts[0] <= cutoff:
+                    attempts.popleft()
+                if not attempts:
+                    del self._attempts[key]
+
+
+class SQLiteBackend:
+    """
+    Attempt log shared by every process on the host through one SQLite
+    file in WAL mode. A local stand-in for a shared store such as Redis.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS login_attempts ("
+                "key TEXT NOT NULL, attempted_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_login_attempts_key_time "
+                "ON login_attempts (key, attempted_at)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_login_attempts_time "
+                "ON login_attempts (attempted_at)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread (and per process after a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def hit(self, key: str, now: float, window: float, limit: int) -> Optional[float]:
+        """
+        Records an attempt if `key` has fewer than `limit` in the window and
+        returns None; otherwise returns the oldest attempt's timestamp.
+        """
+        conn = self._connect()
+        window_sql = (
+            "SELECT COUNT(*), MIN(attempted_at) FROM login_attempts "
+            "WHERE key = ? AND attempted_at > ?"
+        )
+        # Rejections are answered by a read: a flood never queues on the
+        # write lock
+        count, oldest = conn.execute(window_sql, (key, now - window)).fetchone()
+        if count >= limit:
+            return oldest if oldest is not None else now
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Recount under the lock: another worker may have filled the key
+            count, oldest = conn.execute(window_sql, (key, now - window)).fetchone()
+            if count < limit:
+                conn.execute(
+                    "DELETE FROM login_attempts WHERE key = ? AND attempted_at <= ?",
+                    (key, now - window),
+                )
+                conn.execute(
+                    "INSERT INTO login_attempts (key, attempted_at) VALUES (?, ?)",
+                    (key, now),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if count >= limit:
+            return oldest if oldest is not None else now
+        return None
+
+    def oldest(self, key: str) -> Optional[float]:
+        """Timestamp of the oldest attempt still held for `key`."""
+        (oldest,) = (
+            self._connect()
+            .execute(
+                "SELECT MIN(attempted_at) FROM login_attempts WHERE key = ?", (key,)
+            )
+            .fetchone()
+        )
+        return oldest
+
+    def reset(self, key: str) -> None:
+        """Forgets every attempt for `key`."""
+        self._connect().execute("DELETE FROM login_attempts WHERE key = ?", (key,))
+
+    def sweep(self, cutoff: float) -> None:
+        """Drops attempts at or before `cutoff`, for every key."""
+        self._connect().execute(
+            "DELETE FROM login_attempts WHERE attempted_at <= ?", (cutoff,)
+        )
+
+
+class LoginThrottle:
+    """Applies per-identifier and per-IP sliding-window limits."""
+
+    def __init__(
+        self,
+        backend,
+        window: float = 60.0,
+        identifier_limit: int = 10,
+        ip_limit: int = 100,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.backend = backend
+        self.window = window
+        self.identifier_limit = identifier_limit
+        self.ip_limit = ip_limit
+        self._clock = clock
+        self._next_sweep = clock() + window
+
+    def attempt(self, identifier: str, ip: Optional[str]) -> Optional[float]:
+        """
+        Records a login attempt. Returns None if it may proceed, otherwise
+        the number of seconds until the client may retry.
+        """
+        now = self._clock()
+        if now >= self._next_sweep:
+            # Benign race: two threads may both sweep once
+            self._next_sweep = now + self.window
+            self.backend.sweep(now - self.window)
+        checks = [(f"id:{(identifier or '').lower()}", self.identifier_limit)]
+        if ip:
+            checks.append((f"ip:{ip}", self.ip_limit))
+        retry_after = None
+        for key, limit in checks:
+            oldest = self.backend.hit(key, now, self.window, limit)
+            if oldest is not None:
+                wait = max(oldest + self.window - now, 1.0)
+                retry_after = max(retry_after or 0.0, wait)
+        return retry_after
+
+    def reset_identifier(self, identifier: str) -> None:
+        """Clears an identifier's attempts, e.g. after a successful login."""
+        self.backend.reset(f"id:{(identifier or '').lower()}")
+
+
+def init_app(app: Flask) -> Optional[LoginThrottle]:
+    """Creates the app's throttle from the LOGIN_THROTTLE_* settings."""
+    if not app.config["LOGIN_THROTTLE_ENABLED"]:
+        return None
+    if app.config["LOGIN_THROTTLE_BACKEND"] == "sqlite":
+        backend = SQLiteBackend(app.config["LOGIN_THROTTLE_SQLITE_PATH"])
+    else:
+        backend = MemoryBackend()
+    throttle = LoginThrottle(
+        backend,
+        window=app.config["LOGIN_THROTTLE_WINDOW"],
+        identifier_limit=app.config["LOGIN_THROTTLE_IDENTIFIER_LIMIT"],
+        ip_limit=app.config["LOGIN_THROTTLE_IP_LIMIT"],
+    )
+    app.extensions[EXTENSION_KEY] = throttle
+    return throttle
+
+
+def get_throttle() -> Optional[LoginThrottle]:
+    """Returns the current app's throttle, or None when disabled."""
+    return current_app.extensions.get(EXTENSION_KEY)
@@ -0,0 +1,172 @@
+# flaskr/user_cache.py
+"""
+Cached user loading for Flask-Login.
+`load_user` runs on every authenticated request, so instead of querying the
+users table each time it serves lightweight read-only `UserSnapshot`s from a
+TTL-bounded LRU. Snapshots are dropped whenever a User row is updated or
+deleted through the ORM (identifier change, password change, delete_user);
+other workers see such changes within USER_CACHE_TTL seconds.
+Views that need to modify the user call `current_user_for_update()`.
+Lookups are timed into /metrics by result (hit or miss) when metrics are on.
+"""
+
+import datetime
+import time
+from typing import Callable, List, Optional
+
+from flask import Flask, current_app, has_app_context
+from flask_login import UserMixin, current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import crud, db, metrics
+from .cache import TTLCache
+from .models import User
+
+# Key under app.extensions where the app's cache is stored
+EXTENSION_KEY = "user_cache"
+# Session.info key collecting user ids changed in the current transaction
+_DIRTY_KEY = "user_cache_dirty_ids"
+
+
+class UserSnapshot(UserMixin):
+    """Read-only copy of the User fields views read through `current_user`."""
+
+    def __init__(
+        self,
+        id: int,  # pylint: disable=redefined-builtin
+        user_identifier: str,
+        created_at: Optional[datetime.datetime],
+        updated_at: Optional[datetime.datetime],
+    ):
+        object.__setattr__(self, "id", id)
+        object.__setattr__(self, "user_identifier", user_identifier)
+        object.__setattr__(self, "created_at", created_at)
+        object.__setattr__(self, "updated_at", updated_at)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(
+            "UserSnapshot is read-only; use current_user_for_update() to write."
+        )
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        """Copies the cacheable fields of an ORM User."""
+        return cls(user.id, user.user_identifier, user.created_at, user.updated_at)
+
+    def __repr__(self) -> str:
+        """Provide a helpful representation when printing the object."""
+        return f"<UserSnapshot id={self.id}, identifier='{self.user_identifier}'>"
+
+
+class UserCache:
+    """Per-app snapshot cache plus lookup instrumentation hooks."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._listeners: List[Callable[[bool, float], None]] = []
+
+    def add_lookup_listener(self, listener: Callable[[bool, float], None]) -> None:
+        """
+        Registers `listener(hit, seconds)`, called after every cache lookup
+        with its duration, including the database load on a miss.
+        """
+        self._listeners.append(listener)
+
+    def load(self, user_id: int) -> Optional[UserSnapshot]:
+        """Returns the user's snapshot, querying the DB only on a miss."""
+        start = time.perf_counter()
+        snapshot = self.cache.get(user_id)
+        hit = snapshot is not None
+        if not hit:
+            user = crud.get_user_by_id(db.session, user_id)  # Replica-eligible
+            if user is not None:
+                snapshot = UserSnapshot.from_user(user)
+                self.cache.set(user_id, snapshot)
+        if self._listeners:
+            seconds = time.perf_counter() - start
+            for listener in self._listeners:
+                listener(hit, seconds)
+        return snapshot
+
+    def invalidate(self, user_id: int) -> None:
+        """Drops a user's snapshot."""
+        self.cache.pop(user_id)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current hit rate."""
+        return self.cache.stats()
+
+
+def init_app(app: Flask) -> UserCache:
+    """
+    Creates the app's user cache from USER_CACHE_SIZE / USER_CACHE_TTL and
+    times its lookups into /metrics when enabled.
+    """
+    user_cache = UserCache(
+        maxsize=app.config["USER_CACHE_SIZE"], ttl=app.config["USER_CACHE_TTL"]
+    )
+    app.extensions[EXTENSION_KEY] = user_cache
+    registry = app.extensions.get(metrics.EXTENSION_KEY)
+    if registry is not None:
+        user_cache.add_lookup_listener(
+            lambda hit, seconds: registry.observe(
+                metrics.USER_CACHE_DURATION, seconds, result="hit" if hit else "miss"
+            )
+        )
+    return user_cache
+
+
+def get_user_cache() -> Optional[UserCache]:
+    """Returns the current app's user cache, if enabled."""
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def load_user(user_id: int):
+    """Returns a cached UserSnapshot, or the ORM User when caching is off."""
+    user_cache = get_user_cache()
+    if user_cache is None:
+        return crud.get_user_by_id(db.session, user_id)
+    return user_cache.load(user_id)
+
+
+def current_user_for_update() -> Optional[User]:
+    """Returns the logged-in user as a writable ORM User (or None)."""
+    if not current_user.is_authenticated:
+        return None
+    if isinstance(current_user._get_current_object(), User):
+        return current_user._get_current_object()
+    return db.session.get(User, int(current_user.get_id()))
+
+
+# --- Invalidation ---
+
+
+def _invalidate_now(user_id: int) -> None:
+    if has_app_context():
+        user_cache = get_user_cache()
+        if user_cache is not None:
+            user_cache.invalidate(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target) -> None:
+    """Drops the snapshot now and again once the change is committed."""
+    _invalidate_now(target.id)
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault(_DIRTY_KEY, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session) -> None:
+    # A concurrent request may have re-cached the old row between our flush
+    # and commit; drop it again now that the new row is visible.
+    for user_id in session.info.pop(_DIRTY_KEY, ()):
+        _invalidate_now(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
@@ -4,7 +4,7 @@ Pytest fixtures for the Sigma AI application tests.
 """
 
 # 1. Standard Library Imports
-from typing import Generator
+from typing import Callable, Generator
 
 # 2. Third-Party Imports
 import pytest
@@ -16,6 +16,24 @@ from sqlalchemy.orm import Session  # Keep Session for type hint
 # 3. Local Application Imports
 # Make sure models are imported somewhere (e.g., in __init__.py) for db.create_all()
 from flaskr import create_app, db as _db  # Use _db alias to avoid conflict
+from flaskr.instrumentation import assert_query_budget
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _instance_files(
+    tmp_path_factory: pytest.TempPathFactory,
+) -> Generator[None, None, None]:
+    """
+    Points the files every app writes by default (filesystem sessions, the
+    slow query log) at a temp dir, so apps built by tests stay out of the
+    repo's instance folder. Tests that pass these settings still win.
+    """
+    base = tmp_path_factory.mktemp("instance")
+    patch = pytest.MonkeyPatch()
+    patch.setenv("SESSION_FILE_DIR", str(base / "flask_session"))
+    patch.setenv("SLOW_QUERY_LOG_PATH", str(base / "slow_queries.sqlite"))
+    yield
+    patch.undo()
 
 
 @pytest.fixture(scope="session")
@@ -98,3 +116,16 @@ def session(
 
         # Optional: Remove the session - may not be strictly needed if scope management is sound
         # db.session.remove()
+
+
+@pytest.fixture(scope="function")
+def query_budget() -> Callable:
+    """
+    Asserts a maximum number of SQL statements for a block, e.g.:
+
+        with query_budget(3):
+            client.get("/auth/login")
+
+    On failure the message lists the statement shapes that ran.
+    """
+    return assert_query_budget
@@ -0,0 +1,109 @@
+"""Tests for the adaptive difficulty engine and `flask recompute-difficulty`."""
+
+import numpy as np
+
+from flaskr import create_app, crud, db
+from flaskr.adaptive import (
+    EXTENSION_KEY,
+    AdaptiveEngine,
+    StreakPolicy,
+    recompute_command,
+)
+from flaskr.models import QuestionLog, UserProgress
+from flaskr.seeding import SeedSpec, seed_database
+
+
+def _replay_one_by_one(engine, user_ids, skill_ids, answers):
+    states = {}
+    for pair, is_correct in zip(zip(user_ids, skill_ids), answers):
+        state = states.get(pair, engine.initial_state())
+        states[pair] = engine.next_state(state, bool(is_correct))
+    return states
+
+
+def test_record_answer_matches_in_memory_policy(session):
+    """Test the SQL assignments and `step` agree, for any policy."""
+    rng = np.random.default_rng(3)
+    for policy in (StreakPolicy(), StreakPolicy(1, 4, 2, 3)):
+        engine = AdaptiveEngine(policy)
+        suffix = policy.correct_to_level_up
+        crud.create_users_bulk(
+            session, [{"user_identifier": f"adaptive_{suffix}", "password_hash": "h"}]
+        )
+        crud.upsert_skills_bulk(
+            session, [{"skill_id_string": f"adaptive_{suffix}", "name": "Adaptive"}]
+        )
+        user = crud.get_user_by_identifier(session, f"adaptive_{suffix}")
+        skill = crud.get_skill_by_id_string(session, f"adaptive_{suffix}")
+
+        state = engine.initial_state()
+        for n, is_correct in enumerate(rng.random(60) < 0.6):
+            recorded = crud.record_answer(
+                session,
+                user.id,
+                skill.id,
+                bool(is_correct),
+                {"difficulty_presented": state[0], "question_text_generated": str(n)},
+                policy=policy,
+            )
+            state = engine.next_state(state, bool(is_correct))
+            assert tuple(recorded[:3]) == state
+
+
+def test_replay_matches_per_request_mode():
+    """Test the vectorised replay equals stepping each answer in turn."""
+    rng = np.random.default_rng(0)
+    user_ids = rng.integers(1, 30, 5000)
+    skill_ids = rng.integers(1, 4, 5000)
+    answers = rng.random(5000) < 0.7
+    for policy in (StreakPolicy(), StreakPolicy(1, 5, 1, 1)):
+        engine = AdaptiveEngine(policy, default_difficulty=3)
+        replay = engine.replay(user_ids, skill_ids, answers)
+        columns = (column.tolist() for column in replay)
+        assert {
+            (user_id, skill_id): (difficulty, correct, incorrect)
+            for user_id, skill_id, difficulty, correct, incorrect in zip(*columns)
+        } == _replay_one_by_one(engine, user_ids, skill_ids, answers)
+
+
+def test_recompute_command_rewrites_progress(tmp_path):
+    """Test a recompute brings every pair in line with its history."""
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'adaptive.sqlite'}",
+        }
+    )
+    with app.app_context():
+        db.create_all()
+        # Seeded progress rows are random, not derived from the seeded logs
+        seed_database(db.engine, SeedSpec(users=20, skills=5, logs=3000), ["h"])
+    # A stricter policy than the default
+    app.extensions[EXTENSION_KEY] = AdaptiveEngine(StreakPolicy(1, 5, 4, 1))
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(recompute_command, ["--dry-run"])
+    assert result.exit_code == 0, result.output
+    assert "would change" in result.output
+    result = runner.invoke(recompute_command)
+    assert result.exit_code == 0, result.output
+    assert "0 skipped" in result.output
+
+    with app.app_context():
+        logs = db.session.query(QuestionLog).order_by(QuestionLog.id).all()
+        expected = _replay_one_by_one(
+            app.extensions[EXTENSION_KEY],
+            [log.user_id for log in logs],
+            [log.skill_id for log in logs],
+            [log.is_correct for log in logs],
+        )
+        for progress in db.session.query(UserProgress):
+            pair = (progress.user_id, progress.skill_id)
+            if pair in expected:
+                assert expected[pair] == (
+                    progress.current_difficulty,
+                    progress.correct_streak,
+                    progress.incorrect_streak,
+                )
+    result = runner.invoke(recompute_command, ["--dry-run"])
+    assert ": 0 would change." in result.output
@@ -0,0 +1,131 @@
+"""Tests for IRT calibration and `flask calibrate`."""
+
+import numpy as np
+
+from flaskr import create_app, crud, db
+from flaskr.calibration import (
+    EXTENSION_KEY,
+    Calibration,
+    Responses,
+    calibrate_command,
+    fit,
+    get_calibration,
+)
+from flaskr.seeding import SeedSpec, seed_database
+
+
+def _simulate(rng, users=500, skills=8, levels=6, answers=60_000):
+    ability = rng.normal(0, 1, users)
+    difficulty = rng.normal(0, 1, (skills, levels))
+    user_ids = rng.integers(1, users, answers).astype(np.int32)
+    skill_ids = rng.integers(1, skills, answers).astype(np.int32)
+    level_ids = rng.integers(1, levels, answers).astype(np.int8)
+    logit = ability[user_ids] - difficulty[skill_ids, level_ids]
+    correct = rng.random(answers) < 1 / (1 + np.exp(-logit))
+    return ability, difficulty, Responses(user_ids, skill_ids, level_ids, correct, 0)
+
+
+def _slice(responses, stop, start=0):
+    return Responses(
+        *(
+            column[start:stop]
+            for column in (
+                responses.users,
+                responses.skills,
+                responses.levels,
+                responses.correct,
+            )
+        ),
+        stop,
+    )
+
+
+def test_fit_recovers_parameters_and_updates_incrementally():
+    """Test the fit tracks the true parameters and updates match a refit."""
+    ability, difficulty, responses = _simulate(np.random.default_rng(0))
+    full = fit(responses)
+    assert np.corrcoef(full.ability[1:], ability[1:])[0, 1] > 0.9
+    assert (
+        np.corrcoef(full.difficulty[1:, 1:].ravel(), difficulty[1:, 1:].ravel())[0, 1]
+        > 0.95
+    )
+
+    half = len(responses) // 2
+    updated = fit(_slice(responses, len(responses), half), fit(_slice(responses, half)))
+    assert np.abs(updated.ability - full.ability).max() < 0.1
+    assert np.abs(updated.difficulty - full.difficulty).max() < 0.1
+    assert (updated.item_answers == full.item_answers).all()
+
+
+def test_lookups_default_to_the_prior():
+    """Test unseen learners and items read as 0 logits (p = 0.5)."""
+    calibration = Calibration.empty()
+    assert calibration.user_ability(7) == 0.0
+    assert calibration.item_difficulty(3, 2) == 0.0
+    assert calibration.p_correct(7, 3, 2) == 0.5
+
+
+def _picker_calibration(answers=50):
+    # Learner 1 at +2 logits; skill 1's levels 1-4 at -1, 0, 1 and 2 logits
+    difficulty = np.zeros((2, 6))
+    difficulty[1, 1:5] = [-1.0, 0.0, 1.0, 2.0]
+    return Calibration(
+        np.array([0.0, 2.0]),
+        np.array([1.0, 5.0]),
+        difficulty,
+        np.full((2, 6), 5.0),
+        np.full((2, 6), answers),
+        0,
+    )
+
+
+def test_pick_level_aims_at_the_target_accuracy():
+    """Test the level nearest the target wins once learner and items are fit."""
+    calibration = _picker_calibration()
+    assert calibration.pick_level(1, 1, [2, 1, 3], 0.75) == 3  # p = 0.73
+    assert calibration.pick_level(1, 1, [2, 1, 3], 0.9) == 2  # p = 0.88
+    assert calibration.pick_level(0, 1, [2, 1, 3], 0.75) is None  # Unfitted learner
+    assert calibration.pick_level(1, 7, [2, 1, 3], 0.75) is None  # Unknown skill
+    assert _picker_calibration(answers=5).pick_level(1, 1, [2], 0.75) is None
+
+
+def test_calibrate_command_fits_then_updates(tmp_path):
+    """Test a full fit, an incremental update and the app's hot reload."""
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'irt.sqlite'}",
+            "CALIBRATION_PATH": str(tmp_path / "calibration.npz"),
+            "CALIBRATION_CHECK_INTERVAL": 0,
+        }
+    )
+    with app.app_context():
+        db.create_all()
+        seed_database(db.engine, SeedSpec(users=30, skills=4, logs=4000), ["h"])
+        assert get_calibration().last_log_id == 0
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(calibrate_command)
+    assert result.exit_code == 0, result.output
+    assert "Fitted with 4,000 answers" in result.output
+    with app.app_context():
+        calibration = get_calibration()
+        assert calibration.last_log_id == 4000
+        assert calibration.item_answers.sum() == 4000
+        before = calibration.user_ability(1)
+        for n in range(20):
+            crud.record_answer(
+                db.session,
+                1,
+                1,
+                True,
+                {"difficulty_presented": 5, "question_text_generated": str(n)},
+            )
+
+    result = runner.invoke(calibrate_command)
+    assert "Updated with 20 answers" in result.output
+    with app.app_context():
+        assert get_calibration().user_ability(1) > before
+        assert app.extensions[EXTENSION_KEY].get().last_log_id == 4020
+    result = runner.invoke(calibrate_command)
+    assert "nothing to do" in result.output
@@ -1,7 +1,10 @@
 # tests/test_crud.py
 """Integration tests for the CRUD operations using the database."""
 
+import datetime
+
 import pytest
+from sqlalchemy import event, text, update
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError  # For testing constraints
 
@@ -110,3 +113,233 @@ def test_create_question_log(session: Session):
     logs = crud.get_recent_logs_for_user_skill(session, user.id, skill.id, limit=1)
     assert len(logs) == 1
     assert logs[0].id == log_entry.id
+
+
+def test_create_users_bulk(session: Session):
+    """Test creating many users in one call, and rejecting duplicates."""
+    users = [
+        {"user_identifier": f"bulk_user_{n}", "password_hash": "hash"} for n in range(3)
+    ]
+    assert crud.create_users_bulk(session, users) == 3
+    assert crud.get_user_by_identifier(session, "bulk_user_2") is not None
+
+    with pytest.raises(ValueError):
+        crud.create_users_bulk(
+            session, [{"user_identifier": "bulk_user_1", "password_hash": "hash"}]
+        )
+    with pytest.raises(ValueError):
+        crud.create_users_bulk(
+            session,
+            [
+                {"user_identifier": "bulk_dup", "password_hash": "hash"},
+                {"user_identifier": "bulk_dup", "password_hash": "hash"},
+            ],
+        )
+
+
+def test_upsert_skills_bulk(session: Session):
+    """Test that bulk skill upserts insert new rows and update existing ones."""
+    crud.upsert_skills_bulk(
+        session,
+        [
+            {"skill_id_string": "bulk_skill_a", "name": "A"},
+            {"skill_id_string": "bulk_skill_b", "name": "B"},
+        ],
+    )
+    written = crud.upsert_skills_bulk(
+        session,
+        [
+            {"skill_id_string": "bulk_skill_a", "name": "A2", "description": "new"},
+            {"skill_id_string": "bulk_skill_c", "name": "C"},
+        ],
+    )
+    assert written == 2
+    skill_a = crud.get_skill_by_id_string(session, "bulk_skill_a")
+    session.refresh(skill_a)
+    assert skill_a.name == "A2"
+    assert skill_a.description == "new"
+    assert crud.get_skill_by_id_string(session, "bulk_skill_c") is not None
+
+
+def test_ensure_progress_bulk(session: Session):
+    """Test bulk progress creation is idempotent and validates references."""
+    crud.create_users_bulk(
+        session, [{"user_identifier": "bulk_progress_user", "password_hash": "h"}]
+    )
+    user = crud.get_user_by_identifier(session, "bulk_progress_user")
+    crud.upsert_skills_bulk(
+        session,
+        [
+            {"skill_id_string": "bulk_progress_1", "name": "P1"},
+            {"skill_id_string": "bulk_progress_2", "name": "P2"},
+        ],
+    )
+    skill_ids = [
+        crud.get_skill_by_id_string(session, f"bulk_progress_{n}").id for n in (1, 2)
+    ]
+    pairs = [(user.id, skill_id) for skill_id in skill_ids]
+
+    assert crud.ensure_progress_bulk(session, pairs) == 2
+    assert crud.ensure_progress_bulk(session, pairs + pairs) == 2  # No-op rerun
+    progress = crud.get_user_progress(session, user.id, skill_ids[0])
+    assert progress.current_difficulty == 2
+    assert progress.correct_streak == 0
+
+    with pytest.raises(ValueError):
+        crud.ensure_progress_bulk(session, [(user.id, 999_999)])
+
+
+def _make_user_and_skill(session: Session, suffix: str):
+    """Creates a user and skill via the bulk APIs (which set password hashes)."""
+    crud.create_users_bulk(
+        session, [{"user_identifier": f"user_{suffix}", "password_hash": "h"}]
+    )
+    crud.upsert_skills_bulk(
+        session, [{"skill_id_string": f"skill_{suffix}", "name": suffix}]
+    )
+    return (
+        crud.get_user_by_identifier(session, f"user_{suffix}"),
+        crud.get_skill_by_id_string(session, f"skill_{suffix}"),
+    )
+
+
+def test_get_or_create_user_progress_rejects_unknown_refs(session: Session):
+    """Test that foreign keys reject progress for a missing skill."""
+    user, _ = _make_user_and_skill(session, "progress_fk")
+    with pytest.raises(ValueError):
+        crud.get_or_create_user_progress(session, user.id, 999_999)
+    # The session is usable again after the failed insert
+    assert crud.get_user_by_id(session, user.id) is not None
+
+
+def test_get_or_create_user_progress_lost_race(session: Session, monkeypatch):
+    """Test that a row inserted by a concurrent request is returned as-is."""
+    user, skill = _make_user_and_skill(session, "progress_race")
+    existing = crud.get_or_create_user_progress(session, user.id, skill.id)
+
+    # Simulate a request whose lookup ran before the other insert committed
+    real_lookup = crud.get_user_progress
+    calls = []
+
+    def stale_lookup(db_session, user_id, skill_id):
+        calls.append(1)
+        if len(calls) == 1:
+            return None
+        return real_lookup(db_session, user_id, skill_id)
+
+    monkeypatch.setattr(crud, "get_user_progress", stale_lookup)
+    progress = crud.get_or_create_user_progress(session, user.id, skill.id)
+    assert progress.id == existing.id
+    assert len(calls) == 2
+
+
+def _answer_log(n: int) -> dict:
+    return {"difficulty_presented": 2, "question_text_generated": f"Q{n}"}
+
+
+def test_record_answer_updates_streaks_and_difficulty(session: Session):
+    """Test streak counting, level changes and log insertion per answer."""
+    user, skill = _make_user_and_skill(session, "record_answer")
+
+    state = crud.record_answer(session, user.id, skill.id, True, _answer_log(1))
+    assert state.log_id is not None
+    assert (state.current_difficulty, state.correct_streak) == (2, 1)
+
+    for n in range(2, crud.CORRECT_STREAK_TO_LEVEL_UP + 1):
+        state = crud.record_answer(session, user.id, skill.id, True, _answer_log(n))
+    # Reaching the correct-streak threshold levels up and resets the streak
+    assert (state.current_difficulty, state.correct_streak) == (3, 0)
+
+    state = crud.record_answer(session, user.id, skill.id, False, _answer_log(9))
+    assert (state.correct_streak, state.incorrect_streak) == (0, 1)
+    state = crud.record_answer(session, user.id, skill.id, False, _answer_log(10))
+    assert (state.current_difficulty, state.incorrect_streak) == (2, 0)
+
+    progress = crud.get_user_progress(session, user.id, skill.id)
+    session.refresh(progress)
+    assert progress.current_difficulty == 2
+    assert progress.last_interaction_at is not None
+    logs = crud.get_recent_logs_for_user_skill(session, user.id, skill.id, limit=20)
+    assert len(logs) == crud.CORRECT_STREAK_TO_LEVEL_UP + 2
+
+
+def test_record_answer_respects_difficulty_bounds(session: Session):
+    """Test that difficulty never drops below the minimum level."""
+    user, skill = _make_user_and_skill(session, "record_bounds")
+    for n in range(6):
+        state = crud.record_answer(
+            session, user.id, skill.id, False, _answer_log(n), default_difficulty=1
+        )
+    assert state.current_difficulty == crud.MIN_DIFFICULTY
+
+
+def test_log_history_pages_and_streams_through_ties(session: Session):
+    """Test keyset pages and the stream visit every log once, newest first."""
+    user, skill = _make_user_and_skill(session, "history")
+    # Same-second logs stored both as CURRENT_TIMESTAMP text and as Python
+    # datetimes (with microseconds), plus one later log
+    second = datetime.datetime(2024, 1, 1, 12, 0, 0)
+    for n in range(6):
+        log_data = {"user_id": user.id, "skill_id": skill.id, **_answer_log(n)}
+        if n % 2:
+            log_data["question_timestamp"] = second
+        crud.create_question_log(session, log_data)
+    session.execute(
+        update(QuestionLog)
+        .where(QuestionLog.question_timestamp > second)
+        .values(question_timestamp=text("'2024-01-01 12:00:00'"))
+    )
+    crud.create_question_log(
+        session,
+        {
+            "user_id": user.id,
+            "skill_id": skill.id,
+            "question_timestamp": datetime.datetime(2024, 1, 1, 12, 0, 1),
+            **_answer_log(6),
+        },
+    )
+
+    streamed = list(crud.iter_log_history(session, user.id, skill.id, batch_size=2))
+    assert len(streamed) == 7
+    assert streamed[0].question_text_generated == "Q6"
+
+    paged, cursor = [], None
+    while True:
+        page = crud.get_log_history_page(
+            session, user.id, skill.id, limit=2, before=cursor
+        )
+        paged.extend(page.logs)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert [log.id for log in paged] == [log.id for log in streamed]
+    assert len(page.logs) == 1
+
+
+def test_unit_of_work_defers_commit(session: Session):
+    """Test that crud calls inside unit_of_work flush and commit once."""
+    commits = []
+    listener = lambda _session: commits.append(1)  # noqa: E731
+    event.listen(session, "after_commit", listener)
+    try:
+        with crud.unit_of_work(session):
+            user, skill = _make_user_and_skill(session, "uow_commit")
+            progress = crud.get_or_create_user_progress(session, user.id, skill.id)
+            assert progress.id is not None  # Flushed, so the ID is assigned
+            assert crud.in_unit_of_work(session)
+            assert commits == []
+        assert commits  # Committed only when the block exited
+        assert not crud.in_unit_of_work(session)
+    finally:
+        event.remove(session, "after_commit", listener)
+
+
+def test_unit_of_work_rolls_back_on_error(session: Session):
+    """Test that an error inside unit_of_work discards every crud write."""
+    with pytest.raises(RuntimeError):
+        with crud.unit_of_work(session):
+            crud.upsert_skills_bulk(
+                session, [{"skill_id_string": "uow_rollback", "name": "R"}]
+            )
+            raise RuntimeError("boom")
+    assert crud.get_skill_by_id_string(session, "uow_rollback") is None
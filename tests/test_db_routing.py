@@ -0,0 +1,128 @@
+"""Tests for read-replica routing with SQLite files standing in for replicas."""
+
+from flaskr import create_app, crud, db
+from flaskr.db_routing import ReplicaRouter, has_written, read_only, read_only_view
+from flaskr.models import User
+
+
+def _replica_app(tmp_path, replica_uris):
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'primary.sqlite'}",
+            "DB_READ_REPLICA_URIS": replica_uris,
+        }
+    )
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def _seed_replica(app, index: int, name: str) -> None:
+    # Replicas are independent files here: give each a distinguishable row
+    replica = app.extensions["db_router"].replicas[index]
+    db.metadata.create_all(replica)
+    with replica.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO skills (skill_id_string, name) VALUES (?, ?)",
+            (name, name),
+        )
+
+
+def test_reads_round_robin_across_replicas(tmp_path):
+    """Test replica_read crud functions alternate between replicas."""
+    app = _replica_app(
+        tmp_path,
+        [f"sqlite:///{tmp_path / 'r0.sqlite'}", f"sqlite:///{tmp_path / 'r1.sqlite'}"],
+    )
+    _seed_replica(app, 0, "from-r0")
+    _seed_replica(app, 1, "from-r1")
+
+    with app.app_context():
+        seen = set()
+        for _ in range(4):
+            seen.update(skill.name for skill in crud.get_all_skills(db.session))
+            db.session.remove()
+        assert seen == {"from-r0", "from-r1"}
+        # Unmarked reads use the primary, which has no skills yet
+        assert crud.get_skill_by_id_string(db.session, "from-r0") is None
+
+
+def test_reads_stick_to_primary_after_write(tmp_path):
+    """Test a session reads its own writes once it has written."""
+    app = _replica_app(tmp_path, [f"sqlite:///{tmp_path / 'r0.sqlite'}"])
+    _seed_replica(app, 0, "from-r0")
+
+    with app.app_context():
+        assert [s.name for s in crud.get_all_skills(db.session)] == ["from-r0"]
+        crud.create_skill(db.session, "written", "Written")
+        assert has_written(db.session)
+        assert [s.name for s in crud.get_all_skills(db.session)] == ["Written"]
+        db.session.remove()  # Next request: replicas again
+        with read_only(db.session):
+            assert not has_written(db.session)
+
+
+def test_read_only_view_reads_a_replica(tmp_path):
+    """Test every query in a read_only_view view goes to a replica."""
+    app = _replica_app(tmp_path, [f"sqlite:///{tmp_path / 'r0.sqlite'}"])
+    _seed_replica(app, 0, "from-r0")
+
+    @app.route("/skill/<name>")
+    @read_only_view
+    def skill_view(name):
+        skill = crud.get_skill_by_id_string(db.session, name)
+        return {"name": skill.name if skill else None}
+
+    response = app.test_client().get("/skill/from-r0")
+    assert response.json == {"name": "from-r0"}
+
+
+def test_user_writes_read_the_primary(tmp_path):
+    """Test user updates and deletes find rows a lagging replica lacks."""
+    app = _replica_app(tmp_path, [f"sqlite:///{tmp_path / 'r0.sqlite'}"])
+    db.metadata.create_all(app.extensions["db_router"].replicas[0])
+    with app.app_context():
+        db.session.execute(
+            User.__table__.insert(),
+            [{"user_identifier": name, "password_hash": "x"} for name in "ab"],
+        )
+        db.session.commit()
+        db.session.remove()
+        # Fresh sessions, as in new requests, before the replica catches up
+        assert crud.get_user_by_id(db.session, 1) is None
+        db.session.remove()
+        assert crud.update_user_identifier(db.session, 1, "renamed") is not None
+        db.session.remove()
+        assert crud.delete_user(db.session, 2)
+
+
+def test_unreachable_replica_falls_back_to_primary(tmp_path):
+    """Test a replica that fails to connect is skipped and reads still work."""
+    app = _replica_app(tmp_path, ["sqlite:////nonexistent-dir/replica.sqlite"])
+
+    with app.app_context():
+        crud.create_skill(db.session, "primary", "Primary")
+        db.session.remove()
+        assert [s.name for s in crud.get_all_skills(db.session)] == ["Primary"]
+        router = app.extensions["db_router"]
+        assert router.healthy() == []
+
+
+def test_router_retries_replica_after_interval():
+    """Test a replica marked down becomes eligible again after the interval."""
+    clock = [0.0]
+    primary, replica = object(), object()
+    router = ReplicaRouter(
+        primary, [replica], retry_interval=10, clock=lambda: clock[0]
+    )
+    router.mark_down(replica)
+    assert router.choose() is None
+    clock[0] = 11.0
+    assert router.choose() is replica
+
+
+def test_no_replicas_configured():
+    """Test routing is off (plain primary reads) without replicas."""
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+    assert "db_router" not in app.extensions
@@ -29,3 +29,60 @@ def test_testing_db_uri(app: Flask):
     else:
         # Check default if needed
         assert "flaskr.sqlite" in app.config["SQLALCHEMY_DATABASE_URI"]
+
+
+def test_request_unit_of_work(tmp_path):
+    """Test per-request unit of work commits on success, rolls back on 500."""
+    from flaskr import crud, db
+
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'uow.sqlite'}",
+            "CRUD_REQUEST_UNIT_OF_WORK": True,
+        }
+    )
+
+    @app.route("/_skill/<name>")
+    def add_skill(name):
+        crud.upsert_skills_bulk(db.session, [{"skill_id_string": name, "name": name}])
+        return ("", 500) if name == "fails" else "ok"
+
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    assert client.get("/_skill/works").status_code == 200
+    assert client.get("/_skill/fails").status_code == 500
+    with app.app_context():
+        assert crud.get_skill_by_id_string(db.session, "works") is not None
+        assert crud.get_skill_by_id_string(db.session, "fails") is None
+
+
+def test_sqlite_production_profile(tmp_path):
+    """Test the production profile sets WAL, PRAGMAs and pool settings."""
+    from flaskr import db
+
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'prod.sqlite'}",
+            "SQLITE_PROFILE": "production",
+            "SQLITE_BUSY_TIMEOUT_MS": 1234,
+            "SQLITE_POOL_SIZE": 3,
+            "SQLITE_CHECKPOINT_INTERVAL": 0,  # No background thread in tests
+        }
+    )
+    with app.app_context():
+        assert db.engine.pool.size() == 3
+        with db.engine.connect() as conn:
+
+            def pragma(name):
+                return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+            assert pragma("journal_mode") == "wal"
+            assert pragma("synchronous") == 1  # NORMAL
+            assert pragma("busy_timeout") == 1234
+            assert pragma("foreign_keys") == 1
+        checkpointer = app.extensions["sqlite_checkpointers"][None]
+        assert checkpointer.checkpoint()[0] == 0  # Not blocked
+        db.engine.dispose()
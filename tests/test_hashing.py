@@ -0,0 +1,124 @@
+# tests/test_hashing.py
+"""Tests for the password hashing service and rehash-on-login."""
+
+import os
+import signal
+import threading
+
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from werkzeug.security import generate_password_hash
+
+from flaskr import db
+from flaskr.hashing import HashingUnavailable, PasswordHasher, get_hasher
+from flaskr.models import User
+
+
+def test_pool_hashes_and_verifies():
+    """Test hashing through worker processes round-trips a password."""
+    hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=1)
+    try:
+        pwhash = hasher.generate("s3cret")
+        assert pwhash.startswith("pbkdf2:sha256:1000$")
+        assert hasher.check(pwhash, "s3cret")
+        assert not hasher.check(pwhash, "wrong")
+    finally:
+        hasher.shutdown()
+
+
+def test_pool_recovers_from_a_dead_worker():
+    """Test a killed worker process costs one retry, not every later call."""
+    hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=1)
+    try:
+        pwhash = hasher.generate("s3cret")
+        for process in list(hasher._executor._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+            process.join(5)
+        assert hasher.check(pwhash, "s3cret")
+        assert hasher.check(pwhash, "s3cret")
+    finally:
+        hasher.shutdown()
+
+
+def test_dummy_hash_is_made_in_the_pool():
+    """Test the first unknown-identifier check does not hash inline."""
+    hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=1)
+    operations = []
+    hasher.add_timing_listener(lambda operation, seconds: operations.append(operation))
+    try:
+        assert not hasher.check_dummy("guess")
+        assert not hasher.check_dummy("guess")
+        assert operations == ["generate", "check", "check"]
+        assert hasher.method_prefix == "pbkdf2:sha256:1000"
+    finally:
+        hasher.shutdown()
+
+
+def test_saturated_hasher_fails_fast():
+    """Test a caller gets HashingUnavailable when every slot is taken."""
+    hasher = PasswordHasher(workers=0, max_pending=1, queue_timeout=0.01)
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow_hash(*_args):
+        started.set()
+        release.wait(5)
+        return "done"
+
+    holder = threading.Thread(target=hasher._run, args=(slow_hash,))
+    holder.start()
+    started.wait(5)
+    try:
+        with pytest.raises(HashingUnavailable):
+            hasher.generate("password")
+    finally:
+        release.set()
+        holder.join()
+
+
+def test_needs_rehash_detects_parameter_change():
+    """Test hashes with other methods or work factors are flagged."""
+    hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=0)
+    assert not hasher.needs_rehash(hasher.generate("pw"))
+    assert hasher.needs_rehash(generate_password_hash("pw", "pbkdf2:sha256:2000"))
+    assert hasher.needs_rehash(generate_password_hash("pw", "scrypt"))
+
+
+def test_login_rehashes_outdated_hash(app: Flask, client: FlaskClient):
+    """Test a successful login upgrades a hash made with old parameters."""
+    with app.app_context():
+        user = User(
+            user_identifier="rehash_user",
+            password_hash=generate_password_hash("pw123", "pbkdf2:sha256:1000"),
+        )
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    client.post("/auth/login", data={"identifier": "rehash_user", "password": "pw123"})
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        assert not user.password_needs_rehash()
+        assert user.check_password("pw123")
+        assert user.password_hash.startswith(get_hasher().method_prefix)
+
+
+def test_login_returns_503_when_hashing_saturated(
+    app: Flask, client: FlaskClient, monkeypatch
+):
+    """Test login fails fast with 503 instead of queueing behind hashes."""
+
+    def saturated(*_args, **_kwargs):
+        raise HashingUnavailable("saturated")
+
+    with app.app_context():
+        user = User(user_identifier="busy_user", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+        monkeypatch.setattr(get_hasher(), "check", saturated)
+    response = client.post(
+        "/auth/login", data={"identifier": "busy_user", "password": "pw"}
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
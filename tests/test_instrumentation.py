@@ -0,0 +1,82 @@
+"""Tests for per-request SQL instrumentation and N+1 detection."""
+
+import copy
+
+import pytest
+from sqlalchemy import exc, text
+
+from flaskr import create_app, crud, db
+from flaskr.instrumentation import (
+    HEADER_COUNT,
+    HEADER_N_PLUS_ONE,
+    capture_queries,
+    fingerprint,
+)
+from flaskr.models import Skill
+
+
+def test_fingerprint_normalises_literals_and_lists():
+    """Test statements differing only in values share a fingerprint."""
+    assert fingerprint("SELECT * FROM users WHERE id = 5") == fingerprint(
+        "SELECT *  FROM users\n WHERE id = 17"
+    )
+    assert fingerprint("SELECT 1 FROM t WHERE name = 'a''b'") == (
+        "SELECT ? FROM t WHERE name = ?"
+    )
+    assert fingerprint("SELECT x FROM t WHERE id IN (?, ?, ?)") == (
+        "SELECT x FROM t WHERE id IN (?...)"
+    )
+    assert fingerprint("INSERT INTO t (a) VALUES (?), (?), (?)") == (
+        "INSERT INTO t (a) VALUES (?), ..."
+    )
+
+
+def test_capture_flags_repeated_selects(session):
+    """Test one SELECT shape run per row is reported as N+1."""
+    ids = [crud.create_skill(session, f"instr_{n}", f"Instr {n}").id for n in range(6)]
+    with capture_queries(n_plus_one_threshold=5) as stats:
+        for skill_id in ids:
+            session.execute(
+                text("SELECT name FROM skills WHERE id = :id"), {"id": skill_id}
+            )
+    assert stats.count == 6
+    [(shape, times)] = stats.n_plus_one()
+    assert times == 6 and shape == "SELECT name FROM skills WHERE id = ?"
+
+
+def test_failed_statements_leave_no_state_on_the_connection(session):
+    """Test statements that raise are not timed and leave conn.info as it was."""
+    conn = session.connection()
+    info_before = copy.deepcopy(conn.info)
+    with capture_queries() as stats:
+        for _ in range(3):
+            with pytest.raises(exc.OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+        conn.execute(text("SELECT 1"))
+    assert stats.count == 1
+    assert conn.info == info_before
+
+
+def test_debug_headers_and_query_budget(query_budget):
+    """Test debug responses carry SQL totals and the budget helper enforces limits."""
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+    app.debug = True
+
+    @app.route("/_skills")
+    def list_skills():
+        for skill_id in range(1, 7):
+            db.session.get(Skill, skill_id)
+        return "ok"
+
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+
+    with query_budget(6):
+        response = client.get("/_skills")
+    assert response.headers[HEADER_COUNT] == "6"
+    assert response.headers[HEADER_N_PLUS_ONE] == "1"
+
+    with pytest.raises(AssertionError, match="Query budget exceeded: 6 > 2"):
+        with query_budget(2):
+            client.get("/_skills")
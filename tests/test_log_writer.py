@@ -0,0 +1,130 @@
+# tests/test_log_writer.py
+"""Tests for the write-behind QuestionLog writer."""
+
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from flaskr import create_app, crud, db
+from flaskr.log_writer import get_writer, submit_question_log
+from flaskr.models import QuestionLog, Skill, User
+
+
+@pytest.fixture
+def writer_app(tmp_path):
+    """An app on a file-backed SQLite DB with the log writer enabled."""
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'writer.sqlite'}",
+            "SECRET_KEY": "test-secret-key",
+            "QUESTION_LOG_WRITER_ENABLED": True,
+            # Large batch and interval so only explicit flushes write here
+            "QUESTION_LOG_BATCH_SIZE": 10,
+            "QUESTION_LOG_FLUSH_INTERVAL": 60,
+            "QUESTION_LOG_QUEUE_SIZE": 3,
+            "QUESTION_LOG_SPILL_PATH": str(tmp_path / "spill.jsonl"),
+            "QUESTION_LOG_DEAD_LETTER_PATH": str(tmp_path / "dead.jsonl"),
+        }
+    )
+    with app.app_context():
+        db.create_all()
+        user = User(user_identifier="writer_user", password_hash="x")
+        skill = Skill(skill_id_string="writer_skill", name="Writer Skill")
+        db.session.add_all([user, skill])
+        db.session.commit()
+        app.config["TEST_IDS"] = (user.id, skill.id)
+        yield app
+        get_writer().close()
+        db.session.remove()
+
+
+def _log(user_id, skill_id, n):
+    return {
+        "user_id": user_id,
+        "skill_id": skill_id,
+        "difficulty_presented": 2,
+        "question_text_generated": f"Question {n}",
+        "is_correct": n % 2 == 0,
+    }
+
+
+def _count_logs():
+    return db.session.scalar(select(func.count()).select_from(QuestionLog))
+
+
+def test_submit_defers_insert_until_flush(writer_app):
+    """Submitted logs are not written until the writer flushes."""
+    user_id, skill_id = writer_app.config["TEST_IDS"]
+    submit_question_log(_log(user_id, skill_id, 1))
+    submit_question_log(_log(user_id, skill_id, 2))
+    writer = get_writer()
+
+    written = writer.flush()
+    assert written == 2
+    assert _count_logs() == 2
+    logs = crud.get_recent_logs_for_user_skill(db.session, user_id, skill_id)
+    assert all(log.question_timestamp is not None for log in logs)
+
+
+def test_queue_overflow_spills_and_replays(writer_app, tmp_path):
+    """Payloads beyond the queue bound go to the spill file, then to the DB."""
+    user_id, skill_id = writer_app.config["TEST_IDS"]
+    writer = get_writer()
+    for n in range(5):
+        writer.submit(_log(user_id, skill_id, n))
+
+    spill = tmp_path / "spill.jsonl"
+    spilled = [json.loads(line) for line in spill.read_text().splitlines()]
+    assert len(spilled) + writer.pending() == 5
+
+    assert writer.flush() == 5
+    assert _count_logs() == 5
+    assert not spill.exists()
+
+
+def test_submit_rejects_bad_payload(writer_app):
+    """Missing NOT NULL fields and unknown fields fail at submit time."""
+    writer = get_writer()
+    with pytest.raises(ValueError):
+        writer.submit({"difficulty_presented": 1})
+    user_id, skill_id = writer_app.config["TEST_IDS"]
+    with pytest.raises(ValueError, match="question_text_generated"):
+        writer.submit({**_log(user_id, skill_id, 1), "question_text_generated": None})
+    with pytest.raises(ValueError):
+        writer.submit({**_log(user_id, skill_id, 1), "not_a_column": 1})
+
+
+def test_rejected_rows_are_dead_lettered(writer_app, tmp_path):
+    """A row the database refuses does not block the rows around it."""
+    user_id, skill_id = writer_app.config["TEST_IDS"]
+    writer = get_writer()
+    # Left over from an earlier failed flush: one good row, one unknown user
+    writer._write_spill([_log(user_id, skill_id, 0), _log(9999, skill_id, 1)])
+    for n in range(2, 5):
+        writer.submit(_log(user_id, skill_id, n))
+
+    assert writer.flush() == 4
+    assert _count_logs() == 4
+    assert not (tmp_path / "spill.jsonl").exists()
+    [dead] = [
+        json.loads(line) for line in (tmp_path / "dead.jsonl").read_text().splitlines()
+    ]
+    assert dead["user_id"] == 9999
+
+    # Later flushes go through as one batch again
+    writer.submit(_log(user_id, skill_id, 5))
+    assert writer.flush() == 1
+    assert _count_logs() == 5
+
+
+def test_submit_without_writer_commits_directly(app, session):
+    """With buffering disabled the log is written straight away."""
+    user = User(user_identifier="writer_fallback_user", password_hash="x")
+    skill = Skill(skill_id_string="writer_fallback_skill", name="Fallback")
+    session.add_all([user, skill])
+    session.flush()
+    submit_question_log(_log(user.id, skill.id, 1))
+    logs = crud.get_recent_logs_for_user_skill(session, user.id, skill.id)
+    assert len(logs) == 1
@@ -0,0 +1,112 @@
+"""Tests for the Prometheus /metrics endpoint and multi-worker aggregation."""
+
+import os
+import subprocess
+import sys
+
+from flaskr import create_app, crud, db
+from flaskr.metrics import (
+    REQUEST_DURATION,
+    SQL_DURATION,
+    USER_CACHE_DURATION,
+    MetricsRegistry,
+)
+from flaskr.user_cache import get_user_cache
+
+
+def test_histogram_exposition():
+    """Test buckets are cumulative and labels are escaped."""
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.observe("latency", 0.05, endpoint='a"b')
+    registry.observe("latency", 0.5, endpoint='a"b')
+    registry.observe("latency", 5.0, endpoint='a"b')
+
+    text = registry.render()
+    assert "# TYPE latency histogram" in text
+    assert 'latency_bucket{endpoint="a\\"b",le="0.1"} 1' in text
+    assert 'latency_bucket{endpoint="a\\"b",le="1.0"} 2' in text
+    assert 'latency_bucket{endpoint="a\\"b",le="+Inf"} 3' in text
+    assert 'latency_count{endpoint="a\\"b"} 3' in text
+    assert 'latency_sum{endpoint="a\\"b"} 5.55' in text
+
+
+def test_multiprocess_files_are_merged_and_archived(tmp_path):
+    """Test a scrape sums live and exited workers' files, keeping totals."""
+    directory = str(tmp_path)
+    exited = MetricsRegistry(directory, buckets=(1.0,))
+    exited.observe("latency", 0.5)
+    exited.flush()
+    # Re-home the file under the pid of a process that has exited
+    child = subprocess.Popen([sys.executable, "-c", "pass"])
+    child.wait()
+    os.replace(
+        os.path.join(directory, f"metrics-{os.getpid()}.json"),
+        os.path.join(directory, f"metrics-{child.pid}.json"),
+    )
+
+    live = MetricsRegistry(directory, buckets=(1.0,))
+    live.observe("latency", 0.25)
+    assert "latency_count 2" in live.render()
+    assert not os.path.exists(os.path.join(directory, f"metrics-{child.pid}.json"))
+    assert "latency_count 2" in live.render()  # Archived totals still count
+
+
+def _metrics_app(**config):
+    return create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "METRICS_ENABLED": True,
+            **config,
+        }
+    )
+
+
+def test_metrics_endpoint_reports_requests_and_sql():
+    """Test /metrics exposes request and SQL histograms."""
+    app = _metrics_app()
+    with app.app_context():
+        db.create_all()
+        crud.get_all_skills(db.session)
+    client = app.test_client()
+    client.get("/health")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    text = response.get_data(as_text=True)
+    assert f'{REQUEST_DURATION}_count{{endpoint="health",method="GET"}} 1' in text
+    assert f"# TYPE {SQL_DURATION} histogram" in text
+
+
+def test_user_cache_lookups_are_reported():
+    """Test Flask-Login user loads show up by result in /metrics."""
+    app = _metrics_app()
+    with app.app_context():
+        db.create_all()
+        crud.create_users_bulk(
+            db.session, [{"user_identifier": "metrics_user", "password_hash": "h"}]
+        )
+        user_id = crud.get_user_by_identifier(db.session, "metrics_user").id
+        for _ in range(3):
+            get_user_cache().load(user_id)
+
+    text = app.test_client().get("/metrics").get_data(as_text=True)
+    assert f'{USER_CACHE_DURATION}_count{{result="miss"}} 1' in text
+    assert f'{USER_CACHE_DURATION}_count{{result="hit"}} 2' in text
+
+
+def test_metrics_endpoint_is_off_by_default():
+    """Test /metrics does not exist unless METRICS_ENABLED is set."""
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+    assert app.test_client().get("/metrics").status_code == 404
+
+
+def test_metrics_token_is_required_when_set():
+    """Test scrapes must send METRICS_TOKEN as a bearer token."""
+    client = _metrics_app(METRICS_TOKEN="s3cret").test_client()
+    assert client.get("/metrics").status_code == 401
+    wrong = {"Authorization": "Bearer nope"}
+    assert client.get("/metrics", headers=wrong).status_code == 401
+    right = {"Authorization": "Bearer s3cret"}
+    assert client.get("/metrics", headers=right).status_code == 200
@@ -0,0 +1,99 @@
+"""Tests for the pooled, retrying model client and question fan-out."""
+
+import time
+
+import pytest
+
+from benchmarks.fake_model_server import FakeModelServer
+from flaskr.model_client import (
+    CircuitBreaker,
+    ConnectionPool,
+    ModelClient,
+    ModelUnavailable,
+    RetryPolicy,
+)
+from flaskr.questions import (
+    GeminiQuestionGenerator,
+    Question,
+    StubQuestionGenerator,
+    generate_many,
+)
+
+
+def _generator(server, attempts=3, timeout=2.0, breaker=None):
+    client = ModelClient(
+        ConnectionPool(server.url, size=4, timeout=timeout),
+        retry=RetryPolicy(attempts=attempts),
+        breaker=breaker,
+        sleep=lambda seconds: None,
+    )
+    outcomes = []
+    client.add_timing_listener(lambda outcome, seconds: outcomes.append(outcome))
+    return GeminiQuestionGenerator(client, api_key="test", model="fake"), outcomes
+
+
+def test_keep_alive_retries_and_breaker():
+    """Test one reused connection, retried 503s and a breaker cycle."""
+    now = [0.0]
+    breaker = CircuitBreaker(
+        failure_threshold=3, reset_timeout=10, clock=lambda: now[0]
+    )
+    with FakeModelServer(seed=0) as server:
+        generator, outcomes = _generator(server, attempts=2, breaker=breaker)
+        for _ in range(5):
+            question = generator.generate("Addition", 2)
+            assert question.text.startswith("What is")
+            assert "difficulty 2" in question.prompt
+        assert server.connections == 1
+
+        server.error_rate = 1.0
+        with pytest.raises(ModelUnavailable):
+            generator.generate("Addition", 2)
+        assert outcomes[-2:] == ["server_error", "server_error"]
+        # The third failure opens the circuit; the retry is refused unsent
+        with pytest.raises(ModelUnavailable, match="Circuit open") as excinfo:
+            generator.generate("Addition", 2)
+        assert excinfo.value.retry_after == 10
+        assert outcomes[-2:] == ["server_error", "circuit_open"]
+        requests = server.requests
+        with pytest.raises(ModelUnavailable):
+            generator.generate("Addition", 2)
+        assert server.requests == requests
+
+        # After the reset timeout one trial goes through and closes it
+        server.error_rate = 0.0
+        now[0] = 10.0
+        generator.generate("Addition", 2)
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert server.connections == 1
+
+
+def test_timeouts_are_bounded():
+    """Test a hung provider costs `attempts` x timeout, not the hang."""
+    with FakeModelServer(hang_rate=1.0, hang_seconds=1.0) as server:
+        generator, outcomes = _generator(server, attempts=2, timeout=0.1)
+        start = time.perf_counter()
+        with pytest.raises(ModelUnavailable):
+            generator.generate("Addition", 1)
+        assert time.perf_counter() - start < 0.5
+        assert outcomes == ["timeout", "timeout"]
+
+
+def test_generate_many_runs_concurrently_in_order():
+    """Test the fan-out overlaps calls, keeps order and isolates failures."""
+
+    class Flaky(StubQuestionGenerator):
+        def generate(self, skill_name, difficulty):
+            if difficulty == 3:
+                raise ModelUnavailable("down")
+            return super().generate(skill_name, difficulty)
+
+    generator = Flaky(latency=0.1)
+    start = time.perf_counter()
+    results = generate_many(generator, [("Addition", n) for n in range(1, 9)])
+    assert time.perf_counter() - start < 0.5
+    assert isinstance(results[2], ModelUnavailable)
+    assert all(
+        isinstance(result, Question) for n, result in enumerate(results) if n != 2
+    )
+    assert "difficulty 8" in results[-1].prompt
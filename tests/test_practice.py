@@ -0,0 +1,255 @@
+"""Tests for the practice question/answer endpoints."""
+
+import datetime
+import json
+import random
+
+import numpy as np
+import pytest
+from sqlalchemy import update
+
+from benchmarks.fake_model_server import FakeModelServer
+from flaskr import calibration, create_app, crud, db, log_writer, question_cache
+from flaskr.calibration import Calibration, CalibrationStore
+from flaskr.log_writer import QuestionLogWriter
+from flaskr.models import QuestionLog, User, UserProgress
+from flaskr.questions import (
+    EXTENSION_KEY,
+    GENERATORS,
+    StubQuestionGenerator,
+    normalize_answer,
+)
+
+
+@pytest.fixture
+def learner_client(tmp_path):
+    """Client logged in as a learner, with one skill in the catalog."""
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'practice.sqlite'}",
+            "SESSION_TYPE": "sqlite",
+            "SESSION_SQLITE_PATH": str(tmp_path / "sessions.sqlite"),
+            "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+            "PASSWORD_HASH_WORKERS": 0,
+        }
+    )
+    app.extensions[EXTENSION_KEY] = StubQuestionGenerator(rng=random.Random(0))
+    with app.app_context():
+        db.create_all()
+        user = User(user_identifier="learner")
+        user.set_password("secret")
+        db.session.add(user)
+        db.session.commit()
+        crud.create_skill(db.session, "add", "Addition")
+    client = app.test_client()
+    response = client.post(
+        "/auth/login", data={"identifier": "learner", "password": "secret"}
+    )
+    assert response.status_code == 302
+    return app, client
+
+
+def _expected(app, client):
+    # The pending question lives in the server-side session only
+    with client.session_transaction() as session:
+        return session["practice_pending"]["expected"]
+
+
+def test_question_and_answer_flow(learner_client):
+    """Test answers are graded, logged and move the difficulty."""
+    app, client = learner_client
+    for _ in range(3):
+        response = client.get("/practice/add/question")
+        assert response.status_code == 200
+        assert response.get_json()["difficulty"] == 2
+        assert "expected" not in response.get_data(as_text=True)
+        response = client.post(
+            "/practice/add/answer", json={"answer": f" {_expected(app, client)} "}
+        )
+        assert response.get_json()["correct"] is True
+
+    # Three correct answers in a row level up
+    assert response.get_json()["difficulty"] == 3
+    assert client.get("/practice/add/question").get_json()["difficulty"] == 3
+    response = client.post("/practice/add/answer", data={"answer": "wrong"})
+    assert response.get_json() == {
+        "correct": False,
+        "expected_answer": response.get_json()["expected_answer"],
+        "difficulty": 3,
+        "correct_streak": 0,
+        "incorrect_streak": 1,
+    }
+    with app.app_context():
+        logs = db.session.query(QuestionLog).order_by(QuestionLog.id).all()
+        assert [log.is_correct for log in logs] == [True, True, True, False]
+        assert logs[-1].user_answer == "wrong"
+        assert logs[-1].difficulty_presented == 3
+        assert logs[-1].session_id
+
+
+def test_answer_requires_pending_question(learner_client):
+    """Test answering twice or for an unknown skill is rejected."""
+    _, client = learner_client
+    assert client.post("/practice/add/answer", data={"answer": "1"}).status_code == 409
+    client.get("/practice/add/question")
+    assert client.post("/practice/add/answer", data={"answer": "1"}).status_code == 200
+    assert client.post("/practice/add/answer", data={"answer": "1"}).status_code == 409
+    assert client.get("/practice/nope/question").status_code == 404
+
+
+def test_answers_are_logged_through_the_writer(learner_client):
+    """Test an enabled log writer takes the log row out of the answer."""
+    app, client = learner_client
+    with app.app_context():
+        writer = QuestionLogWriter(db.engine, flush_interval=60)
+    app.extensions[log_writer.EXTENSION_KEY] = writer
+    try:
+        client.get("/practice/add/question")
+        response = client.post("/practice/add/answer", data={"answer": "wrong"})
+        assert response.get_json()["incorrect_streak"] == 1
+        with app.app_context():
+            assert db.session.query(QuestionLog).count() == 0
+        assert writer.flush() == 1
+        with app.app_context():
+            [log] = db.session.query(QuestionLog).all()
+            assert (log.is_correct, log.user_answer) == (False, "wrong")
+    finally:
+        writer.close()
+
+
+def test_question_difficulty_follows_calibration(learner_client, tmp_path):
+    """Test a fitted calibration moves the question to the target level."""
+    app, client = learner_client
+    assert client.get("/practice/add/question").get_json()["difficulty"] == 2
+    # The learner finds level 2 easy (p = 0.88); level 3 is nearer 0.75
+    difficulty = np.zeros((2, 6))
+    difficulty[1, 1:5] = [-1.0, 0.0, 1.0, 2.0]
+    path = str(tmp_path / "calibration.npz")
+    Calibration(
+        np.array([0.0, 2.0]),
+        np.array([1.0, 5.0]),
+        difficulty,
+        np.full((2, 6), 5.0),
+        np.full((2, 6), 50),
+        0,
+    ).save(path)
+    app.extensions[calibration.EXTENSION_KEY] = CalibrationStore(path, 0)
+    assert client.get("/practice/add/question").get_json()["difficulty"] == 3
+    app.config["CALIBRATION_TARGET_ACCURACY"] = None
+    assert client.get("/practice/add/question").get_json()["difficulty"] == 2
+
+
+def test_stub_generator_answers_match_questions():
+    """Test the stub's expected answers are the arithmetic results."""
+    generator = StubQuestionGenerator(rng=random.Random(1))
+    for difficulty in range(1, 6):
+        question = generator.generate("Arithmetic", difficulty)
+        a, op, b = question.text[len("What is ") : -1].split()
+        result = int(a) + int(b) if op == "+" else int(a) - int(b)
+        assert question.expected_answer == str(result)
+    assert normalize_answer("  Forty  Two ") == "forty two"
+
+
+def test_history_pages_with_opaque_cursors(learner_client):
+    """Test history pages back through every answer and streams as NDJSON."""
+    app, client = learner_client
+    for n in range(5):
+        client.get("/practice/add/question")
+        client.post("/practice/add/answer", data={"answer": str(n)})
+
+    answers, cursor = [], None
+    while True:
+        query = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/practice/add/history", query_string=query)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page["logs"]) <= 2
+        answers.extend(log["answer"] for log in page["logs"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert answers == ["4", "3", "2", "1", "0"]
+
+    response = client.get("/practice/add/history.ndjson")
+    assert response.mimetype == "application/x-ndjson"
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)["answer"] for line in lines] == answers
+
+    first = client.get("/practice/add/history", query_string={"limit": 1})
+    tampered = first.get_json()["next_cursor"][:-2] + "xx"
+    response = client.get("/practice/add/history", query_string={"cursor": tampered})
+    assert response.status_code == 400
+
+
+def test_due_lists_overdue_skills(learner_client):
+    """Test /practice/due orders overdue skills and follows new answers."""
+    app, client = learner_client
+    with app.app_context():
+        crud.create_skill(db.session, "sub", "Subtraction")
+    for skill in ("add", "sub"):
+        client.get(f"/practice/{skill}/question")
+        client.post(f"/practice/{skill}/answer", data={"answer": "wrong"})
+    with app.app_context():
+        # Both retries are overdue, "sub" by longer
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for skill_id, hours in ((1, 1), (2, 2)):
+            db.session.execute(
+                update(UserProgress)
+                .where(UserProgress.skill_id == skill_id)
+                .values(due_at=now - datetime.timedelta(hours=hours))
+            )
+        db.session.commit()
+
+    due = client.get("/practice/due").get_json()["skills"]
+    assert [entry["skill"] for entry in due] == ["sub", "add"]
+    assert client.get("/practice/due?limit=1").get_json()["skills"] == due[:1]
+    # A correct answer pushes "sub" out by days, without reloading the schedule
+    client.get("/practice/sub/question")
+    client.post("/practice/sub/answer", json={"answer": _expected(app, client)})
+    due = client.get("/practice/due").get_json()["skills"]
+    assert [entry["skill"] for entry in due] == ["add"]
+
+
+def test_model_generator_and_outage(learner_client):
+    """Test the "gemini" generator end to end, and a 503 once it fails."""
+    app, client = learner_client
+    with FakeModelServer() as server:
+        config = {
+            **app.config,
+            "GEMINI_API_KEY": "test",
+            "QUESTION_API_URL": server.url,
+            "QUESTION_RETRY_ATTEMPTS": 2,
+            "QUESTION_RETRY_BACKOFF": 0.0,
+        }
+        app.extensions[EXTENSION_KEY] = GENERATORS["gemini"].from_config(config)
+        response = client.get("/practice/add/question")
+        assert response.status_code == 200
+        answer = client.post(
+            "/practice/add/answer", json={"answer": _expected(app, client)}
+        )
+        assert answer.get_json()["correct"] is True
+
+        server.error_rate = 1.0
+        response = client.get("/practice/add/question")
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
+        assert server.requests == 3
+
+
+def test_cached_questions_are_not_repeated(learner_client, tmp_path):
+    """Test the question cache skips the learner's recent questions."""
+    app, client = learner_client
+    app.config.update(
+        QUESTION_CACHE_ENABLED=True,
+        QUESTION_CACHE_PATH=str(tmp_path / "questions.sqlite"),
+        QUESTION_CACHE_VARIANTS=2,
+        QUESTION_CACHE_FRESH_RATE=0.0,
+    )
+    cache = question_cache.init_app(app)
+    texts = []
+    for _ in range(3):
+        texts.append(client.get("/practice/add/question").get_json()["question"])
+        client.post("/practice/add/answer", data={"answer": "x"})
+    assert len(set(texts)) == 3
+    assert cache.stats()["miss"] == 3
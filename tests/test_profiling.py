@@ -0,0 +1,87 @@
+"""Tests for the sampled profiling middleware and its CLI."""
+
+import cProfile
+import os
+
+import pytest
+
+from flaskr import create_app
+from flaskr.profiling import TOKEN_HEADER, profile_files, token_signer
+
+
+@pytest.fixture
+def profiled_app(tmp_path):
+    """App with profiling on: token-only unless a test sets a sample rate."""
+
+    def make(**config):
+        settings = {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "PROFILING_ENABLED": True,
+            "PROFILING_DIR": str(tmp_path / "profiles"),
+        }
+        settings.update(config)
+        return create_app(settings)
+
+    return make
+
+
+def test_sampled_requests_are_profiled_with_retention(profiled_app):
+    """Test every request is profiled at rate 1 and old files are dropped."""
+    app = profiled_app(PROFILING_SAMPLE_RATE=1, PROFILING_RETENTION=3)
+    client = app.test_client()
+    for _ in range(5):
+        assert client.get("/health").status_code == 200
+
+    files = profile_files(app.config["PROFILING_DIR"])
+    assert len(files) == 3
+    assert all("-GET-health-" in os.path.basename(path) for path in files)
+
+
+def test_busy_profiler_serves_request_unprofiled(profiled_app, monkeypatch):
+    """Test a sampled request is served normally when it cannot be profiled."""
+    app = profiled_app(PROFILING_SAMPLE_RATE=1)
+    client = app.test_client()
+    # Another request in this process is being profiled
+    with app.wsgi_app._active:
+        assert client.get("/health").status_code == 200
+
+    # Another profiler is active (cProfile raises this on Python 3.12+)
+    class Busy(cProfile.Profile):
+        def enable(self, *args, **kwargs):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(cProfile, "Profile", Busy)
+    assert client.get("/health").status_code == 200
+    assert profile_files(app.config["PROFILING_DIR"]) == []
+
+
+def test_signed_header_forces_profile(profiled_app):
+    """Test only a valid token profiles a request when sampling is off."""
+    app = profiled_app()
+    client = app.test_client()
+    client.get("/health", headers={TOKEN_HEADER: "forged.token"})
+    assert profile_files(app.config["PROFILING_DIR"]) == []
+
+    token = token_signer(app.secret_key).sign(b"profile").decode()
+    client.get("/health", headers={TOKEN_HEADER: token})
+    assert len(profile_files(app.config["PROFILING_DIR"])) == 1
+
+
+def test_cli_token_and_summarize(profiled_app):
+    """Test `flask profile token` output works and summarize merges files."""
+    app = profiled_app()
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["profile", "summarize"])
+    assert result.exit_code != 0 and "No profiles found" in result.output
+
+    header = runner.invoke(args=["profile", "token"]).output.strip()
+    name, token = header.split(": ", 1)
+    client = app.test_client()
+    for _ in range(2):
+        client.get("/health", headers={name: token})
+
+    result = runner.invoke(args=["profile", "summarize", "--limit", "5"])
+    assert result.exit_code == 0, result.output
+    assert "2 profiles" in result.output
+    assert "function calls" in result.output
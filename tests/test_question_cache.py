@@ -0,0 +1,131 @@
+"""Tests for the generated-question cache and `flask warm-question-cache`."""
+
+import random
+
+import pytest
+
+from flaskr import create_app, crud, db
+from flaskr.model_client import ModelUnavailable
+from flaskr.question_cache import (
+    QuestionCache,
+    SQLiteQuestionStore,
+    cache_key,
+    get_question_cache,
+    warm_command,
+)
+from flaskr.questions import StubQuestionGenerator
+
+
+class _Counting(StubQuestionGenerator):
+    def __init__(self):
+        super().__init__(rng=random.Random(0))
+        self.calls = 0
+        self.down = False
+
+    def generate(self, skill_name, difficulty):
+        if self.down:
+            raise ModelUnavailable("down")
+        self.calls += 1
+        return super().generate(skill_name, difficulty)
+
+
+def _cache(tmp_path, now, **options):
+    store = SQLiteQuestionStore(str(tmp_path / "questions.sqlite"), 1 << 20)
+    options = {"variants": 3, "max_age": 100.0, "fresh_rate": 0.0, **options}
+    return QuestionCache(store, rng=random.Random(0), clock=lambda: now[0], **options)
+
+
+def test_keys_normalize_the_prompt():
+    """Test case and spacing do not matter, skill and difficulty do."""
+    key = cache_key("Write  a\nquestion", "Addition", 2)
+    assert key == cache_key("write a question ", "Addition", 2)
+    assert key != cache_key("write a question", "Addition", 3)
+    assert key != cache_key("write a question", "Subtraction", 2)
+
+
+def test_variety_freshness_and_shared_tier(tmp_path):
+    """Test learners skip seen questions, pools cap and age out, tiers share."""
+    now = [1000.0]
+    generator = _Counting()
+    cache = _cache(tmp_path, now)
+    first = cache.generate(generator, "Addition", 5)
+    assert cache.generate(generator, "Addition", 5) == first
+    assert generator.calls == 1
+
+    # Each learner who has seen the whole pool adds a question to it
+    seen = {first.text}
+    for _ in range(3):
+        seen.add(cache.generate(generator, "Addition", 5, exclude=seen).text)
+    assert generator.calls == 4
+    key = cache_key(generator.prompt_for("Addition", 5), "Addition", 5)
+    assert len(cache.memory.get(key)) == 3
+    stats = cache.stats()
+    assert (stats["miss"], stats["memory_hit"]) == (4, 1)
+
+    # Another worker loads the (capped) pool from the shared file
+    other = _cache(tmp_path, now)
+    question = other.generate(generator, "Addition", 5)
+    assert question.text in seen and question.text != first.text
+    assert other.stats()["disk_hit"] == 1
+    assert generator.calls == 4
+
+    # Past the maximum age nothing is served
+    now[0] += 101
+    other.generate(generator, "Addition", 5)
+    assert generator.calls == 5
+
+
+def test_fallback_when_the_generator_fails(tmp_path):
+    """Test a failing generator is covered by a cached (even seen) question."""
+    now = [0.0]
+    generator = _Counting()
+    cache = _cache(tmp_path, now)
+    seen = cache.generate(generator, "Addition", 1)
+    generator.down = True
+    assert cache.generate(generator, "Addition", 1, exclude={seen.text}) == seen
+    assert cache.stats()["fallback"] == 1
+    with pytest.raises(ModelUnavailable):
+        cache.generate(generator, "Addition", 2)
+
+
+def test_store_trims_least_recently_used(tmp_path):
+    """Test the shared tier stays under its byte budget, oldest keys first."""
+    store = SQLiteQuestionStore(str(tmp_path / "trim.sqlite"), 4000, trim_every=1)
+    cache = QuestionCache(store, fresh_rate=0.0, clock=iter(range(10**6)).__next__)
+    generator = _Counting()
+    for difficulty in range(100):
+        cache.generate(generator, "Addition", difficulty)
+        assert store.total_bytes() <= 4000
+    key = cache_key(generator.prompt_for("Addition", 99), "Addition", 99)
+    assert store.load(key, 10**6, 0)
+    key = cache_key(generator.prompt_for("Addition", 0), "Addition", 0)
+    assert not store.load(key, 10**6, 0)
+
+
+def test_warm_command_fills_every_level(tmp_path):
+    """Test `flask warm-question-cache` fills every skill and difficulty."""
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'app.sqlite'}",
+            "QUESTION_CACHE_ENABLED": True,
+            "QUESTION_CACHE_PATH": str(tmp_path / "questions.sqlite"),
+        }
+    )
+    with app.app_context():
+        db.create_all()
+        crud.upsert_skills_bulk(
+            db.session,
+            [
+                {"skill_id_string": "add", "name": "Addition"},
+                {"skill_id_string": "sub", "name": "Subtraction"},
+            ],
+        )
+    result = app.test_cli_runner().invoke(warm_command, ["--per-level", "2"])
+    assert result.exit_code == 0, result.output
+    assert "Stored 20 questions (0 failed)" in result.output
+    with app.app_context():
+        cache = get_question_cache()
+        cache.fresh_rate = 0.0
+        cache.generate(StubQuestionGenerator(), "Subtraction", 4)
+        assert cache.stats()["disk_hit"] == 1
@@ -0,0 +1,158 @@
+"""Tests for the spaced-repetition due queue and `flask due-users`."""
+
+import datetime
+
+from flaskr import create_app, crud, db
+from flaskr.models import UserProgress
+from flaskr.scheduler import (
+    REVIEW_INTERVALS,
+    RETRY_INTERVAL,
+    DueQueue,
+    _UserHeap,
+    due_users_command,
+    get_due_queue,
+    review_interval,
+)
+from flaskr.seeding import SeedSpec, seed_database
+
+
+def _app(tmp_path):
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'due.sqlite'}",
+        }
+    )
+    with app.app_context():
+        db.create_all()
+        crud.create_users_bulk(
+            db.session,
+            [{"user_identifier": f"due_{n}", "password_hash": "h"} for n in range(2)],
+        )
+        crud.upsert_skills_bulk(
+            db.session,
+            [{"skill_id_string": f"due_{n}", "name": f"Due {n}"} for n in range(3)],
+        )
+    return app
+
+
+def _answer(user_id, skill_id, is_correct, difficulty=2):
+    return crud.record_answer(
+        db.session,
+        user_id,
+        skill_id,
+        is_correct,
+        {"difficulty_presented": difficulty, "question_text_generated": "q"},
+    )
+
+
+def _due_at(user_id, skill_id):
+    progress = crud.get_user_progress(db.session, user_id, skill_id)
+    db.session.refresh(progress)
+    return progress.due_at
+
+
+def test_review_interval_grows_with_state():
+    """Test misses retry soon and the interval doubles per box, capped."""
+    assert review_interval(5, 0, False) == RETRY_INTERVAL
+    assert review_interval(1, 1, True) == REVIEW_INTERVALS[1]
+    assert review_interval(3, 2, True) == REVIEW_INTERVALS[4]
+    assert review_interval(9, 9, True) == REVIEW_INTERVALS[-1]
+
+
+def test_record_answer_schedules_and_updates_the_queue(tmp_path):
+    """Test the UPDATE's due_at, and a loaded heap following commits."""
+    app = _app(tmp_path)
+    with app.app_context():
+        start = datetime.datetime.now(datetime.timezone.utc)
+        queue = get_due_queue()
+        for skill_id in (1, 2, 3):
+            difficulty, streak, _, _ = _answer(1, skill_id, True)
+            expected = start + review_interval(difficulty, streak, True)
+            assert abs(
+                _due_at(1, skill_id).replace(tzinfo=datetime.timezone.utc) - expected
+            ) < datetime.timedelta(seconds=5)
+        assert queue.next_due(db.session, 1) == []
+
+        later = start + REVIEW_INTERVALS[-1] + datetime.timedelta(days=1)
+        assert [skill for skill, _ in queue.next_due(db.session, 1, now=later)] == [
+            1,
+            2,
+            3,
+        ]
+        # The miss moves skill 2 to the front without a reload
+        _answer(1, 2, False)
+        misses = queue.stats()["misses"]
+        soon = start + 2 * RETRY_INTERVAL
+        assert [skill for skill, _ in queue.next_due(db.session, 1, now=soon)] == [2]
+        assert [
+            skill for skill, _ in queue.next_due(db.session, 1, limit=2, now=later)
+        ] == [2, 1]
+        assert queue.stats()["misses"] == misses
+
+        # Manual updates reschedule when they grade an answer; a miss that
+        # levels down (both streaks reset) still gets the retry interval
+        crud.update_user_progress_state(db.session, 1, 3, difficulty=5)
+        assert [skill for skill, _ in queue.next_due(db.session, 1, now=soon)] == [2]
+        crud.update_user_progress_state(
+            db.session,
+            1,
+            3,
+            difficulty=1,
+            correct_streak=0,
+            incorrect_streak=0,
+            is_correct=False,
+        )
+        assert [skill for skill, _ in queue.next_due(db.session, 1, now=soon)] == [
+            2,
+            3,
+        ]
+        # Another learner's schedule is loaded separately
+        assert queue.next_due(db.session, 2, now=later) == []
+        assert queue.stats()["misses"] == misses + 1
+
+
+def test_heap_compacts_replaced_entries():
+    """Test repeated reschedules keep the heap bounded and ordered."""
+    queue = DueQueue(maxsize=10, ttl=None)
+    epoch = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    queue.cache.set(1, _UserHeap([(skill_id, epoch) for skill_id in range(5)]))
+    for n in range(1000):
+        queue.update(1, n % 5, epoch + datetime.timedelta(seconds=n))
+    heap = queue.cache.get(1)
+    assert len(heap.heap) <= 2 * len(heap.due) + 8
+    due = queue.next_due(None, 1, limit=5, now=epoch + datetime.timedelta(days=1))
+    assert [skill for skill, _ in due] == [0, 1, 2, 3, 4]
+    assert due[-1][1] == epoch + datetime.timedelta(seconds=999)
+
+
+def test_seeded_schedule_and_due_users(tmp_path):
+    """Test seeded due times, the reminder query and `flask due-users`."""
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'seeded.sqlite'}",
+            "PASSWORD_HASH_WORKERS": 0,
+        }
+    )
+    with app.app_context():
+        db.create_all()
+        seed_database(db.engine, SeedSpec(users=30, skills=4, logs=500), ["h"])
+        until = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        expected = {}
+        for progress in db.session.query(UserProgress):
+            assert progress.due_at is not None
+            if progress.due_at <= until:
+                count, earliest = expected.get(progress.user_id, (0, progress.due_at))
+                expected[progress.user_id] = (count + 1, min(earliest, progress.due_at))
+        assert expected
+        assert {
+            user_id: (count, earliest)
+            for user_id, count, earliest in crud.iter_users_due(
+                db.session, until, batch_size=7
+            )
+        } == expected
+
+    result = app.test_cli_runner().invoke(due_users_command)
+    assert result.exit_code == 0, result.output
+    assert len(result.output.splitlines()) >= len(expected)
@@ -0,0 +1,87 @@
+"""Tests for the synthetic data generator and `flask seed`."""
+
+import itertools
+
+import pytest
+from sqlalchemy import inspect
+
+from flaskr import create_app, crud, db, seeding
+from flaskr.models import QuestionLog, User, UserProgress
+from flaskr.seeding import (
+    SEED_PASSWORD,
+    Population,
+    SeedSpec,
+    generate_logs,
+    seed_command,
+    seed_database,
+)
+
+
+def _file_app(tmp_path):
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'seed.sqlite'}",
+            "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+            "PASSWORD_HASH_WORKERS": 0,
+        }
+    )
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def test_generation_is_deterministic():
+    """Test the same seed yields the same rows and another seed differs."""
+    spec = SeedSpec(users=50, skills=10, logs=500, skills_per_user=3, seed=7)
+
+    def rows(spec):
+        return list(itertools.islice(generate_logs(spec, Population(spec)), 200))
+
+    assert rows(spec) == rows(spec)
+    assert rows(spec) != rows(spec._replace(seed=8))
+
+
+def test_seed_command_fills_empty_database(tmp_path):
+    """Test `flask seed` loads every table and seeded users can log in."""
+    app = _file_app(tmp_path)
+    runner = app.test_cli_runner()
+    result = runner.invoke(
+        seed_command,
+        ["--users", "40", "--skills", "6", "--logs", "1500", "--password-pool", "2"],
+    )
+    assert result.exit_code == 0, result.output
+
+    with app.app_context():
+        assert db.session.query(User).count() == 40
+        assert db.session.query(UserProgress).count() == 40 * 6
+        logs = crud.get_recent_logs_for_user_skill(db.session, 1, 1, limit=1000)
+        assert db.session.query(QuestionLog).count() == 1500
+        assert all(log.response_time_ms > 0 for log in logs)
+        assert crud.get_user_by_identifier(db.session, "seed-user-3").check_password(
+            SEED_PASSWORD
+        )
+
+    # Seeding refuses to mix with existing data
+    result = runner.invoke(seed_command, ["--users", "1", "--logs", "1"])
+    assert result.exit_code != 0
+    assert "already has users" in result.output
+
+
+def test_failed_log_load_keeps_indexes(tmp_path, monkeypatch):
+    """Test question_logs indexes are rebuilt when the bulk load fails."""
+    app = _file_app(tmp_path)
+
+    def failing_logs(spec, population):
+        yield from itertools.islice(generate_logs(spec, population), 10)
+        raise RuntimeError("interrupted")
+
+    monkeypatch.setattr(seeding, "generate_logs", failing_logs)
+    spec = SeedSpec(users=5, skills=2, logs=100, skills_per_user=2, seed=0)
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            seed_database(db.engine, spec, ["hash"], batch_size=5)
+        names = {
+            index["name"] for index in inspect(db.engine).get_indexes("question_logs")
+        }
+        assert names == {index.name for index in QuestionLog.__table__.indexes}
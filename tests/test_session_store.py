@@ -0,0 +1,124 @@
+"""Tests for the SQLite session backend."""
+
+from datetime import timedelta
+
+from flask import Flask, session
+
+from flaskr import create_app
+from flaskr.session_store import (
+    SQLiteSessionInterface,
+    SQLiteSessionStore,
+    ServerSession,
+)
+
+
+class FakeClock:
+    """Manually advanced clock for expiry tests."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _session_app(tmp_path, clock=None):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite"))
+    app.session_interface = SQLiteSessionInterface(
+        store,
+        lifetime=timedelta(seconds=100),
+        sweep_interval=0,
+        clock=clock or FakeClock(),
+    )
+
+    @app.route("/set/<value>")
+    def set_value(value):
+        session["value"] = value
+        session["flags"] = [1, 2]
+        return "ok"
+
+    @app.route("/get")
+    def get_value():
+        return session.get("value", "")
+
+    @app.route("/clear")
+    def clear():
+        session.clear()
+        return "ok"
+
+    return app, store
+
+
+def test_round_trip_and_dirty_only_writes(tmp_path):
+    """Test data survives requests and clean requests write nothing."""
+    app, store = _session_app(tmp_path)
+    client = app.test_client()
+
+    assert client.get("/get").headers.get("Set-Cookie") is None
+    assert store.count() == 0  # Empty sessions are never stored
+
+    response = client.get("/set/hello")
+    assert "session=" in response.headers["Set-Cookie"]
+    assert store.count() == 1
+
+    response = client.get("/get")
+    assert response.data == b"hello"
+    assert response.headers.get("Set-Cookie") is None  # Clean: no write
+
+    client.get("/clear")
+    assert store.count() == 0
+    assert client.get("/get").data == b""
+
+
+def test_expiry_touch_and_sweep(tmp_path):
+    """Test expiry is extended past half-life and expired rows are swept."""
+    clock = FakeClock()
+    app, store = _session_app(tmp_path, clock)
+    client = app.test_client()
+    client.get("/set/hello")
+
+    clock.now += 60  # Under half the lifetime left: the read extends it
+    assert client.get("/get").headers.get("Set-Cookie") is not None
+    clock.now += 60  # Would have expired without the touch
+    assert client.get("/get").data == b"hello"
+
+    clock.now += 101
+    assert client.get("/get").data == b""  # Expired rows are not served
+    assert app.session_interface.sweep() == 1
+    assert store.count() == 0
+
+
+def test_tampered_cookie_starts_new_session(tmp_path):
+    """Test a session id with a bad signature is ignored."""
+    app, _store = _session_app(tmp_path)
+    client = app.test_client()
+    client.get("/set/hello")
+    sid = client.get_cookie("session").value.split(".")[0]
+
+    client.set_cookie("session", f"{sid}.forged")
+    assert client.get("/get").data == b""
+
+
+def test_server_session_tracks_modification():
+    """Test the session dict flags writes but not reads."""
+    sess = ServerSession({"a": 1}, sid="abc")
+    assert not sess.new and not sess.modified
+    _ = sess["a"]
+    assert not sess.modified
+    sess["b"] = 2
+    assert sess.modified
+
+
+def test_create_app_selects_sqlite_sessions(tmp_path):
+    """Test SESSION_TYPE='sqlite' installs the SQLite interface."""
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "SESSION_TYPE": "sqlite",
+            "SESSION_SQLITE_PATH": str(tmp_path / "sessions.sqlite"),
+        }
+    )
+    assert isinstance(app.session_interface, SQLiteSessionInterface)
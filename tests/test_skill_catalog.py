@@ -0,0 +1,52 @@
+# tests/test_skill_catalog.py
+"""Tests for the versioned in-process skill catalog cache."""
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from flaskr import crud, skill_catalog
+
+
+def test_catalog_lookups_match_crud(session: Session):
+    """Test catalog lookups return the same skills as the crud readers."""
+    skill = crud.create_skill(session, "catalog-lookup", "Catalog Lookup", "desc")
+    entry = skill_catalog.get_skill_by_id_string(session, "catalog-lookup")
+    assert entry is not None
+    assert entry.id == skill.id
+    assert entry.description == "desc"
+    assert skill_catalog.get_skill_by_id(session, skill.id) == entry
+    assert [s.id for s in skill_catalog.get_all_skills(session)] == [
+        s.id for s in crud.get_all_skills(session)
+    ]
+
+
+def test_catalog_reloads_after_version_bump(session: Session):
+    """Test that skill writes bump the version and refresh the snapshot."""
+    before = skill_catalog.get_catalog(session)
+    crud.upsert_skills_bulk(
+        session, [{"skill_id_string": "catalog-new", "name": "Catalog New"}]
+    )
+    after = skill_catalog.get_catalog(session)
+    assert after.version > before.version
+    assert after.get_by_id_string("catalog-new") is not None
+
+
+def test_catalog_checks_version_once_per_request(app: Flask, session: Session):
+    """Test that repeated lookups in one request issue no further SQL."""
+    crud.create_skill(session, "catalog-request", "Catalog Request")
+    statements = []
+
+    def count(*_args):
+        statements.append(1)
+
+    engine = session.get_bind()
+    with app.test_request_context("/"):
+        skill_catalog.get_catalog(session)
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            for _ in range(5):
+                assert skill_catalog.get_skill_by_id_string(session, "catalog-request")
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+    assert statements == []
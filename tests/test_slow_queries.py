@@ -0,0 +1,68 @@
+"""Tests for the slow query log and its CLI."""
+
+import pytest
+
+from flaskr import create_app, crud, db
+from flaskr.slow_queries import SlowQueryRecorder, parameter_shape
+
+
+@pytest.fixture
+def slow_app(tmp_path):
+    """App recording every statement (threshold 0) into a temp ring buffer."""
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "SLOW_QUERY_THRESHOLD_MS": 0,
+            "SLOW_QUERY_LOG_PATH": str(tmp_path / "slow.sqlite"),
+        }
+    )
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def test_parameter_shape():
+    """Test bound parameters are reduced to their types."""
+    assert parameter_shape((1, "a", None)) == "(int, str, NoneType)"
+    assert parameter_shape({"id": 3}) == "{id: int}"
+    assert parameter_shape([(1, 2), (3, 4)]) == "2x(int, int)"
+
+
+def test_records_caller_fingerprint_and_plan(slow_app):
+    """Test a slow SELECT is stored with its crud caller and query plan."""
+    recorder = slow_app.extensions["slow_queries"]
+    with slow_app.app_context():
+        crud.get_recent_logs_for_user_skill(db.session, 1, 2)
+
+    [summary] = [
+        s
+        for s in recorder.top(50)
+        if s["caller"] == "crud.get_recent_logs_for_user_skill"
+    ]
+    assert "FROM question_logs" in summary["fingerprint"]
+    assert "LIMIT ?" in summary["fingerprint"]
+    assert summary["parameter_shape"] == "(int, int, int, int)"
+    assert "question_logs" in summary["plan"]
+
+
+def test_ring_buffer_keeps_newest(tmp_path):
+    """Test the buffer is trimmed to its capacity."""
+    recorder = SlowQueryRecorder(str(tmp_path / "slow.sqlite"), capacity=5)
+    for n in range(200):
+        recorder.record(duration_ms=n, fingerprint="SELECT ?", statement="SELECT 1")
+    durations = [e["duration_ms"] for e in recorder.entries()]
+    assert durations == [195, 196, 197, 198, 199]
+
+
+def test_cli_prints_top_fingerprints(slow_app):
+    """Test `flask slow-queries` ranks fingerprints and can show plans."""
+    with slow_app.app_context():
+        crud.get_all_skills(db.session)
+    # Threshold 0 records the schema DDL too: list every fingerprint
+    result = slow_app.test_cli_runner().invoke(
+        args=["slow-queries", "--plans", "--top", "1000"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "caller=crud.get_all_skills" in result.output
+    assert "plan:" in result.output
@@ -0,0 +1,164 @@
+# tests/test_throttle.py
+"""Tests for sliding-window login throttling."""
+
+import pytest
+
+from flaskr import create_app, db
+from flaskr.hashing import get_hasher
+from flaskr.models import User
+from flaskr.throttle import LoginThrottle, MemoryBackend, SQLiteBackend
+
+
+class FakeClock:
+    """Manually advanced clock for window tests."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("backend_name", ["memory", "sqlite"])
+def test_sliding_window_limits_identifier(tmp_path, backend_name):
+    """Test attempts past the limit are rejected until the window slides."""
+    if backend_name == "sqlite":
+        backend = SQLiteBackend(str(tmp_path / "throttle.sqlite"))
+    else:
+        backend = MemoryBackend()
+    clock = FakeClock()
+    throttle = LoginThrottle(
+        backend, window=60, identifier_limit=3, ip_limit=100, clock=clock
+    )
+
+    for _ in range(3):
+        assert throttle.attempt("Learner", "10.0.0.1") is None
+        clock.now += 1
+    retry_after = throttle.attempt("learner", "10.0.0.2")  # Case-insensitive key
+    assert retry_after is not None and retry_after > 50
+
+    clock.now += 60  # The first attempts have left the window
+    assert throttle.attempt("learner", "10.0.0.1") is None
+    throttle.reset_identifier("learner")
+    assert backend.oldest("id:learner") is None
+
+
+@pytest.mark.parametrize("backend_name", ["memory", "sqlite"])
+def test_rejected_attempts_are_not_recorded(tmp_path, backend_name):
+    """Test a flood on one key keeps at most `limit` attempts stored."""
+    if backend_name == "sqlite":
+        backend = SQLiteBackend(str(tmp_path / "throttle.sqlite"))
+    else:
+        backend = MemoryBackend()
+    clock = FakeClock()
+    throttle = LoginThrottle(backend, window=60, identifier_limit=3, clock=clock)
+    for _ in range(200):
+        throttle.attempt("victim", None)
+        clock.now += 0.1
+    assert throttle.attempt("victim", None) == pytest.approx(40.0)
+
+    if backend_name == "sqlite":
+        (count,) = (
+            backend._connect().execute("SELECT COUNT(*) FROM login_attempts").fetchone()
+        )
+        assert count == 3
+    else:
+        assert len(backend._attempts["id:victim"]) == 3
+
+
+@pytest.mark.parametrize("backend_name", ["memory", "sqlite"])
+def test_expired_keys_are_swept(tmp_path, backend_name):
+    """Test keys that are never hit again are dropped after a window."""
+    if backend_name == "sqlite":
+        backend = SQLiteBackend(str(tmp_path / "throttle.sqlite"))
+    else:
+        backend = MemoryBackend()
+    clock = FakeClock()
+    throttle = LoginThrottle(backend, window=60, clock=clock)
+    for n in range(50):
+        throttle.attempt(f"sprayed{n}", f"10.0.1.{n}")
+    clock.now += 61
+    throttle.attempt("learner", None)
+
+    if backend_name == "sqlite":
+        rows = backend._connect().execute("SELECT key FROM login_attempts").fetchall()
+        assert rows == [("id:learner",)]
+    else:
+        assert list(backend._attempts) == ["id:learner"]
+
+
+def test_ip_limit_applies_across_identifiers():
+    """Test one client IP cannot spray many identifiers."""
+    throttle = LoginThrottle(MemoryBackend(), identifier_limit=100, ip_limit=2)
+    assert throttle.attempt("a", "10.0.0.9") is None
+    assert throttle.attempt("b", "10.0.0.9") is None
+    assert throttle.attempt("c", "10.0.0.9") is not None
+    assert throttle.attempt("d", "10.0.0.10") is None
+
+
+@pytest.fixture
+def throttled_app(tmp_path):
+    """An app with tight login limits on its own database."""
+    app = create_app(
+        {
+            "TESTING": True,
+            "SECRET_KEY": "test-secret-key",
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'throttle.sqlite'}",
+            "SESSION_FILE_DIR": str(tmp_path / "sessions"),
+            "PASSWORD_HASH_WORKERS": 0,
+            "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+            "LOGIN_THROTTLE_IDENTIFIER_LIMIT": 2,
+        }
+    )
+    with app.app_context():
+        db.create_all()
+        user = User(user_identifier="throttled_user")
+        user.set_password("right")
+        db.session.add(user)
+        db.session.commit()
+    return app
+
+
+def test_login_rejected_with_429_before_password_check(throttled_app, monkeypatch):
+    """Test excess attempts get 429 without verifying the password."""
+    client = throttled_app.test_client()
+    checks = []
+    with throttled_app.app_context():
+        hasher = get_hasher()
+        real_check = hasher.check
+        monkeypatch.setattr(
+            hasher, "check", lambda *a: checks.append(1) or real_check(*a)
+        )
+
+    for _ in range(2):
+        response = client.post(
+            "/auth/login", data={"identifier": "throttled_user", "password": "bad"}
+        )
+        assert response.status_code == 200
+    assert len(checks) == 2
+
+    response = client.post(
+        "/auth/login", data={"identifier": "throttled_user", "password": "right"}
+    )
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert b"Too many login attempts" in response.data
+    assert len(checks) == 2  # No hash verified for the rejected attempt
+
+
+def test_unknown_identifier_still_verifies_a_hash(throttled_app, monkeypatch):
+    """Test unknown identifiers spend a dummy verification for even timing."""
+    client = throttled_app.test_client()
+    calls = []
+    with throttled_app.app_context():
+        hasher = get_hasher()
+        real_check = hasher.check
+        monkeypatch.setattr(
+            hasher, "check", lambda *a: calls.append(a[0]) or real_check(*a)
+        )
+    response = client.post(
+        "/auth/login", data={"identifier": "nobody_here", "password": "x"}
+    )
+    assert b"Invalid credentials." in response.data
+    assert len(calls) == 1
+    assert calls[0].startswith("pbkdf2:sha256:1000$")
@@ -0,0 +1,71 @@
+# tests/test_user_cache.py
+"""Tests for the TTL/LRU cache and the cached Flask-Login user loader."""
+
+import pytest
+from flask import Flask
+from sqlalchemy.orm import Session
+
+from flaskr import crud
+from flaskr.cache import TTLCache
+from flaskr.models import User
+from flaskr.user_cache import UserSnapshot, get_user_cache, load_user
+
+
+class FakeClock:
+    """Manually advanced clock for expiry tests."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expiry_and_lru_eviction():
+    """Test entries expire after the TTL and the LRU entry is evicted."""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    clock.now = 11
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def _make_user(session: Session, identifier: str) -> User:
+    crud.create_users_bulk(
+        session, [{"user_identifier": identifier, "password_hash": "h"}]
+    )
+    return crud.get_user_by_identifier(session, identifier)
+
+
+def test_load_user_serves_snapshots_and_counts_hits(app: Flask, session: Session):
+    """Test the loader caches a read-only snapshot and reports hits."""
+    user = _make_user(session, "cache_snapshot_user")
+    lookups = []
+    get_user_cache().add_lookup_listener(lambda hit, seconds: lookups.append(hit))
+
+    first = load_user(user.id)
+    second = load_user(user.id)
+    assert isinstance(first, UserSnapshot)
+    assert second is first
+    assert first.user_identifier == "cache_snapshot_user"
+    assert lookups[-2:] == [False, True]
+    with pytest.raises(AttributeError):
+        first.user_identifier = "changed"
+
+
+def test_user_changes_invalidate_snapshot(app: Flask, session: Session):
+    """Test identifier updates and deletes drop the cached snapshot."""
+    user = _make_user(session, "cache_invalidate_user")
+    assert load_user(user.id).user_identifier == "cache_invalidate_user"
+
+    crud.update_user_identifier(session, user.id, "cache_invalidate_renamed")
+    assert load_user(user.id).user_identifier == "cache_invalidate_renamed"
+
+    crud.delete_user(session, user.id)
+    assert load_user(user.id) is None